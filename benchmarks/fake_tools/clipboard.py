@@ -0,0 +1,10 @@
+#!/usr/bin/env python3
+"""Stands in for xclip/pbcopy: writes stdin to $S2T_BENCH_CLIPBOARD, or discards it when unset."""
+
+import os
+import sys
+
+text = sys.stdin.read()
+if path := os.environ.get("S2T_BENCH_CLIPBOARD"):
+    with open(path, "w") as f:
+        f.write(text)
@@ -0,0 +1,8 @@
+#!/usr/bin/env python3
+"""Stands in for flameshot/gnome-screenshot: copies $S2T_BENCH_SOURCE to the path given as the last argument."""
+
+import os
+import shutil
+import sys
+
+shutil.copyfile(os.environ["S2T_BENCH_SOURCE"], sys.argv[-1])
@@ -0,0 +1,15 @@
+#!/usr/bin/env python3
+"""
+Stands in for tesseract when it is not installed: consumes the image and answers with an empty TSV,
+so the pipeline around OCR can still be timed. Only the stdout outputs are supported.
+"""
+
+import sys
+
+if sys.argv[1:2] == ["stdin"]:
+    sys.stdin.buffer.read()
+
+if "stdout" not in sys.argv:
+    sys.exit("fake tesseract only writes to stdout")
+
+print("level\tpage_num\tblock_num\tpar_num\tline_num\tword_num\tleft\ttop\twidth\theight\tconf\ttext")
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Stage-level benchmarks of the s2t pipeline on synthetic screenshots.
+
+    python benchmarks/run.py --resolution window --repeat 5 --json results.json
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import cv2
+import typer
+
+from metrics import Timings, character_error_rate, peak_rss_mib
+from synthetic import RESOLUTIONS, all_cases, render, write_screenshot
+
+from screenshot_to_text.app import (
+    capture_screenshot_and_process,
+    cleanup_screenshots,
+    pdf_to_txt_with_layout,
+    preprocess_screenshot_for_ocr,
+    processed_image_to_text,
+    record_capture,
+    run_ocr,
+)
+from screenshot_to_text.config import get_supported_platforms
+from screenshot_to_text.helpers import resolve_tool
+from screenshot_to_text.models.s2tconfig import ClipboardConfig, OCRCacheConfig, OCRConfig, PreprocessConfig, S2TConfig, ScreenshotConfig
+from screenshot_to_text.models.tool_type import ToolType
+from screenshot_to_text.retention import CaptureIndex, RetentionPolicy
+
+FAKE_TOOLS = Path(__file__).parent / "fake_tools"
+
+
+def ocr_config(tesseract: str | None) -> OCRConfig:
+    if tesseract is None:
+        fake = str(FAKE_TOOLS / "tesseract.py")
+        return OCRConfig(
+            tool="tesseract", enabled=True, cmd=[fake, "{filename}", "{filename_pdf}", "pdf"], executable=fake, cache=OCRCacheConfig(enabled=False)
+        )
+
+    cmd = get_supported_platforms().get("linux").get(ToolType.OCR).get("tesseract").cmd
+    return OCRConfig(tool="tesseract", enabled=True, cmd=cmd, executable=tesseract, cache=OCRCacheConfig(enabled=False))
+
+
+def bench_stages(cases, work_dir: Path, repeat: int, tesseract: str | None, timings: Timings, errors: dict[str, list[float]]):
+    config = ocr_config(tesseract)
+    preprocess_config = PreprocessConfig()
+
+    for case in cases:
+        screenshot = render(case)
+        filename = write_screenshot(screenshot, work_dir)
+
+        for _ in range(repeat):
+            with timings.measure("preprocess_screenshot_for_ocr"):
+                processed_filename = preprocess_screenshot_for_ocr(filename, preprocess_config)
+
+        if tesseract is None:
+            continue
+
+        processed_image = cv2.imread(str(processed_filename), cv2.IMREAD_GRAYSCALE)
+        for _ in range(repeat):
+            with timings.measure("run_ocr"):
+                pdf_filename = run_ocr(config, processed_filename)
+            with timings.measure("pdf_to_txt_with_layout"):
+                pdf_text = pdf_to_txt_with_layout(pdf_filename)
+            with timings.measure("ocr_tsv_in_memory"):
+                tsv_text = processed_image_to_text(config, processed_image)
+
+        errors["pdf"].append(character_error_rate(screenshot.text, pdf_text))
+        errors["tsv"].append(character_error_rate(screenshot.text, tsv_text))
+
+
+def bench_cleanup(work_dir: Path, file_count: int, repeat: int, timings: Timings):
+    directory = work_dir / "archive"
+    directory.mkdir()
+    for index in range(file_count):
+        (directory / f"screenshot_{index:06}.png").write_bytes(b"\0" * 256)
+
+    with CaptureIndex(directory) as index:
+        with timings.measure("gc_rebuild"):
+            index.rebuild()
+
+    policy = RetentionPolicy(max_count=file_count)
+    for index in range(repeat):
+        filename = directory / f"screenshot_new_{index:06}.png"
+        filename.write_bytes(b"\0" * 256)
+        with timings.measure("cleanup_screenshots"):
+            record_capture(directory, filename)
+            cleanup_screenshots(directory, policy)
+
+
+def bench_end_to_end(cases, work_dir: Path, repeat: int, tesseract: str | None, timings: Timings):
+    screenshot_tool = str(FAKE_TOOLS / "screenshot.py")
+    clipboard_tool = str(FAKE_TOOLS / "clipboard.py")
+    config = S2TConfig(
+        screenshot=ScreenshotConfig(tool="flameshot", cmd=[screenshot_tool], executable=screenshot_tool, keep=False, keep_max_count=-1, path=work_dir),
+        ocr=ocr_config(tesseract),
+        clipboard=ClipboardConfig(tool="xclip", cmd=[clipboard_tool], executable=clipboard_tool),
+    )
+
+    for case in cases:
+        os.environ["S2T_BENCH_SOURCE"] = str(write_screenshot(render(case), work_dir))
+        for _ in range(repeat):
+            with timings.measure("capture_screenshot_and_process"):
+                capture_screenshot_and_process(config)
+
+
+def main(
+    resolution: list[str] = typer.Option(list(RESOLUTIONS), help=f"Resolutions to render, any of {', '.join(RESOLUTIONS)}"),
+    repeat: int = typer.Option(3, help="Timed runs per stage and case"),
+    cleanup_files: int = typer.Option(20_000, help="Captures in the directory `cleanup_screenshots` runs against"),
+    fake_ocr: bool = typer.Option(False, help="Use the tesseract stand-in even when tesseract is installed"),
+    json_output: Path | None = typer.Option(None, "--json", help="Also write the results to this file"),
+):
+    tesseract = None if fake_ocr else resolve_tool("tesseract")
+    if tesseract is None:
+        typer.echo("tesseract not used, OCR stages are skipped and the end to end run uses a stand-in", err=True)
+
+    cases = all_cases(resolution)
+    timings = Timings()
+    errors: dict[str, list[float]] = {"pdf": [], "tsv": []}
+
+    work_dir = Path(tempfile.mkdtemp(prefix="s2t-bench-"))
+    os.environ["S2T_BENCH_CLIPBOARD"] = str(work_dir / "clipboard.txt")
+    # hand_off stops the clipboard owner recorded in the runtime directory, which must not be the user's real one
+    runtime_dir = work_dir / "runtime"
+    runtime_dir.mkdir(mode=0o700)
+    os.environ["XDG_RUNTIME_DIR"] = str(runtime_dir)
+    try:
+        bench_stages(cases, work_dir, repeat, tesseract, timings, errors)
+        bench_cleanup(work_dir, cleanup_files, repeat, timings)
+        bench_end_to_end(cases, work_dir, repeat, tesseract, timings)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    results = {
+        "cases": len(cases),
+        "tesseract": tesseract,
+        "stages": timings.summary(),
+        "character_error_rate": {output: sum(rates) / len(rates) for output, rates in errors.items() if rates},
+        "peak_rss_mib": {"self": peak_rss_mib(), "children": peak_rss_mib(children=True)},
+    }
+
+    typer.echo(f"{'stage':<32}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for stage, summary in results["stages"].items():
+        typer.echo(f"{stage:<32}{summary['n']:>6}" + "".join(f"{summary[p] * 1000:>10.1f}" for p in ("p50", "p95", "p99")))
+    for output, rate in results["character_error_rate"].items():
+        typer.echo(f"character error rate ({output}): {rate:.2%}")
+    typer.echo(f"peak RSS: {results['peak_rss_mib']['self']:.0f} MiB, children {results['peak_rss_mib']['children']:.0f} MiB")
+
+    if json_output:
+        json_output.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import random
+import string
+from dataclasses import dataclass
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+FONTS = {
+    "simplex": cv2.FONT_HERSHEY_SIMPLEX,
+    "duplex": cv2.FONT_HERSHEY_DUPLEX,
+    "complex": cv2.FONT_HERSHEY_COMPLEX,
+    "triplex": cv2.FONT_HERSHEY_TRIPLEX,
+}
+
+# Width x height of the capture
+RESOLUTIONS = {
+    "snippet": (480, 120),
+    "window": (1280, 720),
+    "fullhd": (1920, 1080),
+    "4k": (3840, 2160),
+}
+
+# Fraction of the text lines that fit in the capture that are filled
+DENSITIES = {
+    "sparse": 0.2,
+    "normal": 0.6,
+    "dense": 1.0,
+}
+
+WORDS = [
+    "def", "return", "import", "class", "self", "value", "config", "screenshot", "text", "error",
+    "print", "for", "in", "range", "if", "else", "None", "True", "path", "image", "result",
+]  # fmt: skip
+
+
+@dataclass(frozen=True)
+class Case:
+    resolution: str
+    font: str
+    density: str
+    font_scale: float = 0.6
+
+    @property
+    def name(self) -> str:
+        return f"{self.resolution}-{self.font}-{self.density}"
+
+
+@dataclass
+class Screenshot:
+    case: Case
+    image: np.ndarray
+    text: str
+
+
+def random_line(rng: random.Random, max_chars: int) -> str:
+    line = " ".join(rng.choice(WORDS) if rng.random() < 0.8 else str(rng.randint(0, 999)) for _ in range(rng.randint(2, 10)))
+    if rng.random() < 0.3:
+        line += rng.choice(["()", ":", " = 1", "[0]", ","])
+    return line[:max_chars].rstrip() or rng.choice(string.ascii_lowercase)
+
+
+def render(case: Case, seed: int = 0) -> Screenshot:
+    """Renders dark text on a light background, like a screenshot of an editor or terminal."""
+    rng = random.Random(f"{case.name}-{seed}")
+    width, height = RESOLUTIONS[case.resolution]
+    font = FONTS[case.font]
+    thickness = 1
+
+    (char_width, char_height), baseline = cv2.getTextSize("M", font, case.font_scale, thickness)
+    line_height = int((char_height + baseline) * 1.8)
+    margin = char_width
+
+    line_count = max(1, int((height - 2 * margin) // line_height * DENSITIES[case.density]))
+    max_chars = max(1, (width - 2 * margin) // char_width)
+
+    image = np.full((height, width, 3), 245, np.uint8)
+    lines = []
+    for index in range(line_count):
+        line = random_line(rng, max_chars)
+        y = margin + char_height + index * line_height
+        cv2.putText(image, line, (margin, y), font, case.font_scale, (20, 20, 20), thickness, cv2.LINE_AA)
+        lines.append(line)
+
+    return Screenshot(case, image, "\n".join(lines))
+
+
+def all_cases(resolutions: list[str] | None = None) -> list[Case]:
+    return [Case(resolution, font, density) for resolution in resolutions or RESOLUTIONS for font in FONTS for density in DENSITIES]
+
+
+def write_screenshot(screenshot: Screenshot, directory: Path) -> Path:
+    path = directory / f"{screenshot.case.name}.png"
+    cv2.imwrite(str(path), screenshot.image)
+    path.with_suffix(".txt").write_text(screenshot.text)
+    return path
@@ -1,42 +1,103 @@
+import json
+import os
+import signal
 import subprocess
-from screenshot_to_text.models.s2tconfig import S2TConfig, ScreenshotConfig, OCRConfig, ClipboardConfig
+import sys
+import threading
+import traceback
+from typing import Callable
+from screenshot_to_text.models.s2tconfig import S2TConfig, ScreenshotConfig, OCRConfig, OCRCacheConfig, ClipboardConfig, PreprocessConfig
 from datetime import datetime
 from pathlib import Path
-import collections
-from screenshot_to_text.errors import CommandNotFoundError, CommandFailedError, ToolNotFoundError
-from platformdirs import user_cache_dir
-from screenshot_to_text.helpers import system_has
-
-from screenshot_to_text.constants import APP_NAME
-from pypdf import PdfReader
+from screenshot_to_text.errors import CommandNotFoundError, CommandFailedError, CommandTimeoutError, ToolNotFoundError, ScreenshotReadError
+from platformdirs import user_cache_dir, user_runtime_dir
+from screenshot_to_text.helpers import command_executable, forget_tool, resolve_tool, system_has
+from screenshot_to_text.bands import Band, find_bands, ocr_bands
+from screenshot_to_text.clipboard import hand_off
+from screenshot_to_text.layout import Word, parse_hocr, parse_tsv, words_to_text
+from screenshot_to_text.models.ocr_output import OCROutput
+from screenshot_to_text.ocr_cache import OCRCache, ocr_cache_dir
+from screenshot_to_text.planner import FIXED_PLAN, PreprocessPlan, plan_preprocessing
+from screenshot_to_text.preprocess import preprocess_engine
+from screenshot_to_text.retention import CaptureIndex, RetentionPolicy, capture_stem
+from screenshot_to_text.scheduler import available_cpus, ocr_env, ocr_slot, ocr_threads, schedule_ocr
+from screenshot_to_text.tesseract_api import engine_params, engine_pool
+from screenshot_to_text.timing import annotate, span
+from screenshot_to_text.x11capture import grab_screen
+
+from screenshot_to_text.constants import APP_NAME, SCREENSHOT_PREFIX
 import cv2
 import numpy as np
 
 
-def run_command(cmd: list[str], text_input: str | None = None, capture: bool = True) -> str:
+def _decode(output: str | bytes | None) -> str:
+    if isinstance(output, bytes):
+        return output.decode("utf-8", errors="replace")
+    return output or ""
+
+
+def run_command(
+    cmd: list[str],
+    text_input: str | None = None,
+    capture: bool = True,
+    binary_input: bytes | memoryview | None = None,
+    executable: str | None = None,
+    timeout: float | None = None,
+    env: dict[str, str] | None = None,
+) -> str:
+    """`env` is set on top of the inherited environment."""
     stdout = subprocess.PIPE if capture else subprocess.DEVNULL
     stderr = subprocess.PIPE if capture else subprocess.DEVNULL
 
     if not cmd:
         raise CommandNotFoundError("Command not found, cmd is None")
-    if not system_has(cmd[0]):
+
+    executable = command_executable(cmd[0], executable)
+    if not executable:
         raise CommandNotFoundError(f"Command not found: {cmd[0]}")
 
+    process_input = text_input if binary_input is None else binary_input
+    span_name = f"command.{Path(cmd[0]).name}"
+
+    def run(executable: str) -> subprocess.CompletedProcess:
+        # Spawning and waiting are timed separately, a slow fork/exec looks very different from a slow tool
+        with span(f"{span_name}.spawn"):
+            process = subprocess.Popen(
+                [executable] + cmd[1:],
+                stdin=subprocess.PIPE if process_input is not None else None,
+                stdout=stdout,
+                stderr=stderr,
+                text=binary_input is None,
+                env={**os.environ, **env} if env else None,
+            )
+        with span(f"{span_name}.wait"):
+            try:
+                process_stdout, process_stderr = process.communicate(process_input, timeout=timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.communicate()
+                raise CommandTimeoutError(cmd, timeout)
+
+        if process.returncode:
+            raise subprocess.CalledProcessError(process.returncode, process.args, process_stdout, process_stderr)
+        return subprocess.CompletedProcess(process.args, process.returncode, process_stdout, process_stderr)
+
     try:
-        process = subprocess.run(
-            cmd,
-            input=text_input,
-            check=True,
-            text=True,
-            stdout=stdout,
-            stderr=stderr,
-        )
-        return process.stdout or ""
-    except FileNotFoundError as e:
+        try:
+            process = run(executable)
+        except (FileNotFoundError, PermissionError):
+            # The resolved path went stale (tool moved or reinstalled), resolve it once more and retry
+            forget_tool(cmd[0])
+            resolved = resolve_tool(cmd[0])
+            if not resolved or resolved == executable:
+                raise
+            process = run(resolved)
+        return _decode(process.stdout)
+    except (FileNotFoundError, PermissionError) as e:
         raise CommandNotFoundError(f"Command not found: {cmd[0]}") from e
     except subprocess.CalledProcessError as e:
-        stdout = e.stdout or ""
-        stderr = e.stderr or ""
+        stdout = _decode(e.stdout)
+        stderr = _decode(e.stderr)
         raise CommandFailedError(
             cmd=cmd,
             return_code=e.returncode,
@@ -46,12 +107,13 @@ def run_command(cmd: list[str], text_input: str | None = None, capture: bool = T
 
 
 def validate_tool(config: ScreenshotConfig | OCRConfig | ClipboardConfig):
-    if not config.tool or not system_has(config.tool):
+    # A stored executable is trusted until running it fails, see run_command
+    if not config.tool or not (config.executable or system_has(config.tool)):
         raise ToolNotFoundError(config.tool)
 
 
 def validate_command(config: ScreenshotConfig | OCRConfig | ClipboardConfig):
-    if not config.cmd or not system_has(config.cmd[0]):
+    if not config.cmd or not command_executable(config.cmd[0], config.executable):
         raise CommandNotFoundError
 
 
@@ -60,13 +122,17 @@ def runtime_validate(config: ScreenshotConfig | OCRConfig | ClipboardConfig):
     validate_command(config)
 
 
+def screenshot_filename(screenshot_dir: Path) -> Path:
+    return screenshot_dir / f"{SCREENSHOT_PREFIX}{datetime.now().isoformat().replace(':', '_')}.png"
+
+
 def take_screenshot(screenshot_config: ScreenshotConfig, screenshot_dir: Path) -> Path:
 
     runtime_validate(screenshot_config)
 
-    filename = screenshot_dir / f"screenshot_{datetime.now().isoformat().replace(':', '_')}.png"
+    filename = screenshot_filename(screenshot_dir)
 
-    run_command(screenshot_config.cmd + [str(filename)], capture=False)
+    run_command(screenshot_config.cmd + [str(filename)], capture=False, executable=screenshot_config.executable)
 
     return filename
 
@@ -80,33 +146,128 @@ def run_ocr(ocr_config: OCRConfig, filename: Path) -> Path | None:
         filename_pdf = str(filename).replace(".png", "")
 
         cmd = [arg.format(filename=filename_png, filename_pdf=filename_pdf) for arg in ocr_config.cmd]
-        run_command(cmd)
+        with ocr_slot():
+            run_command(cmd, executable=ocr_config.executable, env=ocr_env())
         return Path(filename_pdf + ".pdf")
 
 
+def ocr_stdout_cmd(ocr_config: OCRConfig, filename: Path | str) -> list[str]:
+    cmd = ocr_config.cmd
+    # Configs are written with the PDF output arguments, swap them for stdout in the requested format
+    if "{filename_pdf}" in cmd:
+        cmd = cmd[: cmd.index("{filename_pdf}")]
+
+    return [arg.format(filename=str(filename), filename_pdf="") for arg in cmd] + ["stdout", ocr_config.output.value]
+
+
+def encode_image_for_ocr(image: np.ndarray) -> memoryview:
+    # Uncompressed PNM is the cheapest format to encode here and to decode on the tesseract side.
+    # The encoded buffer is passed on as is, a bytes copy of it would be one more image in memory
+    extension = ".pgm" if image.ndim == 2 else ".ppm"
+    _, buffer = cv2.imencode(extension, image)
+    return buffer.data.cast("B")
+
+
+def in_process_ocr_words(ocr_config: OCRConfig, image: np.ndarray) -> list[Word] | None:
+    """Words from the libtesseract backend, None when it is not configured or not available."""
+
+    if ocr_config.backend != "libtesseract":
+        return None
+
+    with engine_pool().borrow(engine_params(ocr_config.cmd)) as engine:
+        if engine is None:
+            return None
+
+        with span("libtesseract.recognize"):
+            return parse_tsv(engine.recognize_tsv(image))
+
+
+def run_ocr_words(ocr_config: OCRConfig, source: Path | np.ndarray, timeout: float | None = None) -> list[Word]:
+    """`timeout` only bounds the subprocess backend, an in-process recognition cannot be interrupted."""
+
+    runtime_validate(ocr_config)
+
+    with ocr_slot():
+        if isinstance(source, np.ndarray):
+            words = in_process_ocr_words(ocr_config, source)
+            if words is not None:
+                return words
+
+            output = run_command(
+                ocr_stdout_cmd(ocr_config, "stdin"),
+                binary_input=encode_image_for_ocr(source),
+                executable=ocr_config.executable,
+                timeout=timeout,
+                env=ocr_env(),
+            )
+        else:
+            output = run_command(ocr_stdout_cmd(ocr_config, source), executable=ocr_config.executable, timeout=timeout, env=ocr_env())
+
+    return parse_ocr_words(ocr_config, output)
+
+
+def parse_ocr_words(ocr_config: OCRConfig, output: str) -> list[Word]:
+    if ocr_config.output == OCROutput.HOCR:
+        return parse_hocr(output)
+    return parse_tsv(output)
+
+
+def ocr_to_text(ocr_config: OCRConfig, filename: Path) -> str:
+    if ocr_config.output == OCROutput.PDF:
+        pdf_filename = run_ocr(ocr_config, filename)
+        with span("pdf_layout"):
+            return pdf_to_txt_with_layout(pdf_filename)
+    return words_to_text(run_ocr_words(ocr_config, filename))
+
+
 def pdf_to_txt_with_layout(path: Path) -> str:
+    from pypdf import PdfReader
+
     reader = PdfReader(path)
     page = reader.pages[0]
     text = page.extract_text(extraction_mode="layout")
     return text
 
 
-def preprocess_screenshot_for_ocr(filename: Path):
+def load_screenshot(filename: Path) -> np.ndarray:
+    with span("load"):
+        image = cv2.imread(filename)
+    if image is None:
+        raise ScreenshotReadError(filename)
 
-    image = cv2.imread(filename)
+    annotate(width=image.shape[1], height=image.shape[0])
+    return image
 
-    grayscale_image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
 
-    img_resized = cv2.resize(grayscale_image, None, fx=3, fy=3, interpolation=cv2.INTER_CUBIC)
+def decode_screenshot(data: bytes, label: str = "<image bytes>") -> np.ndarray:
+    """`load_screenshot` for an image already in memory, e.g. received over HTTP."""
+    with span("load"):
+        image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ScreenshotReadError(Path(label))
 
-    # Thresholding to remove noise and make text solid black
-    _, thresh = cv2.threshold(img_resized, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    annotate(width=image.shape[1], height=image.shape[0])
+    return image
 
-    # Dilation to make underscores more visible
-    kernel = np.ones((2, 2), np.uint8)
-    processed_image = cv2.dilate(thresh, kernel, iterations=1)
 
-    processed_filename = filename.parent / (filename.name.replace(".png", "") + "_processed.png")
+def processed_screenshot_path(filename: Path) -> Path:
+    return filename.parent / (filename.name.replace(".png", "") + "_processed.png")
+
+
+# Identifies the preprocessing stages (see preprocess.py) in OCR cache keys, change it whenever they change
+PREPROCESSING_ID = "planned:grayscale,banded-resize,source-otsu,dilate2x2"
+
+
+def preprocess_image(image: np.ndarray, plan: PreprocessPlan = FIXED_PLAN, dst: np.ndarray | None = None) -> np.ndarray:
+    return preprocess_engine().run(image, plan, dst)
+
+
+def preprocess_screenshot_for_ocr(filename: Path, preprocess_config: PreprocessConfig | None = None):
+
+    image = load_screenshot(filename)
+    processed_image = preprocess_image(image, plan_preprocessing(image, preprocess_config or PreprocessConfig()))
+
+    processed_filename = processed_screenshot_path(filename)
 
     cv2.imwrite(processed_filename, processed_image)
 
@@ -115,66 +276,410 @@ def preprocess_screenshot_for_ocr(filename: Path):
 
 def copy_text_to_clipboard(clipboard_config: ClipboardConfig, text: str):
     runtime_validate(clipboard_config)
-    run_command(clipboard_config.cmd, text_input=text, capture=False)
+    hand_off(clipboard_config.cmd, text, executable=clipboard_config.executable)
 
 
-def cleanup_screenshots(path: Path, keep_max_count: int):
-    if keep_max_count == -1:
-        return
+def retention_policy(screenshot_config: ScreenshotConfig) -> RetentionPolicy:
+    return RetentionPolicy(
+        max_count=screenshot_config.keep_max_count,
+        max_bytes=screenshot_config.keep_max_bytes,
+        max_age_days=screenshot_config.keep_max_age_days,
+    )
 
-    files_by_basename = collections.defaultdict(list)
 
-    # Group all relevant files by their base name
-    for p in path.glob("*.png"):
-        if p.name.endswith("_processed.png"):
-            base_name = p.stem.removesuffix("_processed")
-        else:
-            base_name = p.stem
-        files_by_basename[base_name].append(p)
+def capture_files(filename: Path) -> list[Path]:
+    processed_filename = processed_screenshot_path(filename)
+    return [filename, processed_filename, processed_filename.with_suffix(".pdf"), filename.with_suffix(".json")]
 
-    for p in path.glob("*.pdf"):
-        base_name = p.stem
-        files_by_basename[base_name].append(p)
 
-    screenshot_groups = []
-    for base_name, files in files_by_basename.items():
-        try:
-            latest_ctime = max(p.stat().st_ctime for p in files)
-            screenshot_groups.append((latest_ctime, files))
-        except FileNotFoundError:
-            continue
+def write_capture_text(filename: Path, text: str):
+    # What archive mode keeps in place of the processed image and PDF
+    metadata = {"capture": filename.name, "created": datetime.fromtimestamp(filename.stat().st_mtime).isoformat(), "text": text}
+    filename.with_suffix(".json").write_text(json.dumps(metadata, ensure_ascii=False))
 
-    screenshot_groups.sort(key=lambda x: x[0], reverse=True)
 
-    groups_to_delete = screenshot_groups[keep_max_count:]
+def pack_captures(path: Path, screenshot_config: ScreenshotConfig) -> int:
+    with CaptureIndex(path) as index:
+        return index.pack(screenshot_config.archive_loose_count, screenshot_config.archive_bundle_bytes)
 
-    for _, files in groups_to_delete:
-        for file_path in files:
-            file_path.unlink(missing_ok=True)
 
+def pack_in_background(path: Path, screenshot_config: ScreenshotConfig) -> threading.Thread:
+    # Not a daemon, a one-shot run finishes the bundle it is writing before it exits
+    thread = threading.Thread(target=pack_captures, args=(path, screenshot_config), name="s2t-pack")
+    thread.start()
+    return thread
 
-def capture_screenshot_and_process(config: S2TConfig, keep_screenshot: bool | None = None, ocr_enabled: bool | None = None):
 
-    is_ocr_enabled = ocr_enabled if ocr_enabled is not None else config.ocr.enabled
-    is_screenshot_kept = keep_screenshot if keep_screenshot is not None else config.screenshot.keep
+def record_capture(path: Path, filename: Path):
+    with CaptureIndex(path) as index:
+        index.record(capture_stem(filename), capture_files(filename))
+
+
+def cleanup_screenshots(path: Path, policy: RetentionPolicy) -> int:
+    if not policy.enabled:
+        return 0
+
+    with CaptureIndex(path) as index:
+        return index.enforce(policy)
+
+
+def uses_in_memory_pipeline(ocr_config: OCRConfig) -> bool:
+    # Tesseract always writes the PDF output to disk, so it can only run from files
+    return ocr_config.in_memory and ocr_config.output != OCROutput.PDF
+
+
+def processed_image_to_text(ocr_config: OCRConfig, processed_image: np.ndarray, processed_filename: Path | None = None) -> str:
+
+    if processed_filename is not None:
+        with span("write_processed"):
+            cv2.imwrite(processed_filename, processed_image)
+
+    with span("ocr"):
+        if not uses_in_memory_pipeline(ocr_config):
+            with ocr_threads(schedule_ocr(ocr_config, jobs=1, pixels=processed_image.size).threads):
+                return ocr_to_text(ocr_config, processed_filename)
+
+        return words_to_text(recognize_words(ocr_config, processed_image))
+
+
+def band_workers(ocr_config: OCRConfig) -> int:
+    return ocr_config.band_workers or available_cpus()
+
+
+def plan_bands(ocr_config: OCRConfig, processed_image: np.ndarray) -> list[Band]:
+    """The bands to OCR `processed_image` in, empty when it is better done in a single pass."""
+
+    workers = band_workers(ocr_config)
+    if ocr_config.band_split_min_pixels == -1 or processed_image.size < ocr_config.band_split_min_pixels or workers < 2:
+        return []
+
+    bands = find_bands(processed_image, max_bands=workers, min_gap=ocr_config.band_min_gap)
+    return bands if len(bands) >= 2 else []
+
+
+def recognize_words(ocr_config: OCRConfig, processed_image: np.ndarray) -> list[Word]:
+    """OCRs large images as horizontal text bands in parallel, smaller ones in a single pass."""
 
+    bands = plan_bands(ocr_config, processed_image)
+    if not bands:
+        with ocr_threads(schedule_ocr(ocr_config, jobs=1, pixels=processed_image.size).threads):
+            return run_ocr_words(ocr_config, processed_image)
+
+    schedule = schedule_ocr(ocr_config, jobs=len(bands), pixels=processed_image.size // len(bands), workers=ocr_config.band_workers)
+    with ocr_threads(schedule.threads):
+        return ocr_bands(lambda band_image: run_ocr_words(ocr_config, band_image), processed_image, bands, schedule.workers)
+
+
+def image_to_text(
+    ocr_config: OCRConfig,
+    image: np.ndarray,
+    processed_filename: Path | None = None,
+    preprocess_config: PreprocessConfig | None = None,
+) -> str:
+    with span("plan"):
+        plan = plan_preprocessing(image, preprocess_config or PreprocessConfig())
+    if not plan.has_text:
+        return ""
+
+    with span("preprocess"):
+        processed_image = preprocess_image(image, plan)
+
+    annotate(processed_width=processed_image.shape[1], processed_height=processed_image.shape[0])
+    return processed_image_to_text(ocr_config, processed_image, processed_filename)
+
+
+def image_to_words(ocr_config: OCRConfig, image: np.ndarray, preprocess_config: PreprocessConfig | None = None) -> list[Word]:
+    """Recognized words with their boxes in the coordinates of `image`, whatever the preprocessing cropped and scaled."""
+
+    plan = plan_preprocessing(image, preprocess_config or PreprocessConfig())
+    if not plan.has_text:
+        return []
+
+    return plan.to_original(recognize_words(ocr_config, preprocess_image(image, plan)))
+
+
+def open_ocr_cache(cache_config: OCRCacheConfig) -> OCRCache | None:
+    if not cache_config.enabled:
+        return None
+    return OCRCache(ocr_cache_dir(), cache_config.max_bytes, cache_config.near_match_distance if cache_config.near_match else None)
+
+
+def ocr_cache_params(ocr_config: OCRConfig, preprocess_config: PreprocessConfig) -> list[str]:
+    return [PREPROCESSING_ID, preprocess_config.model_dump_json(), ocr_config.output.value, *(ocr_config.cmd or [])]
+
+
+def screenshot_to_text(
+    ocr_config: OCRConfig,
+    filename: Path,
+    keep_processed: bool = True,
+    preprocess_config: PreprocessConfig | None = None,
+    before_ocr: Callable[[np.ndarray], None] | None = None,
+    image: np.ndarray | None = None,
+) -> str:
+    """
+    `before_ocr` is called with the capture when it has to be OCR'd, i.e. on a cache miss.
+    `image` is the capture when it is already in memory, `filename` then only names the processed image.
+    """
+
+    preprocess_config = preprocess_config or PreprocessConfig()
+    if image is None:
+        image = load_screenshot(filename)
+    processed_filename = processed_screenshot_path(filename) if keep_processed or not uses_in_memory_pipeline(ocr_config) else None
+
+    cache = open_ocr_cache(ocr_config.cache)
+    if cache is None:
+        if before_ocr is not None:
+            before_ocr(image)
+        return image_to_text(ocr_config, image, processed_filename, preprocess_config)
+
+    # Keyed on the capture itself, a hit skips planning and the upscale as well as the OCR
+    with span("cache_lookup"):
+        key = cache.key(image, ocr_cache_params(ocr_config, preprocess_config))
+        text = cache.get(key, image)
+
+    annotate(cache_hit=text is not None)
+    if text is None:
+        if before_ocr is not None:
+            before_ocr(image)
+        text = image_to_text(ocr_config, image, processed_filename, preprocess_config)
+        with span("cache_store"):
+            cache.put(key, image, text)
+
+    return text
+
+
+def with_psm(cmd: list[str], psm: int | None) -> list[str]:
+    if psm is None:
+        return cmd
+    if "--psm" in cmd:
+        index = cmd.index("--psm")
+        return cmd[: index + 1] + [str(psm)] + cmd[index + 2 :]
+    return cmd[:1] + ["--psm", str(psm)] + cmd[1:]
+
+
+def draft_text(ocr_config: OCRConfig, image: np.ndarray) -> str | None:
+    """Cheap OCR pass: small or no upscale, no dilation, TSV over stdin and a hard time budget."""
+
+    draft = ocr_config.draft
+    draft_config = ocr_config.model_copy(update={"cmd": with_psm(ocr_config.cmd, draft.psm), "output": OCROutput.TSV})
+    plan = PreprocessPlan(scale=draft.scale, interpolation="area" if draft.scale < 1 else "linear", threshold=True, dilate=False)
+
+    try:
+        with span("draft"):
+            return words_to_text(run_ocr_words(draft_config, preprocess_image(image, plan), timeout=draft.timeout))
+    except (CommandFailedError, CommandTimeoutError):
+        return None
+
+
+CLIPBOARD_PASTE_TIMEOUT_SECONDS = 1.0
+
+
+def clipboard_holds(clipboard_config: ClipboardConfig, text: str) -> bool:
+    """Whether the clipboard still holds `text`, False when that cannot be checked."""
+
+    if not clipboard_config.paste_cmd:
+        return False
+
+    try:
+        current = run_command(clipboard_config.paste_cmd, timeout=CLIPBOARD_PASTE_TIMEOUT_SECONDS)
+    except (CommandNotFoundError, CommandFailedError, CommandTimeoutError):
+        return False
+
+    return current.rstrip() == text.rstrip()
+
+
+class FullPassDetached(Exception):
+    """Raised in the caller once the full pass carries on in a detached process."""
+
+
+def detach_process() -> bool:
+    """
+    Forks a process that carries on in the background, detached from the caller's session and stdio (stderr stays for
+    errors), returns True in it and False in the caller. Forked twice, so the caller (e.g. the daemon) never has to reap it.
+    """
+    pid = os.fork()
+    if pid:
+        os.waitpid(pid, 0)
+        return False
+
+    os.setsid()
+    if os.fork():
+        os._exit(0)
+
+    # The daemon's SIGTERM handler would unwind into its own clean-up, deleting its socket
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1):
+        os.dup2(devnull, fd)
+    os.close(devnull)
+    return True
+
+
+def exit_detached(status: int = 0) -> None:
+    """Ends a detached process once its background threads (e.g. packing) are done, without returning to the caller's code."""
+    for thread in threading.enumerate():
+        if thread is not threading.current_thread() and not thread.daemon:
+            thread.join()
+    sys.stderr.flush()
+    os._exit(status)
+
+
+def extract_text_to_clipboard(
+    config: S2TConfig,
+    filename: Path,
+    keep_processed: bool = False,
+    image: np.ndarray | None = None,
+    detach: Callable[[], bool] | None = None,
+) -> str:
+    """
+    `detach` is called once a draft is on the clipboard, so the full pass can go on in the background: it returns
+    whether this is the process that carries on, the other one gets `FullPassDetached`.
+    """
+    drafts = []
+
+    def copy_draft(image: np.ndarray):
+        draft = draft_text(config.ocr, image)
+        if draft:
+            with span("clipboard"):
+                copy_text_to_clipboard(config.clipboard, draft)
+            drafts.append(draft)
+            if detach is not None and not detach():
+                raise FullPassDetached
+
+    text = screenshot_to_text(
+        config.ocr,
+        filename,
+        keep_processed=keep_processed,
+        preprocess_config=config.preprocess,
+        before_ocr=copy_draft if config.ocr.draft.enabled else None,
+        image=image,
+    )
+
+    if drafts:
+        # Only replace the draft, not something the user copied while the full pass was running
+        if text and text != drafts[0] and clipboard_holds(config.clipboard, drafts[0]):
+            with span("clipboard"):
+                copy_text_to_clipboard(config.clipboard, text)
+    elif text:
+        with span("clipboard"):
+            copy_text_to_clipboard(config.clipboard, text)
+
+    return text
+
+
+def capture_directory(config: S2TConfig, is_screenshot_kept: bool) -> Path:
     if is_screenshot_kept:
         screenshot_dir = Path(config.screenshot.path)
-        if not screenshot_dir.exists():
-            screenshot_dir.mkdir(parents=True, exist_ok=True)
+    elif uses_in_memory_pipeline(config.ocr):
+        # The capture only lives until it is decoded, keep it off the (possibly network mounted) home directory
+        screenshot_dir = Path(user_runtime_dir(APP_NAME))
     else:
         screenshot_dir = Path(user_cache_dir(APP_NAME))
-        if not screenshot_dir.exists():
-            screenshot_dir.mkdir(parents=True, exist_ok=True)
 
-    filename = take_screenshot(config.screenshot, screenshot_dir)
+    if not screenshot_dir.exists():
+        screenshot_dir.mkdir(parents=True, exist_ok=True)
 
-    if is_ocr_enabled:
-        preprocessed_file = preprocess_screenshot_for_ocr(filename)
-        text = pdf_to_txt_with_layout(run_ocr(config.ocr, preprocessed_file))
+    return screenshot_dir
 
-        if text:
-            copy_text_to_clipboard(config.clipboard, text)
 
-    if is_screenshot_kept and config.screenshot.keep_max_count > 0:
-        cleanup_screenshots(screenshot_dir, config.screenshot.keep_max_count)
+def discard_capture(config: S2TConfig, filename: Path):
+    if uses_in_memory_pipeline(config.ocr):
+        filename.unlink(missing_ok=True)
+
+
+def retain_capture(config: S2TConfig, filename: Path, text: str | None = None):
+    """`text` is what was read from the capture, kept next to it in archive mode."""
+
+    archive = config.screenshot.archive
+    with span("retention"):
+        if archive:
+            for file in capture_files(filename)[1:3]:
+                file.unlink(missing_ok=True)
+            if text is not None:
+                write_capture_text(filename, text)
+        record_capture(filename.parent, filename)
+        cleanup_screenshots(filename.parent, retention_policy(config.screenshot))
+
+    if archive:
+        pack_in_background(filename.parent, config.screenshot)
+
+
+def grab_screenshot(
+    screenshot_config: ScreenshotConfig, screenshot_dir: Path, keep: bool, region: tuple[int, int, int, int] | None = None
+) -> tuple[Path, np.ndarray]:
+    """Captures with the x11 backend, the pixels never go through a PNG unless the screenshot is kept."""
+
+    image = grab_screen(region or screenshot_config.region)
+    filename = screenshot_filename(screenshot_dir)
+    if keep:
+        cv2.imwrite(filename, image)
+    return filename, image
+
+
+def capture_screenshot_and_process(
+    config: S2TConfig,
+    keep_screenshot: bool | None = None,
+    ocr_enabled: bool | None = None,
+    region: tuple[int, int, int, int] | None = None,
+    detach_full_pass: bool = False,
+):
+    """
+    `region` (x, y, width, height) overrides the configured region of the x11 backend.
+    With `detach_full_pass`, the call returns once a draft is on the clipboard, a detached process finishes the capture.
+    """
+
+    is_ocr_enabled = ocr_enabled if ocr_enabled is not None else config.ocr.enabled
+    is_screenshot_kept = keep_screenshot if keep_screenshot is not None else config.screenshot.keep
+    screenshot_dir = capture_directory(config, is_screenshot_kept)
+
+    image = None
+    with span("capture"):
+        if config.screenshot.backend == "x11":
+            filename, image = grab_screenshot(config.screenshot, screenshot_dir, is_screenshot_kept, region)
+        else:
+            filename = take_screenshot(config.screenshot, screenshot_dir)
+
+    detached = False
+
+    def detach() -> bool:
+        nonlocal detached
+        detached = detach_process()
+        return detached
+
+    try:
+        process_capture(config, filename, image, is_ocr_enabled, is_screenshot_kept, detach if detach_full_pass else None)
+    except BaseException:
+        if detached:
+            traceback.print_exc()
+            exit_detached(1)
+        raise
+
+    if detached:
+        exit_detached()
+
+
+def process_capture(
+    config: S2TConfig,
+    filename: Path,
+    image: np.ndarray | None,
+    is_ocr_enabled: bool,
+    is_screenshot_kept: bool,
+    detach: Callable[[], bool] | None = None,
+):
+    text = None
+    handed_off = False
+    try:
+        if is_ocr_enabled:
+            keep_processed = is_screenshot_kept and not config.screenshot.archive
+            text = extract_text_to_clipboard(config, filename, keep_processed=keep_processed, image=image, detach=detach)
+    except FullPassDetached:
+        # The detached process discards or keeps the capture once it is done with it
+        handed_off = True
+        return
+    finally:
+        if not is_screenshot_kept and not handed_off:
+            discard_capture(config, filename)
+
+    if is_screenshot_kept:
+        retain_capture(config, filename, text)
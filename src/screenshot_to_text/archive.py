@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import fcntl
+import json
+import os
+import re
+import struct
+import zlib
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator
+
+try:
+    # Python 3.14+
+    from compression import zstd
+except ImportError:
+    zstd = None
+
+BUNDLE_SUFFIX = ".s2tb"
+LOCK_FILENAME = ".s2t-archive.lock"
+# "<bundle> <offset>" lines of the entries retention deleted, which stay in their bundle until it is deleted as a whole
+DELETED_FILENAME = ".s2t-archive-deleted"
+_BUNDLE_PATTERN = re.compile(r"^bundle-(\d+)\.s2tb$")
+# Every entry starts with the magic and the length of its JSON header, which names and sizes the payload that follows
+MAGIC = b"S2TB"
+_ENTRY_HEADER = struct.Struct("<4sI")
+ZLIB_LEVEL = 6
+
+
+@dataclass(frozen=True)
+class ArchivedFile:
+    stem: str
+    name: str
+    bundle: str
+    # Of the payload in the bundle
+    offset: int
+    length: int
+    codec: str
+
+
+def compress(data: bytes) -> tuple[str, bytes]:
+    """The codec and payload to store `data` with, stored as is when compressing does not make it smaller (e.g. PNGs)."""
+    codec, payload = ("zstd", zstd.compress(data)) if zstd is not None else ("zlib", zlib.compress(data, ZLIB_LEVEL))
+    if len(payload) >= len(data):
+        return "raw", data
+    return codec, payload
+
+
+def decompress(codec: str, payload: bytes) -> bytes:
+    if codec == "raw":
+        return payload
+    if codec == "zlib":
+        return zlib.decompress(payload)
+    if codec == "zstd" and zstd is not None:
+        return zstd.decompress(payload)
+    raise ValueError(f"Cannot read {codec!r} archive entries with this Python")
+
+
+def bundle_paths(directory: Path) -> list[Path]:
+    """The bundles in `directory`, oldest first."""
+    bundles = [(int(match.group(1)), path) for path in directory.iterdir() if (match := _BUNDLE_PATTERN.match(path.name))]
+    return [path for _, path in sorted(bundles)]
+
+
+def append_entries(directory: Path, entries: list[tuple[str, str, bytes]], max_bundle_bytes: int) -> list[ArchivedFile]:
+    """
+    Appends the (stem, name, data) entries to the newest bundle, or to a new one once the newest reached `max_bundle_bytes`.
+    Bundles are only ever appended to, a crash leaves at worst an entry no index points to.
+    """
+    bundles = bundle_paths(directory)
+    path = bundles[-1] if bundles else None
+    if path is None or path.stat().st_size >= max_bundle_bytes:
+        number = int(_BUNDLE_PATTERN.match(path.name).group(1)) + 1 if path else 1
+        path = directory / f"bundle-{number:06d}{BUNDLE_SUFFIX}"
+
+    archived = []
+    with open(path, "ab") as f:
+        for stem, name, data in entries:
+            codec, payload = compress(data)
+            header = json.dumps({"stem": stem, "name": name, "codec": codec, "length": len(payload)}).encode()
+            f.write(_ENTRY_HEADER.pack(MAGIC, len(header)) + header)
+            archived.append(ArchivedFile(stem, name, path.name, f.tell(), len(payload), codec))
+            f.write(payload)
+        f.flush()
+        # On disk before the index points at it and the loose files are deleted
+        os.fsync(f.fileno())
+    return archived
+
+
+def read_entry(directory: Path, entry: ArchivedFile) -> bytes:
+    with open(directory / entry.bundle, "rb") as f:
+        f.seek(entry.offset)
+        return decompress(entry.codec, f.read(entry.length))
+
+
+def scan_bundle(path: Path) -> Iterator[ArchivedFile]:
+    """The entries of a bundle from their headers, for rebuilding a lost index. Stops at a torn last entry."""
+    size = path.stat().st_size
+    with open(path, "rb") as f:
+        while True:
+            prefix = f.read(_ENTRY_HEADER.size)
+            if len(prefix) < _ENTRY_HEADER.size:
+                return
+            magic, header_length = _ENTRY_HEADER.unpack(prefix)
+            if magic != MAGIC:
+                return
+            try:
+                header = json.loads(f.read(header_length))
+            except ValueError:
+                return
+
+            offset = f.tell()
+            if offset + header["length"] > size:
+                return
+            yield ArchivedFile(header["stem"], header["name"], path.name, offset, header["length"], header["codec"])
+            f.seek(header["length"], os.SEEK_CUR)
+
+
+def mark_deleted(directory: Path, entries: list[ArchivedFile]) -> None:
+    """Records that `entries` were deleted, so rebuilding a lost index from the bundles does not bring them back."""
+    if not entries:
+        return
+    with open(directory / DELETED_FILENAME, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.write("".join(f"{entry.bundle} {entry.offset}\n" for entry in entries))
+
+
+def deleted_entries(directory: Path) -> set[tuple[str, int]]:
+    """The (bundle, offset) of the deleted entries."""
+    try:
+        lines = (directory / DELETED_FILENAME).read_text().splitlines()
+    except FileNotFoundError:
+        return set()
+    return {(bundle, int(offset)) for bundle, _, offset in (line.partition(" ") for line in lines) if offset.isdigit()}
+
+
+def prune_deleted(directory: Path) -> None:
+    """Forgets the deleted entries of bundles that are gone."""
+    path = directory / DELETED_FILENAME
+    if not path.exists():
+        return
+    with open(path, "r+") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        lines = f.read().splitlines(keepends=True)
+        bundles = {bundle.name for bundle in bundle_paths(directory)}
+        kept = [line for line in lines if line.partition(" ")[0] in bundles]
+        if len(kept) < len(lines):
+            f.seek(0)
+            f.truncate()
+            f.write("".join(kept))
+
+
+@contextmanager
+def packing_lock(directory: Path) -> Iterator[bool]:
+    """Yields whether this process got to pack `directory`, only one packer appends to its bundles at a time."""
+    with open(directory / LOCK_FILENAME, "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
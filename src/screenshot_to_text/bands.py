@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import contextvars
+import dataclasses
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable
+
+import numpy as np
+
+from screenshot_to_text.layout import Word
+
+
+@dataclass(frozen=True)
+class Band:
+    top: int
+    bottom: int
+
+    @property
+    def height(self) -> int:
+        return self.bottom - self.top
+
+
+def ink_rows(image: np.ndarray) -> np.ndarray:
+    """Boolean row mask of the rows that contain text pixels, whichever polarity the text has."""
+    light_background = image.mean() > 127
+    ink = image < 128 if light_background else image >= 128
+    return ink.any(axis=1)
+
+
+def find_text_segments(rows: np.ndarray, min_gap: int) -> list[Band]:
+    """Splits the row mask into runs of text separated by at least `min_gap` blank rows."""
+    if not rows.any():
+        return []
+
+    # Row indices where the mask flips between text and blank
+    edges = np.flatnonzero(np.diff(np.concatenate(([False], rows, [False])).astype(np.int8)))
+    runs = [Band(int(top), int(bottom)) for top, bottom in zip(edges[::2], edges[1::2])]
+
+    segments = [runs[0]]
+    for run in runs[1:]:
+        if run.top - segments[-1].bottom < min_gap:
+            segments[-1] = Band(segments[-1].top, run.bottom)
+        else:
+            segments.append(run)
+    return segments
+
+
+def find_bands(image: np.ndarray, max_bands: int, min_gap: int) -> list[Band]:
+    """
+    Groups the text segments of `image` into at most `max_bands` bands of similar height,
+    cutting only in the middle of whitespace gaps so no line of text is split.
+    """
+    segments = find_text_segments(ink_rows(image), min_gap)
+    if not segments:
+        return []
+
+    target_height = (segments[-1].bottom - segments[0].top) / max_bands
+    groups = [[segments[0]]]
+    for segment in segments[1:]:
+        if segment.bottom - groups[-1][0].top > target_height and len(groups) < max_bands:
+            groups.append([segment])
+        else:
+            groups[-1].append(segment)
+
+    bands = []
+    for index, group in enumerate(groups):
+        top = 0 if index == 0 else (groups[index - 1][-1].bottom + group[0].top) // 2
+        bottom = image.shape[0] if index == len(groups) - 1 else (group[-1].bottom + groups[index + 1][0].top) // 2
+        bands.append(Band(top, bottom))
+    return bands
+
+
+def to_page_coordinates(words: list[Word], band: Band) -> list[Word]:
+    return [dataclasses.replace(word, top=word.top + band.top) for word in words]
+
+
+def ocr_bands(
+    recognize: Callable[[np.ndarray], list[Word]],
+    image: np.ndarray,
+    bands: list[Band],
+    workers: int,
+) -> list[Word]:
+    """Runs `recognize` on every band concurrently and returns the words in page coordinates, in band order."""
+
+    def recognize_band(band: Band) -> list[Word]:
+        return to_page_coordinates(recognize(image[band.top : band.bottom]), band)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Each band runs in a copy of the caller's context, so its timing spans reach the active profile
+        futures = [pool.submit(contextvars.copy_context().run, recognize_band, band) for band in bands]
+        return [word for future in futures for word in future.result()]
@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import dataclasses
+import glob
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, TextIO
+
+from screenshot_to_text.models.s2tconfig import OCRConfig, PreprocessConfig
+from screenshot_to_text.scheduler import limit_cpus, schedule_ocr
+
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp"}
+# Submitted but unfinished jobs per worker, enough to keep workers busy without holding every input in memory
+PENDING_JOBS_PER_WORKER = 2
+
+
+@dataclass
+class BatchSummary:
+    processed: int = 0
+    skipped: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+
+
+def is_batch_input(path: Path) -> bool:
+    return path.suffix.lower() in IMAGE_SUFFIXES and not path.stem.endswith("_processed")
+
+
+def expand_inputs(patterns: Iterable[str]) -> Iterator[Path]:
+    seen = set()
+
+    for pattern in patterns:
+        path = Path(pattern).expanduser()
+        if path.is_dir():
+            candidates = sorted(p for p in path.rglob("*") if p.is_file())
+        elif glob.has_magic(pattern):
+            candidates = sorted(Path(p) for p in glob.glob(str(path), recursive=True))
+        else:
+            candidates = [path]
+
+        for candidate in candidates:
+            candidate = candidate.absolute()
+            if is_batch_input(candidate) and candidate not in seen:
+                seen.add(candidate)
+                yield candidate
+
+
+def completed_inputs(output_path: Path) -> set[str]:
+    completed = set()
+    if not output_path.exists():
+        return completed
+
+    with open(output_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Partially written line of an interrupted run
+                continue
+            if "error" not in record:
+                completed.add(record["path"])
+
+    return completed
+
+
+def init_worker(threads: int = 1) -> None:
+    # The pool already runs a worker per share of the CPUs, OCR within a worker sticks to its share
+    limit_cpus(threads)
+    # Read once by an in-process libtesseract, tesseract processes get theirs from the scheduler
+    os.environ["OMP_THREAD_LIMIT"] = str(threads)
+
+
+def ocr_file(
+    ocr_config: OCRConfig,
+    path: str,
+    preprocess_config: PreprocessConfig | None = None,
+    include_words: bool = False,
+    data: bytes | None = None,
+) -> dict:
+    """`data` is an encoded image to OCR instead of reading `path`, which then only labels the result."""
+    from screenshot_to_text.app import decode_screenshot, load_screenshot, preprocess_image, processed_image_to_text, recognize_words, uses_in_memory_pipeline
+    from screenshot_to_text.layout import words_to_text
+    from screenshot_to_text.planner import plan_preprocessing
+
+    timings = {}
+    start = time.perf_counter()
+
+    def lap(name: str) -> None:
+        timings[name] = time.perf_counter() - start - sum(timings.values())
+
+    try:
+        image = load_screenshot(Path(path)) if data is None else decode_screenshot(data, path)
+        lap("load")
+
+        plan = plan_preprocessing(image, preprocess_config or PreprocessConfig())
+        lap("plan")
+
+        words = []
+        if not plan.has_text:
+            text = ""
+        else:
+            processed_image = preprocess_image(image, plan)
+            lap("preprocess")
+
+            if not uses_in_memory_pipeline(ocr_config):
+                with tempfile.TemporaryDirectory() as tmp_dir:
+                    text = processed_image_to_text(ocr_config, processed_image, Path(tmp_dir) / "batch_processed.png")
+            elif include_words:
+                words = recognize_words(ocr_config, processed_image)
+                text = words_to_text(words)
+            else:
+                text = processed_image_to_text(ocr_config, processed_image)
+            lap("ocr")
+    except Exception as e:
+        return {"path": path, "error": f"{type(e).__name__}: {e}"}
+
+    timings["total"] = time.perf_counter() - start
+    record = {
+        "path": path,
+        "text": text,
+        "plan": plan.to_dict(),
+        "timings": {name: round(value, 4) for name, value in timings.items()},
+    }
+    if include_words:
+        # Boxes in the coordinates of the input image, not of the cropped and scaled one tesseract saw
+        record["words"] = [dataclasses.asdict(word) for word in plan.to_original(words)]
+    return record
+
+
+def run_batch(
+    ocr_config: OCRConfig,
+    inputs: Iterable[Path],
+    output: TextIO,
+    workers: int | None = None,
+    skip: set[str] | None = None,
+    preprocess_config: PreprocessConfig | None = None,
+    include_words: bool = False,
+) -> BatchSummary:
+    """Runs OCR over `inputs` on a process pool, writing one JSON line per input in completion order."""
+
+    schedule = schedule_ocr(ocr_config, workers=workers)
+    workers = schedule.workers
+    skip = skip or set()
+    summary = BatchSummary()
+    start = time.perf_counter()
+
+    def write_results(futures: Iterable[Future]) -> None:
+        for future in futures:
+            record = future.result()
+            if "error" in record:
+                summary.failed += 1
+            else:
+                summary.processed += 1
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(schedule.threads,)) as pool:
+        pending: set[Future] = set()
+
+        for path in inputs:
+            if str(path) in skip:
+                summary.skipped += 1
+                continue
+
+            if len(pending) >= workers * PENDING_JOBS_PER_WORKER:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                write_results(done)
+
+            pending.add(pool.submit(ocr_file, ocr_config, str(path), preprocess_config, include_words))
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            write_results(done)
+
+    summary.elapsed = time.perf_counter() - start
+    return summary
@@ -1,19 +1,25 @@
 from __future__ import annotations
 
 
+import sys
+from pathlib import Path
+from typing import TYPE_CHECKING
+
 import typer
 import click
 
 
 from screenshot_to_text.config import config_file_path, default_screenshot_directory, get_tool_candidates, read_config, write_config
-from screenshot_to_text.errors import ToolNotFoundError, ConfigOverwriteError, ConfigNotFoundError, InvalidConfigError
+from screenshot_to_text.helpers import resolve_tool
+from screenshot_to_text.errors import ToolNotFoundError, ConfigOverwriteError, ConfigNotFoundError, InvalidConfigError, DaemonNotRunningError
 
-from screenshot_to_text.models.supported_platforms import Tool
-from screenshot_to_text.models.s2tconfig import S2TConfig, ScreenshotConfig, OCRConfig, ClipboardConfig
-from screenshot_to_text.app import capture_screenshot_and_process
+from screenshot_to_text import daemon as s2t_daemon
 from screenshot_to_text.models.tool_type import ToolType
 from screenshot_to_text.constants import APP_NAME
-from pydantic import ValidationError
+
+# pydantic, cv2, numpy and pypdf are imported by the commands that need them, keeping `--help` and the daemon client fast
+if TYPE_CHECKING:
+    from screenshot_to_text.models.supported_platforms import Tool
 
 
 app = typer.Typer(help=APP_NAME)
@@ -33,10 +39,11 @@ def config_choose_tool(tool_type: ToolType) -> Tool:
         return tool_candidates.available[0]
 
     else:
-        return typer.prompt(
+        tool_name = typer.prompt(
             f"Select {tool_type.value} tool",
             type=click.Choice(tool_candidates.available_names),
         )
+        return tool_candidates.available[tool_candidates.available_names.index(tool_name)]
 
 
 @app.command()
@@ -44,9 +51,14 @@ def config(
     force: bool = typer.Option(False, help="Overwrite existing config"),
     keep_screenshots: bool = typer.Option(True, help="Wether to keep screenshots"),
     keep_max_count: int = typer.Option(-1, help="Maximum number of screenshots to keep"),
+    keep_max_bytes: int = typer.Option(-1, help="Maximum total size in bytes of the kept screenshots"),
+    keep_max_age_days: float = typer.Option(-1, help="Delete kept screenshots older than this many days"),
     ocr_enabled: bool = typer.Option(True, help="Enable OCR"),
 ):
 
+    from screenshot_to_text.models.supported_platforms import Tool
+    from screenshot_to_text.models.s2tconfig import S2TConfig, ScreenshotConfig, OCRConfig, ClipboardConfig
+
     config_path = config_file_path()
 
     if config_path.exists() and not force:
@@ -71,18 +83,24 @@ def config(
         screenshot=ScreenshotConfig(
             tool=screenshot_tool.name,
             cmd=screenshot_tool.cmd,
+            executable=resolve_tool(screenshot_tool.cmd[0]),
             keep=keep_screenshots,
             keep_max_count=keep_max_count,
+            keep_max_bytes=keep_max_bytes,
+            keep_max_age_days=keep_max_age_days,
             path=default_screenshot_directory(),
         ),
         ocr=OCRConfig(
             tool=ocr_tool.name,
             enabled=ocr_enabled,
             cmd=ocr_tool.cmd,
+            executable=resolve_tool(ocr_tool.cmd[0]) if ocr_tool.cmd else None,
         ),
         clipboard=ClipboardConfig(
             tool=clipboard_tool.name,
             cmd=clipboard_tool.cmd,
+            executable=resolve_tool(clipboard_tool.cmd[0]),
+            paste_cmd=clipboard_tool.paste_cmd,
         ),
     )
 
@@ -95,15 +113,376 @@ def config(
 def run(
     keep_screenshot: bool | None = typer.Option(None, help="Wether to keep the screenshot, overwrites default config"),
     ocr_enabled: bool | None = typer.Option(None, help="Enable or Disable OCR, overwrites default config"),
+    via_daemon: bool = typer.Option(False, help="Send the request to a running `s2t daemon`, runs in-process if none is listening"),
+    profile: bool = typer.Option(False, help="Print the time spent in each stage to stderr"),
+    repeat: int = typer.Option(1, help="Capture this many regions in a row, 0 keeps capturing until a selection is cancelled"),
+    output: Path | None = typer.Option(None, "--output", "-o", help="Write the text to this file instead of the clipboard"),
+    region: str | None = typer.Option(None, help="Region to capture as WIDTHxHEIGHT+X+Y, overwrites the configured region of the x11 backend"),
 ):
 
+    capture_region = None
+    if region is not None:
+        from screenshot_to_text.x11capture import parse_geometry
+
+        try:
+            capture_region = parse_geometry(region)
+        except ValueError as e:
+            raise typer.BadParameter(str(e), param_hint="--region")
+
+    if repeat != 1 or output is not None:
+        if via_daemon:
+            # The daemon serves single captures, a session selects its regions in this process
+            raise typer.BadParameter("cannot be combined with --repeat or --output", param_hint="--via-daemon")
+        run_capture_session(repeat, output, keep_screenshot, ocr_enabled, capture_region, profile)
+        return
+
+    if via_daemon:
+        try:
+            response = s2t_daemon.run_via_daemon(keep_screenshot, ocr_enabled, profile=profile, region=capture_region)
+            if profile:
+                from screenshot_to_text.timing import format_record
+
+                typer.echo(format_record(response["profile"]), err=True)
+            return
+        except DaemonNotRunningError:
+            pass
+
+    from pydantic import ValidationError
+    from screenshot_to_text.app import capture_screenshot_and_process
+    from screenshot_to_text.timing import format_record, profile_log_path, profiling
+
+    run_profile = None
     try:
         config = read_config(config_file_path())
-        capture_screenshot_and_process(config, keep_screenshot, ocr_enabled)
+        with profiling(profile, profile_log_path() if config.profile.enabled else None) as run_profile:
+            capture_screenshot_and_process(config, keep_screenshot, ocr_enabled, capture_region, detach_full_pass=True)
     except ValidationError as e:
         raise InvalidConfigError(config_file_path()) from e
     except ConfigNotFoundError:
         raise
+    finally:
+        if run_profile is not None and run_profile.record is not None and profile:
+            typer.echo(format_record(run_profile.record), err=True)
+
+
+def run_capture_session(
+    repeat: int,
+    output: Path | None,
+    keep_screenshot: bool | None,
+    ocr_enabled: bool | None,
+    region: tuple[int, int, int, int] | None = None,
+    profile: bool = False,
+):
+    import asyncio
+
+    from pydantic import ValidationError
+    from screenshot_to_text.session import run_session
+    from screenshot_to_text.timing import format_record, profile_log_path, profiling
+
+    try:
+        config = read_config(config_file_path())
+    except ValidationError as e:
+        raise InvalidConfigError(config_file_path()) from e
+
+    if repeat <= 0 and config.screenshot.backend == "x11":
+        raise typer.BadParameter("the x11 backend captures without a selection to cancel, pass a count", param_hint="--repeat")
+
+    def on_error(path: Path, error: Exception):
+        typer.echo(f"Failed to process {path}: {error}", err=True)
+
+    run_profile = None
+    try:
+        with profiling(profile, profile_log_path() if config.profile.enabled else None) as run_profile:
+            if output is None:
+                asyncio.run(run_session(config, repeat, None, keep_screenshot, ocr_enabled, on_error, region))
+                return
+
+            with open(output, "w") as f:
+                asyncio.run(run_session(config, repeat, f, keep_screenshot, ocr_enabled, on_error, region))
+    finally:
+        if run_profile is not None and run_profile.record is not None and profile:
+            typer.echo(format_record(run_profile.record), err=True)
+
+
+@app.command()
+def daemon():
+    """Keep the config and the processing pipeline loaded, serving `s2t run --via-daemon` requests."""
+
+    from pydantic import ValidationError
+
+    config_path = config_file_path()
+
+    try:
+        s2t_daemon.serve(config_path)
+    except ValidationError as e:
+        raise InvalidConfigError(config_path) from e
+
+
+@app.command()
+def cache(
+    clear: bool = typer.Option(False, help="Remove all cached OCR results and reset the counters"),
+):
+    from screenshot_to_text.ocr_cache import OCRCache, ocr_cache_dir
+
+    ocr_cache = OCRCache(ocr_cache_dir())
+
+    if clear:
+        ocr_cache.clear()
+        typer.echo(f"Cleared OCR cache at {ocr_cache.path}")
+        return
+
+    stats = ocr_cache.read_stats()
+    typer.echo(f"OCR cache at {ocr_cache.path}")
+    typer.echo(f"\tentries: {ocr_cache.entry_count()} ({stats.bytes / 1024:.1f} KiB)")
+    typer.echo(f"\thits: {stats.hits}, near hits: {stats.near_hits}, misses: {stats.misses}, hit rate: {stats.hit_rate:.1%}")
+
+
+@app.command()
+def gc():
+    """Rebuild the index of kept screenshots from disk and apply the retention limits, packing old ones in archive mode."""
+    from screenshot_to_text.app import retention_policy
+    from screenshot_to_text.retention import CaptureIndex
+
+    config = read_config(config_file_path())
+    screenshot_dir = Path(config.screenshot.path)
+
+    if not screenshot_dir.exists():
+        typer.echo(f"Screenshot directory {screenshot_dir} does not exist", err=True)
+        return
+
+    packed = 0
+    with CaptureIndex(screenshot_dir) as index:
+        found = index.rebuild()
+        deleted = index.enforce(retention_policy(config.screenshot))
+        if config.screenshot.archive:
+            packed = index.pack(config.screenshot.archive_loose_count, config.screenshot.archive_bundle_bytes)
+        count, size = index.totals()
+
+    typer.echo(f"Indexed {found} screenshots in {screenshot_dir}, deleted {deleted}, packed {packed}")
+    typer.echo(f"\tkept: {count} ({size / 1024 / 1024:.1f} MiB)")
+
+
+@app.command()
+def unpack(
+    stems: list[str] = typer.Argument(..., help="Names of kept screenshots without their extension, e.g. screenshot_20240101_120000_000000"),
+    output: Path = typer.Option(Path("."), "--output", "-o", help="Directory to write the files to"),
+):
+    """Write kept screenshots and their text out of the archive bundles."""
+    from screenshot_to_text.retention import CaptureIndex
+
+    config = read_config(config_file_path())
+    output.mkdir(parents=True, exist_ok=True)
+
+    with CaptureIndex(Path(config.screenshot.path)) as index:
+        for stem in stems:
+            names = index.files(stem)
+            if not names:
+                typer.echo(f"No kept screenshot named {stem}", err=True)
+                raise typer.Exit(code=1)
+            for name in names:
+                (output / name).write_bytes(index.read(stem, name))
+                typer.echo(output / name)
+
+
+@app.command()
+def stats(
+    last: int = typer.Option(100, help="Number of most recent runs to aggregate"),
+):
+    """Print p50/p95/p99 durations per stage over the runs in the profile log."""
+    from screenshot_to_text.timing import aggregate, profile_log_path, read_records
+
+    path = profile_log_path()
+    records = read_records(path, last)
+
+    if not records:
+        typer.echo(f"No runs recorded in {path}, enable them with `enabled = true` in the [profile] section of the config", err=True)
+        raise typer.Exit(code=1)
+
+    typer.echo(f"{len(records)} runs from {path}")
+    typer.echo(f"{'stage':<32}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, summary in sorted(aggregate(records).items(), key=lambda item: -item[1]["p50"]):
+        typer.echo(f"{name:<32}{summary['n']:>6}" + "".join(f"{summary[p] * 1000:>10.1f}" for p in ("p50", "p95", "p99")))
+
+
+@app.command()
+def batch(
+    paths: list[str] = typer.Argument(..., help="Image files, directories or glob patterns"),
+    output: Path | None = typer.Option(None, "--output", "-o", help="JSONL file to append results to, inputs already in it are skipped"),
+    workers: int | None = typer.Option(None, help="Number of worker processes, defaults to the number of CPUs"),
+    words: bool = typer.Option(False, help="Also write the word boxes, in the coordinates of each input image"),
+):
+    from screenshot_to_text.batch import completed_inputs, expand_inputs, run_batch
+
+    config = read_config(config_file_path())
+    inputs = expand_inputs(paths)
+
+    if output is None:
+        summary = run_batch(config.ocr, inputs, sys.stdout, workers, preprocess_config=config.preprocess, include_words=words)
+    else:
+        skip = completed_inputs(output)
+        with open(output, "a") as f:
+            summary = run_batch(config.ocr, inputs, f, workers, skip, config.preprocess, words)
+
+    typer.echo(
+        f"Processed {summary.processed}, skipped {summary.skipped}, failed {summary.failed} in {summary.elapsed:.1f}s",
+        err=True,
+    )
+
+
+@app.command()
+def watch(
+    directory: Path | None = typer.Argument(None, help="Directory to watch, defaults to the configured screenshot path"),
+    settle: float = typer.Option(0.5, help="Seconds a new screenshot must stay unchanged before it is processed"),
+    polling: bool = typer.Option(False, help="Poll the directory even where inotify is available"),
+    poll_interval: float = typer.Option(1.0, help="Seconds between directory scans when polling"),
+):
+    from screenshot_to_text.app import extract_text_to_clipboard
+    from screenshot_to_text.watch import watch_directory
+
+    config = read_config(config_file_path())
+    directory = directory or Path(config.screenshot.path)
+    if not directory.is_dir():
+        typer.echo(f"{directory} is not a directory", err=True)
+        raise typer.Exit(code=1)
+
+    def on_error(path: Path, error: Exception):
+        typer.echo(f"Failed to process {path}: {error}", err=True)
+
+    typer.echo(f"Watching {directory} for new screenshots, press Ctrl+C to stop", err=True)
+
+    try:
+        watch_directory(
+            directory,
+            lambda path: extract_text_to_clipboard(config, path),
+            on_error=on_error,
+            settle=settle,
+            polling=polling,
+            poll_interval=poll_interval,
+        )
+    except KeyboardInterrupt:
+        pass
+
+
+@app.command()
+def record(
+    region: str | None = typer.Option(None, help="Region to record as WIDTHxHEIGHT+X+Y, defaults to the configured region or the whole screen"),
+    fps: float | None = typer.Option(None, help="Frames sampled per second, overwrites the configured rate"),
+    output: Path | None = typer.Option(None, "--output", "-o", help="Append the text changes to this file instead of stdout"),
+    frames: int = typer.Option(0, help="Stop after this many frames, 0 records until interrupted"),
+):
+    """Continuously OCR a screen region (X11), printing the lines that appear with + and the ones that go away with -."""
+    from screenshot_to_text.app import image_to_words
+    from screenshot_to_text.record import Recorder
+    from screenshot_to_text.x11capture import grab_screen, parse_geometry
+
+    config = read_config(config_file_path())
+    try:
+        capture_region = parse_geometry(region) if region is not None else config.screenshot.region
+    except ValueError as e:
+        raise typer.BadParameter(str(e), param_hint="--region")
+
+    record_config = config.record.model_copy(update={"fps": fps}) if fps else config.record
+    typer.echo("Recording, press Ctrl+C to stop", err=True)
+
+    def recognize(image):
+        return image_to_words(config.ocr, image, config.preprocess)
+
+    def record_to(f):
+        try:
+            Recorder(lambda: grab_screen(capture_region), recognize, f, record_config).run(frames)
+        except KeyboardInterrupt:
+            pass
+
+    if output is None:
+        record_to(sys.stdout)
+        return
+
+    with open(output, "a") as f:
+        record_to(f)
+
+
+@app.command()
+def serve(
+    host: str | None = typer.Option(None, help="Address to listen on, overwrites the configured one"),
+    port: int | None = typer.Option(None, help="Port to listen on, overwrites the configured one"),
+    workers: int | None = typer.Option(None, help="Worker processes, overwrites the configured number"),
+    queue_size: int | None = typer.Option(None, help="Requests that may wait for a worker before new ones get 429"),
+    timeout: float | None = typer.Option(None, help="Seconds a request may take before it gets 504"),
+):
+    """Serve OCR with the configured preprocessing and OCR settings over HTTP."""
+    import asyncio
+
+    from screenshot_to_text.server import serve as serve_http
+
+    config = read_config(config_file_path())
+    overrides = {"host": host, "port": port, "workers": workers, "queue_size": queue_size, "timeout": timeout}
+    serve_config = config.serve.model_copy(update={name: value for name, value in overrides.items() if value is not None})
+
+    typer.echo(f"Serving OCR on http://{serve_config.host}:{serve_config.port}, press Ctrl+C to stop", err=True)
+    try:
+        asyncio.run(serve_http(config, serve_config))
+    except KeyboardInterrupt:
+        pass
+
+
+@app.command("tune-threads")
+def tune_threads(
+    images: list[Path] = typer.Argument(None, help="Screenshots to measure on, a rendered screen of text when none are given"),
+    rounds: int = typer.Option(2, help="Times the images are recognized for each setting"),
+    save: bool = typer.Option(True, help="Save the fastest setting to the config"),
+):
+    """Measures OCR throughput with the CPUs split into tesseract processes and threads in each possible way."""
+    from screenshot_to_text.app import load_screenshot, preprocess_image, run_ocr_words
+    from screenshot_to_text.planner import plan_preprocessing
+    from screenshot_to_text.scheduler import available_cpus, sample_page
+    from screenshot_to_text.scheduler import tune_threads as measure
+
+    config_path = config_file_path()
+    config = read_config(config_path)
+    # The thread limit is passed to each tesseract process, an in-process engine reads it only once
+    ocr_config = config.ocr.model_copy(update={"backend": "subprocess"})
+
+    sources = [load_screenshot(path) for path in images] if images else [sample_page()]
+    processed = [preprocess_image(image, plan_preprocessing(image, config.preprocess)) for image in sources]
+
+    typer.echo(f"Measuring on {available_cpus()} CPUs", err=True)
+    results = measure(lambda image: run_ocr_words(ocr_config, image), processed, rounds)
+
+    typer.echo(f"{'processes':>10}{'threads':>10}{'images/s':>10}")
+    for schedule, throughput in results:
+        typer.echo(f"{schedule.workers:>10}{schedule.threads:>10}{throughput:>10.2f}")
+
+    best = results[0][0]
+    if save:
+        write_config(config.model_copy(update={"ocr": config.ocr.model_copy(update={"threads": best.threads})}), config_path)
+        typer.echo(f"Saved {best.threads} threads per tesseract process to {config_path}", err=True)
+
+
+@app.command()
+def plan(
+    paths: list[Path] = typer.Argument(..., help="Images to plan the preprocessing for"),
+):
+    """Print the preprocessing plan chosen for each image as a JSON line."""
+    import json
+    import time
+
+    from screenshot_to_text.app import load_screenshot
+    from screenshot_to_text.models.s2tconfig import PreprocessConfig
+    from screenshot_to_text.planner import plan_preprocessing
+
+    try:
+        preprocess_config = read_config(config_file_path()).preprocess
+    except ConfigNotFoundError:
+        preprocess_config = PreprocessConfig()
+
+    for path in paths:
+        image = load_screenshot(path)
+        start = time.perf_counter()
+        preprocess_plan = plan_preprocessing(image, preprocess_config)
+        elapsed = time.perf_counter() - start
+
+        record = {"path": str(path), "shape": list(image.shape[:2]), "plan": preprocess_plan.to_dict(), "planning_seconds": round(elapsed, 4)}
+        typer.echo(json.dumps(record))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import os
+import signal
+import subprocess
+import tempfile
+from pathlib import Path
+
+from platformdirs import user_runtime_dir
+
+from screenshot_to_text.constants import APP_NAME
+from screenshot_to_text.errors import CommandFailedError, CommandNotFoundError
+from screenshot_to_text.helpers import command_executable, forget_tool
+
+# Time a clipboard tool gets to fail on start-up, a tool still running after it owns the selection
+HANDOFF_GRACE_SECONDS = 0.2
+PIDFILE_NAME = "clipboard.pid"
+
+# Owners started by this process, kept so they are reaped instead of left as zombies in the daemon
+_owners: list[subprocess.Popen] = []
+
+
+def clipboard_pidfile() -> Path:
+    return Path(user_runtime_dir(APP_NAME)) / PIDFILE_NAME
+
+
+def _is_owner(pid: int, executable: str) -> bool:
+    """Whether `pid` still runs `executable`, pids are reused so a bare pid is not enough to go on."""
+    try:
+        cmdline = Path(f"/proc/{pid}/cmdline").read_bytes()
+    except OSError:
+        # No procfs (macOS) or the process is gone, its tools exit right away there anyway
+        return False
+    # Scripts show up with their interpreter first
+    return os.fsencode(executable) in cmdline.split(b"\0")
+
+
+def stop_previous_owner(pidfile: Path) -> None:
+    """Terminates the clipboard owner left running by the previous copy, so owners do not stack up."""
+    try:
+        pid, executable = pidfile.read_text().split(" ", 1)
+        pidfile.unlink()
+    except (OSError, ValueError):
+        return
+
+    if _is_owner(int(pid), executable):
+        try:
+            os.kill(int(pid), signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+
+def hand_off(cmd: list[str], text: str, executable: str | None = None, grace: float = HANDOFF_GRACE_SECONDS, pidfile: Path | None = None) -> None:
+    """
+    Writes `text` to a detached clipboard tool and returns without waiting for it to exit.
+    Errors are reported when the tool fails within `grace` seconds, a tool still running by then owns the selection.
+    """
+    if not cmd:
+        raise CommandNotFoundError("Command not found, cmd is None")
+
+    executable = command_executable(cmd[0], executable)
+    if not executable:
+        raise CommandNotFoundError(f"Command not found: {cmd[0]}")
+
+    pidfile = pidfile or clipboard_pidfile()
+    stop_previous_owner(pidfile)
+    _owners[:] = [owner for owner in _owners if owner.poll() is None]
+
+    # A file rather than a pipe, the owner may outlive this process and must not get EPIPE writing to stderr
+    with tempfile.TemporaryFile() as stderr:
+        try:
+            process = subprocess.Popen(
+                [executable] + cmd[1:],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
+                stderr=stderr,
+                start_new_session=True,
+            )
+        except (FileNotFoundError, PermissionError) as e:
+            forget_tool(cmd[0])
+            raise CommandNotFoundError(f"Command not found: {cmd[0]}") from e
+
+        try:
+            process.stdin.write(text.encode())
+            process.stdin.close()
+        except BrokenPipeError:
+            # The tool exited before reading everything, its exit code and stderr say why
+            pass
+
+        try:
+            return_code = process.wait(grace)
+        except subprocess.TimeoutExpired:
+            _owners.append(process)
+            pidfile.parent.mkdir(parents=True, exist_ok=True)
+            pidfile.write_text(f"{process.pid} {executable}")
+            return
+
+        if return_code:
+            stderr.seek(0)
+            raise CommandFailedError(cmd=cmd, return_code=return_code, stdout="", stderr=stderr.read().decode("utf-8", errors="replace"))
@@ -5,22 +5,34 @@ from pathlib import Path
 import tomli_w
 from platformdirs import user_config_dir, user_pictures_path
 from importlib import resources
+from functools import cache
 import screenshot_to_text.data as data
-from screenshot_to_text.models.supported_platforms import SupportedPlatforms, Tool
-from screenshot_to_text.models.s2tconfig import S2TConfig
 from screenshot_to_text.models.tool_type import ToolType
 from dataclasses import dataclass
+from typing import TYPE_CHECKING
 from screenshot_to_text.helpers import get_platform, system_has, load_from_yaml
 from screenshot_to_text.errors import ConfigNotFoundError
 from screenshot_to_text.constants import APP_NAME
+from screenshot_to_text.snapshot import cached_parse
+
+if TYPE_CHECKING:
+    from screenshot_to_text.models.supported_platforms import SupportedPlatforms, Tool
+    from screenshot_to_text.models.s2tconfig import S2TConfig
 
-yaml_config_path = resources.files(data)
 yaml_resources = resources.files(data)
 
 supported_platforms_yaml = yaml_resources / "supported_platforms.yaml"
-supported_platforms_dict = load_from_yaml(supported_platforms_yaml)
 
-supported_platforms = SupportedPlatforms.model_validate(supported_platforms_dict)
+
+def _parse_supported_platforms() -> SupportedPlatforms:
+    from screenshot_to_text.models.supported_platforms import SupportedPlatforms
+
+    return SupportedPlatforms.model_validate(load_from_yaml(supported_platforms_yaml))
+
+
+@cache
+def get_supported_platforms() -> SupportedPlatforms:
+    return cached_parse("supported_platforms", supported_platforms_yaml, _parse_supported_platforms)
 
 
 @dataclass
@@ -43,20 +55,27 @@ def default_screenshot_directory() -> Path:
     return user_pictures_path() / APP_NAME / "screenshots"
 
 
-def read_config(config_path: Path) -> S2TConfig:
-    if not config_path.exists():
-        raise ConfigNotFoundError(config_path)
+def _parse_config(config_path: Path) -> S2TConfig:
+    from screenshot_to_text.models.s2tconfig import S2TConfig
 
     with open(config_path, "rb") as f:
         config_data = tomllib.load(f)
     return S2TConfig.model_validate(config_data)
 
 
+def read_config(config_path: Path) -> S2TConfig:
+    if not config_path.exists():
+        raise ConfigNotFoundError(config_path)
+
+    return cached_parse("config", config_path, lambda: _parse_config(config_path))
+
+
 def write_config(config: S2TConfig, config_path: Path) -> None:
     config_dir = config_path.parent
     config_dir.mkdir(parents=True, exist_ok=True)
 
-    config_data = config.model_dump(mode="json")
+    # TOML has no null, unset optional fields are left out and fall back to their defaults
+    config_data = config.model_dump(mode="json", exclude_none=True)
 
     with open(config_path, "wb") as f:
         tomli_w.dump(config_data, f)
@@ -67,9 +86,11 @@ def get_tool_candidates(tool_type: ToolType, platform: str | None = None) -> Too
     if not platform:
         platform = get_platform()
 
+    available, alternative = get_supported_platforms().get(platform).get(tool_type).partition_tools(system_has)
+
     tool_candidates = ToolCandidates(
-        available=supported_platforms.get(platform).get(tool_type).available_tools(system_has),
-        alternative=supported_platforms.get(platform).get(tool_type).alternative_tools(system_has),
+        available=available,
+        alternative=alternative,
         available_names=[],
         alternative_names=[],
     )
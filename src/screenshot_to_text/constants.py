@@ -1 +1,3 @@
 APP_NAME = "screenshot-to-text"
+# Captures s2t writes are named SCREENSHOT_PREFIX + the capture time
+SCREENSHOT_PREFIX = "screenshot_"
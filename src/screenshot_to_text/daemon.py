@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import functools
+import json
+import os
+import signal
+import socket
+import socketserver
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable
+
+from platformdirs import user_runtime_dir
+
+from screenshot_to_text.constants import APP_NAME
+from screenshot_to_text.errors import DaemonAlreadyRunningError, DaemonNotRunningError, DaemonRequestError
+
+CONNECT_TIMEOUT_SECONDS = 0.5
+
+
+def socket_path() -> Path:
+    return Path(user_runtime_dir(APP_NAME)) / "s2t.sock"
+
+
+@dataclass
+class ConfigCache:
+    """Keeps the parsed config in memory and only re-reads it when the file changes."""
+
+    config_path: Path
+    _key: tuple[int, int] | None = None
+    _config: Any = None
+
+    def get(self):
+        from screenshot_to_text.config import read_config
+
+        try:
+            stat = self.config_path.stat()
+            key = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            key = None
+
+        if self._config is None or key != self._key:
+            self._config = read_config(self.config_path)
+            self._key = key
+
+        return self._config
+
+
+def _encode(message: dict) -> bytes:
+    return json.dumps(message).encode() + b"\n"
+
+
+def _error_response(error: Exception) -> dict:
+    return {"ok": False, "error": type(error).__name__, "message": str(error)}
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    server: DaemonServer
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+
+        try:
+            request = json.loads(line)
+            response = self.server.dispatch(request)
+        except Exception as e:
+            response = _error_response(e)
+
+        self.wfile.write(_encode(response))
+
+
+class DaemonServer(socketserver.UnixStreamServer):
+    """
+    Serves capture requests one at a time over a Unix domain socket.
+    Captures are interactive, so requests are deliberately not handled concurrently.
+    """
+
+    def __init__(self, path: Path, config_cache: ConfigCache, run_capture: Callable[..., None]):
+        self.config_cache = config_cache
+        self.run_capture = run_capture
+        super().__init__(str(path), _RequestHandler)
+
+    def dispatch(self, request: dict) -> dict:
+        command = request.get("command")
+
+        if command == "ping":
+            return {"ok": True, "pid": os.getpid()}
+
+        if command == "run":
+            from screenshot_to_text.timing import profile_log_path, profiling
+
+            config = self.config_cache.get()
+            with profiling(request.get("profile", False), profile_log_path() if config.profile.enabled else None, one_shot=False) as profile:
+                region = request.get("region")
+                self.run_capture(config, request.get("keep_screenshot"), request.get("ocr_enabled"), tuple(region) if region else None)
+
+            if request.get("profile"):
+                return {"ok": True, "profile": profile.record}
+            return {"ok": True}
+
+        raise ValueError(f"Unknown daemon command: {command}")
+
+
+def daemon_is_running(path: Path) -> bool:
+    try:
+        send_request({"command": "ping"}, path)
+    except DaemonNotRunningError:
+        return False
+    return True
+
+
+def prepare_socket_path(path: Path) -> None:
+    path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+
+    if not path.exists():
+        return
+
+    if daemon_is_running(path):
+        raise DaemonAlreadyRunningError(path)
+
+    # Left behind by a daemon that did not shut down cleanly
+    path.unlink(missing_ok=True)
+
+
+def _raise_system_exit(signum, frame):
+    raise SystemExit(0)
+
+
+def serve(config_path: Path, path: Path | None = None) -> None:
+    # Importing the pipeline here keeps cv2, numpy and pypdf loaded for every request
+    from screenshot_to_text.app import capture_screenshot_and_process
+
+    path = path or socket_path()
+    prepare_socket_path(path)
+
+    config_cache = ConfigCache(config_path)
+    config_cache.get()
+
+    # A request is answered once the draft is on the clipboard, the full pass finishes in a detached process
+    server = DaemonServer(path, config_cache, functools.partial(capture_screenshot_and_process, detach_full_pass=True))
+    os.chmod(path, 0o600)
+    signal.signal(signal.SIGTERM, _raise_system_exit)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        path.unlink(missing_ok=True)
+
+
+def send_request(request: dict, path: Path | None = None) -> dict:
+    path = path or socket_path()
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(CONNECT_TIMEOUT_SECONDS)
+        try:
+            sock.connect(str(path))
+        except (FileNotFoundError, ConnectionRefusedError, socket.timeout) as e:
+            raise DaemonNotRunningError(path) from e
+
+        # The capture itself is interactive, so wait for as long as the user takes
+        sock.settimeout(None)
+        sock.sendall(_encode(request))
+
+        with sock.makefile("rb") as f:
+            line = f.readline()
+    finally:
+        sock.close()
+
+    if not line:
+        raise DaemonRequestError("Daemon closed the connection without a response.")
+
+    response = json.loads(line)
+    if not response.get("ok"):
+        raise DaemonRequestError(f"{response.get('error')}: {response.get('message')}")
+
+    return response
+
+
+def run_via_daemon(
+    keep_screenshot: bool | None = None,
+    ocr_enabled: bool | None = None,
+    path: Path | None = None,
+    profile: bool = False,
+    region: tuple[int, int, int, int] | None = None,
+) -> dict:
+    request = {"command": "run", "keep_screenshot": keep_screenshot, "ocr_enabled": ocr_enabled, "profile": profile, "region": region}
+    return send_request(request, path)
@@ -45,6 +45,18 @@ class ScreenshotPathNotFoundError(S2TError):
         super().__init__(message)
 
 
+class ScreenshotReadError(S2TError):
+    """Raised when the screenshot file cannot be read, e.g. when the capture was cancelled."""
+
+    def __init__(self, screenshot_path: Path):
+        self.screenshot_path = screenshot_path
+        super().__init__(f"Could not read screenshot at {screenshot_path}.")
+
+
+class ScreenCaptureError(S2TError):
+    """Raised when the screen cannot be read by the native capture backend."""
+
+
 class ConfigurationError(S2TError):
     """Base class for configuration errors."""
 
@@ -103,3 +115,40 @@ class CommandFailedError(CommandError):
         self.stderr = stderr
         message = f"Command `{' '.join(cmd)}` failed with exit code {return_code}.\nStderr: {stderr}\nStdout: {stdout}"
         super().__init__(message)
+
+
+class CommandTimeoutError(CommandError):
+    """Raised when a command does not finish within its timeout."""
+
+    def __init__(self, cmd: list[str], timeout: float):
+        self.cmd = cmd
+        self.timeout = timeout
+        super().__init__(f"Command `{' '.join(cmd)}` did not finish within {timeout}s.")
+
+
+class OCREngineError(S2TError):
+    """Raised when the in-process tesseract engine cannot be loaded or fails to recognize an image."""
+
+
+class DaemonError(S2TError):
+    """Base class for daemon errors."""
+
+
+class DaemonNotRunningError(DaemonError):
+    """Raised when no daemon is listening on the socket."""
+
+    def __init__(self, socket_path: Path):
+        self.socket_path = socket_path
+        super().__init__(f"No s2t daemon is listening on {socket_path}.")
+
+
+class DaemonAlreadyRunningError(DaemonError):
+    """Raised when a daemon is already listening on the socket."""
+
+    def __init__(self, socket_path: Path):
+        self.socket_path = socket_path
+        super().__init__(f"An s2t daemon is already listening on {socket_path}.")
+
+
+class DaemonRequestError(DaemonError):
+    """Raised when the daemon fails to handle a request."""
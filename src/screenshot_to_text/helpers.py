@@ -3,7 +3,6 @@ from __future__ import annotations
 import os
 import sys
 import shutil
-import yaml
 from typing import Dict, TYPE_CHECKING
 
 if TYPE_CHECKING:
@@ -11,17 +10,48 @@ if TYPE_CHECKING:
 
 
 def load_from_yaml(path: Traversable) -> Dict:
+    import yaml
 
     with path.open("r") as f:
         data = yaml.safe_load(f)
     return data
 
 
-def system_has(tool: str | None = None) -> bool:
+# Resolved executable paths, keyed on the tool name and the PATH they were resolved against
+_resolved_tools: Dict[tuple[str, str], str | None] = {}
+
+
+def path_fingerprint() -> str:
+    return os.environ.get("PATH", os.defpath)
+
+
+def resolve_tool(tool: str | None = None) -> str | None:
     if not tool:
-        return False
-    else:
-        return shutil.which(tool) is not None
+        return None
+
+    key = (tool, path_fingerprint())
+    if key not in _resolved_tools:
+        _resolved_tools[key] = shutil.which(tool)
+    return _resolved_tools[key]
+
+
+def command_executable(command: str, executable: str | None = None) -> str | None:
+    """
+    The stored `executable` while it is still the program `command` names, `command` resolved on PATH otherwise,
+    so editing `cmd` in the config is not overridden by the path stored for the previous tool.
+    """
+    if executable and os.path.basename(executable) == os.path.basename(command) and (os.sep not in command or executable == command):
+        return executable
+    return resolve_tool(command)
+
+
+def forget_tool(tool: str) -> None:
+    for key in [key for key in _resolved_tools if key[0] == tool]:
+        del _resolved_tools[key]
+
+
+def system_has(tool: str | None = None) -> bool:
+    return resolve_tool(tool) is not None
 
 
 def linux_session_type() -> str:
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import re
+import statistics
+from dataclasses import dataclass
+from html.parser import HTMLParser
+
+TSV_WORD_LEVEL = 5
+TSV_COLUMNS = 12
+
+_BBOX_PATTERN = re.compile(r"bbox (\d+) (\d+) (\d+) (\d+)")
+_CONFIDENCE_PATTERN = re.compile(r"x_wconf (\d+)")
+
+
+@dataclass(frozen=True)
+class Word:
+    text: str
+    left: int
+    top: int
+    width: int
+    height: int
+    conf: float = -1.0
+
+    @property
+    def right(self) -> int:
+        return self.left + self.width
+
+    @property
+    def bottom(self) -> int:
+        return self.top + self.height
+
+    @property
+    def center_y(self) -> float:
+        return self.top + self.height / 2
+
+
+def parse_tsv(tsv: str) -> list[Word]:
+    words = []
+
+    for row in tsv.splitlines()[1:]:
+        columns = row.split("\t", TSV_COLUMNS - 1)
+        if len(columns) < TSV_COLUMNS or int(columns[0]) != TSV_WORD_LEVEL:
+            continue
+
+        text = columns[11].strip()
+        if not text:
+            continue
+
+        left, top, width, height = (int(value) for value in columns[6:10])
+        words.append(Word(text=text, left=left, top=top, width=width, height=height, conf=float(columns[10])))
+
+    return words
+
+
+class _HOCRWordParser(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.words: list[Word] = []
+        self._title: str | None = None
+        self._text: list[str] = []
+        self._depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        attributes = dict(attrs)
+
+        if self._title is not None:
+            self._depth += 1
+        elif "ocrx_word" in (attributes.get("class") or "").split():
+            self._title = attributes.get("title") or ""
+            self._text = []
+            self._depth = 0
+
+    def handle_endtag(self, tag):
+        if self._title is None:
+            return
+        if self._depth:
+            self._depth -= 1
+            return
+
+        bbox = _BBOX_PATTERN.search(self._title)
+        text = "".join(self._text).strip()
+        if bbox and text:
+            x0, y0, x1, y1 = (int(value) for value in bbox.groups())
+            confidence = _CONFIDENCE_PATTERN.search(self._title)
+            self.words.append(
+                Word(
+                    text=text,
+                    left=x0,
+                    top=y0,
+                    width=x1 - x0,
+                    height=y1 - y0,
+                    conf=float(confidence.group(1)) if confidence else -1.0,
+                )
+            )
+        self._title = None
+
+    def handle_data(self, data):
+        if self._title is not None:
+            self._text.append(data)
+
+
+def parse_hocr(hocr: str) -> list[Word]:
+    parser = _HOCRWordParser()
+    parser.feed(hocr)
+    parser.close()
+    return parser.words
+
+
+def group_lines(words: list[Word]) -> list[list[Word]]:
+    """
+    Groups words into visual lines by vertical position rather than by tesseract's line ids,
+    so that words in separate columns (blocks) at the same height end up on the same line.
+    """
+    if not words:
+        return []
+
+    tolerance = statistics.median(word.height for word in words) / 2
+
+    lines: list[list[Word]] = []
+    line_center = 0.0
+    for word in sorted(words, key=lambda w: w.center_y):
+        if lines and word.center_y - line_center <= tolerance:
+            lines[-1].append(word)
+            line_center = statistics.fmean(w.center_y for w in lines[-1])
+        else:
+            lines.append([word])
+            line_center = word.center_y
+
+    return [sorted(line, key=lambda w: w.left) for line in lines]
+
+
+def words_to_text(words: list[Word]) -> str:
+    """
+    Rebuilds the text of a page from word boxes, keeping indentation, column alignment and blank lines
+    by mapping pixel positions onto a character grid.
+    """
+    lines = group_lines(words)
+    if not lines:
+        return ""
+
+    char_width = statistics.median(word.width / len(word.text) for word in words) or 1.0
+    origin = min(word.left for word in words)
+
+    centers = [statistics.fmean(word.center_y for word in line) for line in lines]
+    pitches = [b - a for a, b in zip(centers, centers[1:])]
+    line_height = statistics.median(word.height for word in words)
+    line_pitch = max(statistics.median_low(pitches), line_height) if pitches else line_height
+
+    text_lines = []
+    for index, line in enumerate(lines):
+        if index:
+            blank_lines = round((centers[index] - centers[index - 1]) / line_pitch) - 1
+            text_lines.extend([""] * max(blank_lines, 0))
+
+        chars: list[str] = []
+        for word in line:
+            column = round((word.left - origin) / char_width)
+            if chars:
+                column = max(column, len(chars) + 1)
+            chars.extend(" " * (column - len(chars)))
+            chars.extend(word.text)
+
+        text_lines.append("".join(chars).rstrip())
+
+    return "\n".join(text_lines)
@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class OCROutput(str, Enum):
+    TSV = "tsv"
+    HOCR = "hocr"
+    PDF = "pdf"
@@ -1,8 +1,9 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import List
+from typing import List, Literal, Tuple
 from pydantic import BaseModel
+from screenshot_to_text.models.ocr_output import OCROutput
 
 
 class ScreenshotConfig(BaseModel):
@@ -11,20 +12,122 @@ class ScreenshotConfig(BaseModel):
     keep: bool
     keep_max_count: int
     path: Path
+    executable: str | None = None
+    # -1 disables the limit
+    keep_max_bytes: int = -1
+    keep_max_age_days: float = -1
+    # "x11" reads the pixels from the X server instead of running `cmd`
+    backend: Literal["tool", "x11"] = "tool"
+    # (x, y, width, height) captured by the x11 backend, the whole screen when unset
+    region: Tuple[int, int, int, int] | None = None
+    # Exit statuses the tool reports a cancelled selection with (flameshot, gnome-screenshot and screencapture exit with 1),
+    # other failures are errors
+    cancel_return_codes: List[int] = [1]
+    # Keeps the capture with its text instead of the processed image and PDF, older captures packed into bundles
+    archive: bool = False
+    # Newest captures left as plain files in archive mode
+    archive_loose_count: int = 32
+    # Size at which the next bundle is started
+    archive_bundle_bytes: int = 64 * 1024 * 1024
+
+
+class OCRCacheConfig(BaseModel):
+    # Off by default, the cache keeps the text of every capture on disk even when screenshots are not kept
+    enabled: bool = False
+    max_bytes: int = 16 * 1024 * 1024
+    near_match: bool = False
+    near_match_distance: int = 2
+
+
+class DraftPassConfig(BaseModel):
+    # Copies a quick low-quality result to the clipboard first, replaced by the full result once it is ready
+    enabled: bool = False
+    scale: float = 1.0
+    # Page segmentation mode of the draft pass, the full pass one when unset
+    psm: int | None = None
+    # Seconds the draft pass may take before it is given up on
+    timeout: float = 1.0
 
 
 class OCRConfig(BaseModel):
     tool: str | None
     enabled: bool
     cmd: List[str] | None
+    executable: str | None = None
+    output: OCROutput = OCROutput.TSV
+    in_memory: bool = True
+    cache: OCRCacheConfig = OCRCacheConfig()
+    band_split_min_pixels: int = 4_000_000
+    band_min_gap: int = 8
+    band_workers: int | None = None
+    # OMP_THREAD_LIMIT of each tesseract process, picked per job from the CPUs and the image size when unset, see `s2t tune-threads`
+    threads: int | None = None
+    # Image pixels per tesseract thread below which more threads only add overhead
+    min_pixels_per_thread: int = 1_000_000
+    draft: DraftPassConfig = DraftPassConfig()
+    # "libtesseract" recognizes in-process with an engine kept loaded, falling back to "subprocess" when unavailable
+    backend: Literal["subprocess", "libtesseract"] = "subprocess"
 
 
 class ClipboardConfig(BaseModel):
     tool: str
     cmd: List[str]
+    paste_cmd: List[str] | None = None
+    executable: str | None = None
+
+
+class PreprocessConfig(BaseModel):
+    adaptive: bool = True
+    scale: float = 3.0
+    target_glyph_height: int = 32
+    min_scale: float = 1.0
+    max_scale: float = 4.0
+    max_pixels: int = 40_000_000
+    # Ceiling for the buffers preprocessing allocates next to the capture, the image encoded for tesseract included, -1 for none
+    max_bytes: int = -1
+    dilate: bool = True
+    # Run in the order crop, denoise, resize, threshold, dilate whichever are listed
+    stages: List[Literal["crop", "denoise", "resize", "threshold", "dilate"]] = ["crop", "resize", "threshold", "dilate"]
+    # Margin in pixels of the original image kept around the text by the crop stage
+    crop_padding: int = 8
+
+
+class ProfileConfig(BaseModel):
+    # Appends the stage timings of every run to a JSONL log, see `s2t stats`
+    enabled: bool = False
+
+
+class RecordConfig(BaseModel):
+    # Frames sampled per second by `s2t record`
+    fps: float = 2.0
+    # Gray level change below which a pixel counts as unchanged
+    pixel_threshold: int = 24
+    # Frames with fewer changed pixels than this are skipped, a blinking cursor or a clock tick is not worth an OCR pass
+    min_changed_pixels: int = 16
+    # Blank rows that separate two lines of text
+    line_gap: int = 1
+    line_padding: int = 2
+
+
+class ServeConfig(BaseModel):
+    host: str = "127.0.0.1"
+    port: int = 8765
+    # Worker processes running OCR requests, the number of CPUs when unset
+    workers: int | None = None
+    # Requests waiting for a worker beyond which new ones are answered with 429
+    queue_size: int = 32
+    # Seconds a request may wait and run before it is answered with 504
+    timeout: float = 30.0
+    max_body_bytes: int = 32 * 1024 * 1024
+    # Accept {"path": ...} requests for images on this machine, off as any client could read any image the user can
+    allow_paths: bool = False
 
 
 class S2TConfig(BaseModel):
     screenshot: ScreenshotConfig
     ocr: OCRConfig
     clipboard: ClipboardConfig
+    preprocess: PreprocessConfig = PreprocessConfig()
+    profile: ProfileConfig = ProfileConfig()
+    record: RecordConfig = RecordConfig()
+    serve: ServeConfig = ServeConfig()
@@ -2,13 +2,15 @@ from __future__ import annotations
 
 
 from screenshot_to_text.models.dict_root_model import DictRootModel
-from typing import List
+from typing import List, Tuple
 from pydantic import BaseModel
 
 
 class Tool(BaseModel):
     name: str
     cmd: List[str]
+    # Clipboard tools only, prints the current clipboard contents
+    paste_cmd: List[str] | None = None
 
 
 class Tools(DictRootModel[Tool]):
@@ -23,12 +25,17 @@ class Tools(DictRootModel[Tool]):
     def empty_child(self) -> Tool:
         return Tool(name="", cmd=[])
 
+    def partition_tools(self, filter_func) -> Tuple[List[Tool], List[Tool]]:
+        available_tools, alternative_tools = [], []
+        for tool in self.tool_infos:
+            (available_tools if filter_func(tool.name) else alternative_tools).append(tool)
+        return available_tools, alternative_tools
+
     def available_tools(self, filter_func) -> List[Tool]:
-        return [tool for tool in self.tool_infos if filter_func(tool.name)]
+        return self.partition_tools(filter_func)[0]
 
     def alternative_tools(self, filter_func) -> List[Tool]:
-        available_tools = self.available_tools(filter_func)
-        return [tool for tool in self.tool_infos if tool not in available_tools]
+        return self.partition_tools(filter_func)[1]
 
 
 class ToolTypes(DictRootModel[Tools]):
@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import atexit
+import fcntl
+import hashlib
+import json
+import os
+from contextlib import contextmanager, suppress
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import cv2
+import numpy as np
+from platformdirs import user_cache_dir
+
+from screenshot_to_text.constants import APP_NAME
+
+ENTRY_SUFFIX = ".txt"
+STATS_FILE = "stats.json"
+# Serializes the read-modify-write of stats.json between processes (CLI, daemon, batch workers)
+STATS_LOCK_FILE = "stats.lock"
+# Evicting down to a bit below the cap keeps every put from triggering a directory scan
+EVICTION_TARGET_RATIO = 0.9
+# Lookups counted in memory before stats.json is rewritten, a hit then costs no write
+STATS_FLUSH_LOOKUPS = 32
+
+
+def ocr_cache_dir() -> Path:
+    return Path(user_cache_dir(APP_NAME)) / "ocr"
+
+
+def perceptual_hash(image: np.ndarray) -> int:
+    """64 bit difference hash, robust to small rendering differences between captures of the same content."""
+    grayscale_image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(grayscale_image, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    near_hits: int = 0
+    misses: int = 0
+    bytes: int = 0
+
+    @property
+    def lookups(self) -> int:
+        return self.hits + self.near_hits + self.misses
+
+    @property
+    def hit_rate(self) -> float:
+        return (self.hits + self.near_hits) / self.lookups if self.lookups else 0.0
+
+    def add(self, other: CacheStats) -> None:
+        for name, count in asdict(other).items():
+            setattr(self, name, getattr(self, name) + count)
+
+
+# Counts of this process not written to stats.json yet, per cache directory
+_pending: dict[Path, CacheStats] = {}
+
+
+@atexit.register
+def _flush_pending() -> None:
+    for path in list(_pending):
+        with suppress(OSError):
+            OCRCache(path).flush()
+
+
+# A forked process (the detached full pass) would write the counts of its parent a second time
+os.register_at_fork(after_in_child=_pending.clear)
+
+
+class OCRCache:
+    """
+    Content-addressed OCR results, one text file per entry named `<key>.<perceptual hash>.txt`. The key starts with
+    a digest of the OCR parameters and the image size, near matches are only looked for among entries sharing both.
+    Recency is tracked with the file mtime, the least recently used entries are evicted past `max_bytes`.
+    """
+
+    def __init__(self, path: Path, max_bytes: int | None = None, near_match_distance: int | None = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.near_match_distance = near_match_distance
+
+    @staticmethod
+    def key(image: np.ndarray, params: Iterable[str]) -> str:
+        params_digest = hashlib.blake2b(digest_size=8)
+        for param in params:
+            params_digest.update(b"\0" + param.encode())
+
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{image.shape}{image.dtype}".encode())
+        digest.update(np.ascontiguousarray(image).data)
+        digest.update(params_digest.digest())
+        return f"{params_digest.hexdigest()}_{'x'.join(map(str, image.shape))}_{digest.hexdigest()}"
+
+    @staticmethod
+    def _near_match_scope(key: str) -> str:
+        # The parameters and image size part of a key
+        return key.rpartition("_")[0]
+
+    def _entry_path(self, key: str, phash: int) -> Path:
+        return self.path / f"{key}.{phash:016x}{ENTRY_SUFFIX}"
+
+    def _entries(self) -> list[Path]:
+        return list(self.path.glob(f"*{ENTRY_SUFFIX}"))
+
+    def _read_stored_stats(self) -> CacheStats:
+        try:
+            with open(self.path / STATS_FILE) as f:
+                return CacheStats(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return CacheStats()
+
+    def read_stats(self) -> CacheStats:
+        stats = self._read_stored_stats()
+        if self.path in _pending:
+            stats.add(_pending[self.path])
+        return stats
+
+    def _write_stats(self, stats: CacheStats) -> None:
+        tmp_path = self.path / f"{STATS_FILE}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(asdict(stats), f)
+        os.replace(tmp_path, self.path / STATS_FILE)
+
+    @contextmanager
+    def _update_stats(self) -> Iterator[CacheStats]:
+        """The stored stats, written back when the block ends, with other processes kept out in between."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        with open(self.path / STATS_LOCK_FILE, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            stats = self._read_stored_stats()
+            yield stats
+            self._write_stats(stats)
+
+    def _record(self, **counts: int) -> None:
+        pending = _pending.setdefault(self.path, CacheStats())
+        pending.add(CacheStats(**counts))
+        if pending.lookups >= STATS_FLUSH_LOOKUPS:
+            self.flush()
+
+    def flush(self) -> None:
+        """Writes the counts this process gathered to stats.json."""
+        pending = _pending.pop(self.path, None)
+        if pending is None:
+            return
+        with self._update_stats() as stats:
+            stats.add(pending)
+
+    def _find_near_match(self, key: str, phash: int) -> Path | None:
+        best_path, best_distance = None, self.near_match_distance + 1
+        for entry in self.path.glob(f"{self._near_match_scope(key)}_*{ENTRY_SUFFIX}"):
+            _, _, entry_phash = entry.name.removesuffix(ENTRY_SUFFIX).partition(".")
+            distance = (int(entry_phash, 16) ^ phash).bit_count()
+            if distance < best_distance:
+                best_path, best_distance = entry, distance
+        return best_path
+
+    def get(self, key: str, image: np.ndarray) -> str | None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        phash = perceptual_hash(image)
+
+        entry = self._entry_path(key, phash)
+        counter = "hits"
+        if not entry.exists() and self.near_match_distance is not None:
+            entry = self._find_near_match(key, phash)
+            counter = "near_hits"
+
+        text = None
+        if entry is not None:
+            try:
+                text = entry.read_text()
+                os.utime(entry)
+            except FileNotFoundError:
+                # Evicted by another process in the meantime
+                text = None
+
+        self._record(**{counter if text is not None else "misses": 1})
+        return text
+
+    def put(self, key: str, image: np.ndarray, text: str) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        entry = self._entry_path(key, perceptual_hash(image))
+        try:
+            previous_size = entry.stat().st_size
+        except FileNotFoundError:
+            previous_size = 0
+        entry.write_text(text)
+
+        # A miss already wrote the entry, the counts go along with it
+        self._record(bytes=entry.stat().st_size - previous_size)
+        self.flush()
+        stats = self._read_stored_stats()
+        if self.max_bytes is not None and stats.bytes > self.max_bytes:
+            self.evict(int(self.max_bytes * EVICTION_TARGET_RATIO))
+
+    def evict(self, target_bytes: int) -> None:
+        entries = []
+        for entry in self._entries():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, entry))
+
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in entries:
+            if total <= target_bytes:
+                break
+            entry.unlink(missing_ok=True)
+            total -= size
+
+        pending = _pending.pop(self.path, None)
+        with self._update_stats() as stats:
+            if pending is not None:
+                stats.add(pending)
+            stats.bytes = total
+
+    def clear(self) -> None:
+        for entry in self._entries():
+            entry.unlink(missing_ok=True)
+        _pending.pop(self.path, None)
+        (self.path / STATS_FILE).unlink(missing_ok=True)
+
+    def entry_count(self) -> int:
+        return len(self._entries())
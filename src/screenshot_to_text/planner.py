@@ -0,0 +1,286 @@
+from __future__ import annotations
+
+import dataclasses
+import math
+from dataclasses import asdict, dataclass
+from fractions import Fraction
+
+import cv2
+import numpy as np
+
+from screenshot_to_text.layout import Word
+from screenshot_to_text.models.s2tconfig import PreprocessConfig
+
+INTERPOLATIONS = {
+    "nearest": cv2.INTER_NEAREST,
+    "linear": cv2.INTER_LINEAR,
+    "cubic": cv2.INTER_CUBIC,
+    "area": cv2.INTER_AREA,
+}
+
+# Scales this close to 1 are not worth a resize
+SCALE_TOLERANCE = 0.1
+# Fraction of pixels the two most common gray levels must cover for an image to count as bilevel
+BILEVEL_RATIO = 0.99
+# Components taller than this fraction of the image are boxes, borders or images rather than glyphs
+MAX_GLYPH_HEIGHT_RATIO = 0.5
+MIN_GLYPH_HEIGHT = 3
+# Gradient magnitude below which an edge is noise or compression artifacts rather than text
+MIN_EDGE_CONTRAST = 32
+# Edge runs longer than this fraction of the capture are borders and separators of the UI
+MIN_LINE_RATIO = 0.25
+# Shorter runs may be glyph strokes, which matters for small captures
+MIN_LINE_LENGTH = 48
+# Fewer edge pixels than this and the capture is considered empty
+MIN_TEXT_EDGE_PIXELS = 16
+# Planned scales are multiples of 1/SCALE_STEPS, which keeps the bands the resize runs in short (see resize_bands)
+SCALE_STEPS = 16
+# Source rows resized at a time, the same bands with or without a memory ceiling so the output does not depend on it
+RESIZE_BAND_ROWS = 128
+# Scales that are no fraction with a denominator up to this are resized in a single band
+MAX_BAND_DENOMINATOR = 1000
+# Rows the 2x2 dilation reads past a strip, kept from one strip to the next
+DILATE_HALO_ROWS = 1
+_GRADIENT_KERNEL = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+
+
+@dataclass(frozen=True)
+class PreprocessPlan:
+    scale: float
+    interpolation: str
+    threshold: bool
+    dilate: bool
+    glyph_height: float | None = None
+    bilevel: bool = False
+    denoise: bool = False
+    # (left, top, width, height) of the text in the original image, the whole image when None
+    crop: tuple[int, int, int, int] | None = None
+    has_text: bool = True
+    # Rows of the output resized, thresholded and dilated at a time to bound memory, the whole output at once when None
+    strip_rows: int | None = None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def to_original(self, words: list[Word]) -> list[Word]:
+        """Maps word boxes of the preprocessed image back to the coordinates of the original image."""
+        left, top = self.crop[:2] if self.crop else (0, 0)
+        return [
+            dataclasses.replace(
+                word,
+                left=round(word.left / self.scale) + left,
+                top=round(word.top / self.scale) + top,
+                width=round(word.width / self.scale),
+                height=round(word.height / self.scale),
+            )
+            for word in words
+        ]
+
+
+# The fixed 3x cubic upscale, Otsu threshold and dilation used before the planner existed
+FIXED_PLAN = PreprocessPlan(scale=3, interpolation="cubic", threshold=True, dilate=True)
+
+
+def to_grayscale(image: np.ndarray) -> np.ndarray:
+    if image.ndim == 2:
+        return image
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+def is_bilevel(grayscale_image: np.ndarray) -> bool:
+    histogram = np.bincount(grayscale_image.ravel(), minlength=256)
+    top_two = np.partition(histogram, -2)[-2:].sum()
+    return bool(top_two >= BILEVEL_RATIO * grayscale_image.size)
+
+
+def find_text_region(grayscale_image: np.ndarray, padding: int) -> tuple[int, int, int, int] | None:
+    """
+    Bounding box (left, top, width, height) of the text-bearing content plus `padding`, None when there is none.
+    Text is found as strong edges, ignoring long straight edges of window borders and separators.
+    """
+    height, width = grayscale_image.shape
+
+    gradient = cv2.morphologyEx(grayscale_image, cv2.MORPH_GRADIENT, _GRADIENT_KERNEL)
+    otsu, _ = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    _, edges = cv2.threshold(gradient, max(otsu, MIN_EDGE_CONTRAST), 255, cv2.THRESH_BINARY)
+
+    horizontal = cv2.getStructuringElement(cv2.MORPH_RECT, (max(int(width * MIN_LINE_RATIO), MIN_LINE_LENGTH), 1))
+    vertical = cv2.getStructuringElement(cv2.MORPH_RECT, (1, max(int(height * MIN_LINE_RATIO), MIN_LINE_LENGTH)))
+    lines = cv2.bitwise_or(cv2.morphologyEx(edges, cv2.MORPH_OPEN, horizontal), cv2.morphologyEx(edges, cv2.MORPH_OPEN, vertical))
+    edges = cv2.subtract(edges, lines)
+
+    if cv2.countNonZero(edges) < MIN_TEXT_EDGE_PIXELS:
+        return None
+
+    rows = np.flatnonzero(cv2.reduce(edges, 1, cv2.REDUCE_MAX).ravel())
+    columns = np.flatnonzero(cv2.reduce(edges, 0, cv2.REDUCE_MAX).ravel())
+
+    left, right = max(int(columns[0]) - padding, 0), min(int(columns[-1]) + 1 + padding, width)
+    top, bottom = max(int(rows[0]) - padding, 0), min(int(rows[-1]) + 1 + padding, height)
+    return left, top, right - left, bottom - top
+
+
+def estimate_glyph_height(grayscale_image: np.ndarray, max_height: float | None = None) -> float | None:
+    """
+    Median height of the connected components of the text (minority) pixels after an Otsu threshold.
+    Components taller than `max_height` (half the image by default) are not counted.
+    """
+
+    _, binary = cv2.threshold(grayscale_image, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    if cv2.countNonZero(binary) > binary.size / 2:
+        binary = cv2.bitwise_not(binary)
+
+    _, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    max_height = max_height if max_height is not None else grayscale_image.shape[0] * MAX_GLYPH_HEIGHT_RATIO
+    heights = heights[(heights >= MIN_GLYPH_HEIGHT) & (heights <= max_height)]
+
+    if not heights.size:
+        return None
+    return float(np.median(heights))
+
+
+def source_buffer_bytes(height: int, width: int, color: bool, denoise: bool) -> int:
+    """Size of the grayscale and denoised copies preprocessing makes at the size of the source."""
+    return height * width * (int(color) + int(denoise))
+
+
+def resize_bands(height: int, scale: float) -> list[tuple[int, int, int, int]]:
+    """
+    The bands of `RESIZE_BAND_ROWS` source rows the resize runs in, as the (first, last) source rows resized for the
+    band, its margin included, and the (top, bottom) output rows it gives. Bands start on a multiple of the scale's
+    denominator, a source row that falls on a whole output row, so a band samples the source where a resize of the
+    whole image does. The margin rows only serve the interpolation, their output is dropped.
+    """
+    fraction = Fraction(scale).limit_denominator(MAX_BAND_DENOMINATOR)
+    unit = fraction.denominator if math.isclose(fraction, scale, rel_tol=1e-12) else height
+    rows = math.ceil(RESIZE_BAND_ROWS / unit) * unit
+    # Source rows read around an output row, cubic reads two on either side and area more when downscaling
+    margin = 2 + math.ceil(1 / scale)
+
+    bands = []
+    for start in range(0, height, rows):
+        end = min(start + rows, height)
+        bands.append((max((start - margin) // unit * unit, 0), min(end + margin, height), round(start * scale), round(end * scale)))
+    return bands
+
+
+def resize_band_rows(height: int, scale: float) -> int:
+    """Output rows of the largest band resized at once, margin included, 0 when there is no resize."""
+    if scale == 1:
+        return 0
+    return max(round((last - first) * scale) for first, last, _, _ in resize_bands(height, scale))
+
+
+def preprocess_bytes(height: int, width: int, color: bool, denoise: bool, scale: float, dilate: bool, strip_rows: int | None) -> int:
+    """
+    Peak memory of preprocessing next to the capture: the source size copies, the output, the copy of the output
+    encoded for tesseract, the band being resized and, when dilating, the strip the dilation runs over.
+    """
+    output_height, output_width = round(height * scale), round(width * scale)
+    band_rows = resize_band_rows(height, scale)
+    total = source_buffer_bytes(height, width, color, denoise) + 2 * output_height * output_width + band_rows * output_width
+    if dilate:
+        # Strips are made of whole bands, a strip is never smaller than one
+        rows = output_height if strip_rows is None else min(max(strip_rows, band_rows), output_height)
+        total += (rows + 2 * DILATE_HALO_ROWS) * output_width
+    return total
+
+
+def memory_bounded_scale(height: int, width: int, color: bool, denoise: bool, max_bytes: int) -> float:
+    """
+    Largest scale whose output, its encoded copy and the smallest strip fit in `max_bytes`. Only a ceiling too low
+    for the output itself lowers the scale, the strips keep everything else in bounds.
+    """
+    available = max(max_bytes - source_buffer_bytes(height, width, color, denoise), 0)
+    # The output and its encoded copy alone, 2 · scale² · height · width <= available
+    steps = math.floor(math.sqrt(available / (2 * height * width)) * SCALE_STEPS)
+    # Not down to an empty image when even the source does not fit
+    min_steps = math.ceil(SCALE_STEPS / min(height, width))
+    while steps > min_steps and preprocess_bytes(height, width, color, denoise, steps / SCALE_STEPS, True, 0) > max_bytes:
+        steps -= 1
+    return max(steps, min_steps) / SCALE_STEPS
+
+
+def plan_strip_rows(height: int, width: int, color: bool, plan: PreprocessPlan, max_bytes: int) -> int | None:
+    """
+    Output rows to preprocess at a time so the peak memory stays under `max_bytes`, None when the whole output fits
+    next to its dilated copy. Without dilation nothing the size of the output is allocated besides it.
+    """
+    if max_bytes == -1 or not plan.dilate:
+        return None
+    if preprocess_bytes(height, width, color, plan.denoise, plan.scale, True, None) <= max_bytes:
+        return None
+
+    output_width = round(width * plan.scale)
+    available = max_bytes - preprocess_bytes(height, width, color, plan.denoise, plan.scale, False, None)
+    return max(available // output_width - 2 * DILATE_HALO_ROWS, 1)
+
+
+def plan_preprocessing(image: np.ndarray, config: PreprocessConfig) -> PreprocessPlan:
+    """
+    Picks the scale factor, interpolation and stages that bring the text close to `config.target_glyph_height`,
+    instead of always upscaling 3x.
+    """
+    stages = set(config.stages)
+    dilate = config.dilate and "dilate" in stages
+    denoise = "denoise" in stages
+
+    color = image.ndim == 3
+
+    if not config.adaptive:
+        scale = config.scale if "resize" in stages else 1.0
+        if config.max_bytes != -1 and "resize" in stages:
+            # The configured scale is lowered like an adaptive one when the output itself does not fit
+            scale = min(scale, memory_bounded_scale(*image.shape[:2], color, denoise, config.max_bytes))
+        interpolation = "area" if scale < 1 else "cubic"
+        plan = PreprocessPlan(scale=scale, interpolation=interpolation, threshold="threshold" in stages, dilate=dilate, denoise=denoise)
+        return dataclasses.replace(plan, strip_rows=plan_strip_rows(*image.shape[:2], color, plan, config.max_bytes))
+
+    grayscale_image = to_grayscale(image)
+    max_glyph_height = grayscale_image.shape[0] * MAX_GLYPH_HEIGHT_RATIO
+
+    crop = None
+    if "crop" in stages:
+        crop = find_text_region(grayscale_image, config.crop_padding)
+        if crop is None:
+            return PreprocessPlan(scale=1.0, interpolation="area", threshold=False, dilate=False, has_text=False)
+
+        left, top, width, height = crop
+        if (width, height) == grayscale_image.shape[::-1]:
+            crop = None
+        else:
+            grayscale_image = grayscale_image[top : top + height, left : left + width]
+
+    bilevel = is_bilevel(grayscale_image)
+    glyph_height = estimate_glyph_height(grayscale_image, max_glyph_height)
+
+    scale = config.target_glyph_height / glyph_height if glyph_height else config.scale
+    scale = min(max(scale, config.min_scale), config.max_scale)
+
+    height, width = grayscale_image.shape
+    scale = min(scale, math.sqrt(config.max_pixels / (height * width)))
+    if config.max_bytes != -1:
+        scale = min(scale, memory_bounded_scale(height, width, color, denoise, config.max_bytes))
+    if abs(scale - 1) < SCALE_TOLERANCE or "resize" not in stages:
+        scale = 1.0
+
+    if scale < 1:
+        interpolation = "area"
+    elif bilevel:
+        # Nearest neighbour keeps a bilevel image bilevel, so it does not need thresholding again
+        interpolation = "nearest"
+    else:
+        interpolation = "cubic"
+
+    plan = PreprocessPlan(
+        scale=max(round(scale * SCALE_STEPS), 1) / SCALE_STEPS,
+        interpolation=interpolation,
+        threshold=not bilevel and "threshold" in stages,
+        dilate=dilate,
+        glyph_height=glyph_height,
+        bilevel=bilevel,
+        denoise=denoise,
+        crop=crop,
+    )
+    return dataclasses.replace(plan, strip_rows=plan_strip_rows(height, width, color, plan, config.max_bytes))
@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass
+from typing import Callable, Iterator
+
+import cv2
+import numpy as np
+
+from screenshot_to_text.planner import INTERPOLATIONS, PreprocessPlan, resize_band_rows, resize_bands
+
+# Stages a config can enable, they always run in this order
+STAGES = ("crop", "denoise", "resize", "threshold", "dilate")
+DEFAULT_STAGES = ("crop", "resize", "threshold", "dilate")
+
+DILATE_KERNEL = np.ones((2, 2), np.uint8)
+DENOISE_KERNEL_SIZE = 3
+# Buffer shapes kept around, a handful of screen and region sizes in practice
+MAX_POOLED_SHAPES = 8
+
+
+class BufferPool:
+    """Reusable arrays keyed by shape, so repeated preprocessing of similar captures does not allocate."""
+
+    def __init__(self, max_shapes: int = MAX_POOLED_SHAPES):
+        self.max_shapes = max_shapes
+        self._free: OrderedDict[tuple, list[np.ndarray]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def borrow(self, shape: tuple[int, ...], dtype=np.uint8) -> Iterator[np.ndarray]:
+        key = (shape, np.dtype(dtype).str)
+
+        with self._lock:
+            free = self._free.get(key)
+            buffer = free.pop() if free else None
+
+        if buffer is None:
+            buffer = np.empty(shape, dtype)
+
+        try:
+            yield buffer
+        finally:
+            with self._lock:
+                self._free.setdefault(key, []).append(buffer)
+                self._free.move_to_end(key)
+                while len(self._free) > self.max_shapes:
+                    self._free.popitem(last=False)
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    # Output shape for an input shape
+    output_shape: Callable[[tuple[int, ...]], tuple[int, ...]]
+    # Writes the result for `src` to `dst` and returns it
+    apply: Callable[[np.ndarray, np.ndarray], np.ndarray]
+
+
+def _grayscale_stage(channels: int) -> Stage:
+    code = cv2.COLOR_BGRA2GRAY if channels == 4 else cv2.COLOR_BGR2GRAY
+    return Stage("grayscale", lambda shape: shape[:2], lambda src, dst: cv2.cvtColor(src, code, dst=dst))
+
+
+_DENOISE = Stage("denoise", lambda shape: shape, lambda src, dst: cv2.medianBlur(src, DENOISE_KERNEL_SIZE, dst=dst))
+
+
+def otsu_threshold(image: np.ndarray) -> int:
+    """The threshold cv2.THRESH_OTSU picks for `image`, from its histogram alone."""
+    histogram = cv2.calcHist([image], [0], None, [256], [0, 256]).ravel().tolist()
+    scale = 1.0 / image.size
+    mean = sum(i * count for i, count in enumerate(histogram)) * scale
+
+    # The same steps and precision as OpenCV, the strips then threshold exactly like cv2.threshold would
+    epsilon = float(np.finfo(np.float32).eps)
+    mean_below, weight_below = 0.0, 0.0
+    best_sigma, best = 0.0, 0
+    for i, count in enumerate(histogram):
+        p = count * scale
+        mean_below *= weight_below
+        weight_below += p
+        weight_above = 1.0 - weight_below
+        if min(weight_below, weight_above) < epsilon or max(weight_below, weight_above) > 1.0 - epsilon:
+            continue
+        mean_below = (mean_below + i * p) / weight_below
+        mean_above = (mean - weight_below * mean_below) / weight_above
+        sigma = weight_below * weight_above * (mean_below - mean_above) ** 2
+        if sigma > best_sigma:
+            best_sigma, best = sigma, i
+    return best
+
+
+class PreprocessEngine:
+    """
+    Runs a preprocessing plan. The grayscale and denoised copies of the source go into pooled buffers, the resize,
+    threshold and dilation then run over bands of rows, writing only the final result into `dst` or a new array.
+    """
+
+    def __init__(self, pool: BufferPool | None = None):
+        self.pool = pool or BufferPool()
+
+    @staticmethod
+    def source_stages(image: np.ndarray, plan: PreprocessPlan) -> list[Stage]:
+        stages = []
+        if image.ndim == 3:
+            stages.append(_grayscale_stage(image.shape[2]))
+        if plan.denoise:
+            stages.append(_DENOISE)
+        return stages
+
+    def run(self, image: np.ndarray, plan: PreprocessPlan, dst: np.ndarray | None = None) -> np.ndarray:
+        if plan.crop:
+            # A view, the crop itself costs nothing
+            left, top, width, height = plan.crop
+            image = image[top : top + height, left : left + width]
+
+        with ExitStack() as borrowed:
+            source = image
+            for stage in self.source_stages(image, plan):
+                source = stage.apply(source, borrowed.enter_context(self.pool.borrow(stage.output_shape(source.shape))))
+
+            # Taken from the source, every strip is thresholded at the same level
+            threshold = otsu_threshold(source) if plan.threshold else None
+
+            height, width = source.shape
+            shape = round(height * plan.scale), round(width * plan.scale)
+            # The result never aliases the caller's image
+            out = dst if dst is not None and dst.shape == shape and dst.dtype == np.uint8 else np.empty(shape, np.uint8)
+
+            bands = resize_bands(height, plan.scale)
+            band_buffer = borrowed.enter_context(self.pool.borrow((resize_band_rows(height, plan.scale), shape[1]))) if plan.scale != 1 else None
+            if plan.dilate:
+                self._dilate_in_strips(source, plan, threshold, bands, band_buffer, out)
+            else:
+                self._fill(source, plan, threshold, bands, band_buffer, out)
+
+        return out
+
+    @staticmethod
+    def _fill(
+        source: np.ndarray,
+        plan: PreprocessPlan,
+        threshold: int | None,
+        bands: list[tuple[int, int, int, int]],
+        band_buffer: np.ndarray | None,
+        target: np.ndarray,
+    ) -> None:
+        """Writes the resized and thresholded output rows of `bands` to `target`, which starts at the top of the first band."""
+        top = bands[0][2]
+        for first, last, band_top, band_bottom in bands:
+            if plan.scale == 1:
+                rows = source[band_top:band_bottom]
+            else:
+                resized = band_buffer[: round((last - first) * plan.scale)]
+                cv2.resize(source[first:last], None, dst=resized, fx=plan.scale, fy=plan.scale, interpolation=INTERPOLATIONS[plan.interpolation])
+                # The band without the rows of its margin
+                offset = round(first * plan.scale)
+                rows = resized[band_top - offset : band_bottom - offset]
+
+            rows_dst = target[band_top - top : band_bottom - top]
+            if threshold is None:
+                np.copyto(rows_dst, rows)
+            else:
+                cv2.threshold(rows, threshold, 255, cv2.THRESH_BINARY, dst=rows_dst)
+
+    def _dilate_in_strips(
+        self,
+        source: np.ndarray,
+        plan: PreprocessPlan,
+        threshold: int | None,
+        bands: list[tuple[int, int, int, int]],
+        band_buffer: np.ndarray | None,
+        out: np.ndarray,
+    ) -> None:
+        """
+        Fills `out` a strip of whole bands at a time, each strip dilated before the next one is resized. The rows the
+        kernel reads past a strip are carried over undilated, so the result is the same as dilating the output at once.
+        """
+        height, width = out.shape
+        # Rows around an output row the kernel reads
+        above = DILATE_KERNEL.shape[0] // 2
+        below = DILATE_KERNEL.shape[0] - 1 - above
+
+        strip_rows = plan.strip_rows or height
+        strips = [[bands[0]]]
+        for band in bands[1:]:
+            if band[3] - strips[-1][0][2] <= strip_rows:
+                strips[-1].append(band)
+            else:
+                strips.append([band])
+        max_rows = max(strip[-1][3] - strip[0][2] for strip in strips)
+
+        with self.pool.borrow((max_rows + above + below, width)) as buffer, self.pool.borrow((above + below, width)) as carry:
+            done, kept = 0, 0
+            for strip_bands in strips:
+                top, bottom = strip_bands[0][2], strip_bands[-1][3]
+                start = max(done - above, 0)
+                strip = buffer[: bottom - start]
+
+                # The rows above were dilated already, their original values were kept in `carry`
+                strip[: top - start] = carry[kept - (top - start) : kept]
+                self._fill(source, plan, threshold, strip_bands, band_buffer, strip[top - start :])
+
+                end = bottom if bottom == height else bottom - below
+                keep_from = max(end - above, start)
+                kept = bottom - keep_from
+                carry[:kept] = strip[keep_from - start :]
+
+                if start == done and end == bottom:
+                    cv2.dilate(strip, DILATE_KERNEL, dst=out[done:end], iterations=1)
+                else:
+                    cv2.dilate(strip, DILATE_KERNEL, dst=strip, iterations=1)
+                    out[done:end] = strip[done - start : end - start]
+                done = end
+
+
+_engine: PreprocessEngine | None = None
+
+
+def preprocess_engine() -> PreprocessEngine:
+    """Engine shared by the process, its buffers outlive single captures in the daemon, watch and batch modes."""
+    global _engine
+    if _engine is None:
+        _engine = PreprocessEngine()
+    return _engine
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import bisect
+import difflib
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, TextIO
+
+import cv2
+import numpy as np
+
+from screenshot_to_text.bands import Band, find_text_segments
+from screenshot_to_text.layout import Word, words_to_text
+from screenshot_to_text.models.s2tconfig import RecordConfig
+from screenshot_to_text.planner import MIN_EDGE_CONTRAST, to_grayscale
+from screenshot_to_text.timing import span
+
+# Line texts remembered by the hash of their pixels, enough for a screen of lines in a few states
+MAX_CACHED_LINES = 4096
+_GRADIENT_KERNEL = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+
+
+def changed_pixels(previous: np.ndarray, current: np.ndarray, pixel_threshold: int) -> np.ndarray:
+    """Mask of the pixels whose gray level changed by more than `pixel_threshold` between two frames."""
+    _, mask = cv2.threshold(cv2.absdiff(previous, current), pixel_threshold, 255, cv2.THRESH_BINARY)
+    return mask
+
+
+def line_bands(grayscale_image: np.ndarray, min_gap: int, padding: int) -> list[Band]:
+    """The text lines of a frame, runs of rows with strong edges separated by `min_gap` blank rows."""
+    gradient = cv2.morphologyEx(grayscale_image, cv2.MORPH_GRADIENT, _GRADIENT_KERNEL)
+    rows = cv2.reduce(gradient, 1, cv2.REDUCE_MAX).ravel() >= MIN_EDGE_CONTRAST
+    height = grayscale_image.shape[0]
+    return [Band(max(band.top - padding, 0), min(band.bottom + padding, height)) for band in find_text_segments(rows, min_gap)]
+
+
+def text_diff(previous: list[str], current: list[str]) -> list[str]:
+    """Removed lines prefixed with `-` and added ones with `+`, in the order of the new text."""
+    diff = []
+    for tag, old_start, old_end, new_start, new_end in difflib.SequenceMatcher(None, previous, current, autojunk=False).get_opcodes():
+        if tag == "equal":
+            continue
+        diff += ["-" + line for line in previous[old_start:old_end]]
+        diff += ["+" + line for line in current[new_start:new_end]]
+    return diff
+
+
+class Recorder:
+    """
+    Samples a screen region and OCRs only what changed: frames are compared with the last processed one,
+    and of a changed frame only the text lines not seen before are recognized.
+    """
+
+    def __init__(self, grab: Callable[[], np.ndarray], recognize: Callable[[np.ndarray], list[Word]], output: TextIO, config: RecordConfig):
+        self.grab = grab
+        self.recognize = recognize
+        self.output = output
+        self.config = config
+        self.previous: np.ndarray | None = None
+        self.lines: list[str] = []
+        self._line_texts: OrderedDict[bytes, str] = OrderedDict()
+
+    def _cached_text(self, key: bytes) -> str | None:
+        text = self._line_texts.get(key)
+        if text is not None:
+            self._line_texts.move_to_end(key)
+        return text
+
+    def _remember(self, key: bytes, text: str) -> None:
+        self._line_texts[key] = text
+        while len(self._line_texts) > MAX_CACHED_LINES:
+            self._line_texts.popitem(last=False)
+
+    def _recognize_run(self, frame: np.ndarray, bands: list[Band]) -> list[str]:
+        """OCRs consecutive lines in one pass, then splits the words back into the lines."""
+        top, bottom = bands[0].top, bands[-1].bottom
+        words = self.recognize(frame[top:bottom])
+
+        tops = [band.top - top for band in bands]
+        per_band: list[list[Word]] = [[] for _ in bands]
+        for word in words:
+            per_band[max(bisect.bisect_right(tops, word.center_y) - 1, 0)].append(word)
+        return [words_to_text(band_words).strip() for band_words in per_band]
+
+    def frame_to_lines(self, frame: np.ndarray, grayscale_frame: np.ndarray) -> list[str]:
+        bands = line_bands(grayscale_frame, self.config.line_gap, self.config.line_padding)
+        keys = [hashlib.blake2b(grayscale_frame[band.top : band.bottom].tobytes(), digest_size=16).digest() for band in bands]
+        texts = [self._cached_text(key) for key in keys]
+
+        # Runs of consecutive lines not seen before, e.g. the lines appended to a log
+        runs: list[list[int]] = []
+        for index, text in enumerate(texts):
+            if text is not None:
+                continue
+            if runs and runs[-1][-1] == index - 1:
+                runs[-1].append(index)
+            else:
+                runs.append([index])
+
+        for run in runs:
+            with span("ocr"):
+                run_texts = self._recognize_run(frame, [bands[index] for index in run])
+            for index, text in zip(run, run_texts):
+                texts[index] = text
+                self._remember(keys[index], text)
+
+        return [text for text in texts if text]
+
+    def step(self) -> bool:
+        """Samples one frame, returns whether the text changed."""
+        with span("capture"):
+            frame = self.grab()
+        grayscale_frame = to_grayscale(frame)
+
+        if self.previous is not None and self.previous.shape == grayscale_frame.shape:
+            if cv2.countNonZero(changed_pixels(self.previous, grayscale_frame, self.config.pixel_threshold)) < self.config.min_changed_pixels:
+                return False
+
+        self.previous = grayscale_frame
+        lines = self.frame_to_lines(frame, grayscale_frame)
+        diff = text_diff(self.lines, lines)
+        self.lines = lines
+        if not diff:
+            return False
+
+        self.output.write("\n".join(diff) + "\n")
+        self.output.flush()
+        return True
+
+    def run(self, frames: int = 0, stop: threading.Event | None = None) -> None:
+        """Samples `fps` frames a second until `frames` were taken (forever when 0) or `stop` is set."""
+        stop = stop or threading.Event()
+        interval = 1 / self.config.fps
+        next_sample = time.monotonic()
+        count = 0
+
+        while not stop.is_set():
+            self.step()
+            count += 1
+            if 0 < frames <= count:
+                break
+            # Sleeps to the next slot instead of for a full interval, a slow OCR pass does not shift later samples
+            next_sample = max(next_sample + interval, time.monotonic())
+            stop.wait(max(next_sample - time.monotonic(), 0))
@@ -0,0 +1,318 @@
+from __future__ import annotations
+
+import collections
+import json
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from screenshot_to_text.archive import (
+    ArchivedFile,
+    append_entries,
+    bundle_paths,
+    deleted_entries,
+    mark_deleted,
+    packing_lock,
+    prune_deleted,
+    read_entry,
+    scan_bundle,
+)
+
+INDEX_FILENAME = ".s2t-index.sqlite3"
+SECONDS_PER_DAY = 24 * 60 * 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS captures (
+    stem TEXT PRIMARY KEY,
+    created REAL NOT NULL,
+    bytes INTEGER NOT NULL,
+    files TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS captures_created ON captures (created);
+CREATE TABLE IF NOT EXISTS totals (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    count INTEGER NOT NULL,
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO totals (id, count, bytes) VALUES (0, 0, 0);
+CREATE TABLE IF NOT EXISTS archived (
+    stem TEXT NOT NULL,
+    name TEXT NOT NULL,
+    bundle TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    codec TEXT NOT NULL,
+    PRIMARY KEY (stem, name)
+);
+CREATE INDEX IF NOT EXISTS archived_bundle ON archived (bundle);
+"""
+
+
+@dataclass
+class RetentionPolicy:
+    max_count: int = -1
+    max_bytes: int = -1
+    max_age_days: float = -1
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_count > 0 or self.max_bytes > 0 or self.max_age_days > 0
+
+
+def capture_stem(path: Path) -> str:
+    # The processed image and its PDF belong to the capture they were made from
+    return path.stem.removesuffix("_processed")
+
+
+def is_capture_file(path: Path) -> bool:
+    return path.suffix in (".png", ".pdf", ".json") and not path.name.startswith(".")
+
+
+def is_regenerable(name: str) -> bool:
+    # The processed image and its PDF can be made again from the capture
+    return Path(name).stem.endswith("_processed")
+
+
+class CaptureIndex:
+    """
+    SQLite index of the capture groups (screenshot plus its derived files) kept in a screenshot directory.
+    Retention queries walk the `created` index, so evicting k groups costs O(k) instead of a directory listing.
+    Packed groups have no loose files, `archived` holds where each of their files is in the bundles.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        path = directory / INDEX_FILENAME
+        is_new = not path.exists()
+
+        self.connection = sqlite3.connect(path, timeout=5)
+        self.connection.executescript(_SCHEMA)
+
+        # First use in a directory that already has captures, e.g. after upgrading
+        if is_new:
+            self.rebuild(scan_bundles=True)
+
+    def __enter__(self) -> CaptureIndex:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def _update_totals(self, count: int, size: int) -> None:
+        self.connection.execute("UPDATE totals SET count = count + ?, bytes = bytes + ? WHERE id = 0", (count, size))
+
+    def totals(self) -> tuple[int, int]:
+        return self.connection.execute("SELECT count, bytes FROM totals WHERE id = 0").fetchone()
+
+    def record(self, stem: str, files: list[Path], created: float | None = None) -> None:
+        size = 0
+        names = []
+        for file in files:
+            try:
+                size += file.stat().st_size
+                names.append(file.name)
+            except FileNotFoundError:
+                continue
+
+        with self.connection:
+            previous = self.connection.execute("SELECT bytes FROM captures WHERE stem = ?", (stem,)).fetchone()
+            if previous:
+                self._update_totals(-1, -previous[0])
+            self.connection.execute(
+                "INSERT OR REPLACE INTO captures (stem, created, bytes, files) VALUES (?, ?, ?, ?)",
+                (stem, created if created is not None else time.time(), size, json.dumps(names)),
+            )
+            self._update_totals(1, size)
+
+    def _delete(self, rows: list[tuple[str, int, str]]) -> int:
+        if not rows:
+            return 0
+
+        stems = [(stem,) for stem, _, _ in rows]
+        entries = []
+        with self.connection:
+            # The rows as they are now, a pack or another process may have changed them since they were selected
+            self.connection.execute("BEGIN IMMEDIATE")
+            current = [row for stem in stems if (row := self.connection.execute("SELECT bytes, files FROM captures WHERE stem = ?", stem).fetchone())]
+            for (stem,) in stems:
+                entries.extend(self._archived_rows(stem))
+            mark_deleted(self.directory, entries)
+            self.connection.executemany("DELETE FROM archived WHERE stem = ?", stems)
+            self.connection.executemany("DELETE FROM captures WHERE stem = ?", stems)
+            self._update_totals(-len(current), -sum(size for size, _ in current))
+
+        # Only once the rows are gone, a crash in between leaves files the next rebuild picks up instead of rows without files
+        for _, files in current:
+            for name in json.loads(files):
+                (self.directory / name).unlink(missing_ok=True)
+
+        self._delete_dead_bundles({entry.bundle for entry in entries})
+        return len(current)
+
+    def _delete_dead_bundles(self, bundles: set[str]) -> None:
+        # The newest bundle may be getting appended to, it goes once a newer one is started and it is dead then
+        newest = {path.name for path in bundle_paths(self.directory)[-1:]}
+        dead = [
+            bundle for bundle in bundles - newest if self.connection.execute("SELECT 1 FROM archived WHERE bundle = ? LIMIT 1", (bundle,)).fetchone() is None
+        ]
+        for bundle in dead:
+            (self.directory / bundle).unlink(missing_ok=True)
+        if dead:
+            prune_deleted(self.directory)
+
+    def enforce(self, policy: RetentionPolicy, now: float | None = None) -> int:
+        """Deletes the oldest capture groups that fall outside the policy, returns how many were deleted."""
+        now = now if now is not None else time.time()
+        deleted = 0
+
+        if policy.max_age_days > 0:
+            cutoff = now - policy.max_age_days * SECONDS_PER_DAY
+            rows = self.connection.execute("SELECT stem, bytes, files FROM captures WHERE created < ?", (cutoff,)).fetchall()
+            deleted += self._delete(rows)
+
+        if policy.max_count > 0:
+            count, _ = self.totals()
+            if count > policy.max_count:
+                rows = self.connection.execute("SELECT stem, bytes, files FROM captures ORDER BY created ASC LIMIT ?", (count - policy.max_count,)).fetchall()
+                deleted += self._delete(rows)
+
+        if policy.max_bytes > 0:
+            _, total = self.totals()
+            rows = []
+            for row in self.connection.execute("SELECT stem, bytes, files FROM captures ORDER BY created ASC"):
+                if total <= policy.max_bytes:
+                    break
+                rows.append(row)
+                total -= row[1]
+            deleted += self._delete(rows)
+
+        return deleted
+
+    def rebuild(self, scan_bundles: bool = False) -> int:
+        """
+        Re-creates the index from the files on disk, returns the number of capture groups found.
+        Packed groups are taken from the index, or read back from the bundles with `scan_bundles` when it was lost.
+        """
+        files_by_stem = collections.defaultdict(list)
+        for path in self.directory.iterdir():
+            if is_capture_file(path):
+                files_by_stem[capture_stem(path)].append(path)
+
+        rows = []
+        for stem, files in files_by_stem.items():
+            try:
+                stats = [file.stat() for file in files]
+            except FileNotFoundError:
+                continue
+            rows.append((stem, max(stat.st_ctime for stat in stats), sum(stat.st_size for stat in stats), json.dumps([file.name for file in files])))
+
+        archived = self._rebuild_archived(set(files_by_stem), scan_bundles)
+        for stem, entries in archived.items():
+            # The bundle a group was packed into is only ever written after its files, so it dates the group from above
+            created = max((self.directory / entry.bundle).stat().st_mtime for entry in entries)
+            rows.append((stem, created, sum(entry.length for entry in entries), "[]"))
+
+        with self.connection:
+            self.connection.execute("DELETE FROM captures")
+            self.connection.execute("DELETE FROM archived")
+            self.connection.executemany("INSERT INTO captures (stem, created, bytes, files) VALUES (?, ?, ?, ?)", rows)
+            self.connection.executemany(
+                "INSERT INTO archived (stem, name, bundle, offset, length, codec) VALUES (?, ?, ?, ?, ?, ?)",
+                [(entry.stem, entry.name, entry.bundle, entry.offset, entry.length, entry.codec) for entries in archived.values() for entry in entries],
+            )
+            self.connection.execute("UPDATE totals SET count = ?, bytes = ? WHERE id = 0", (len(rows), sum(row[2] for row in rows)))
+
+        return len(rows)
+
+    def _rebuild_archived(self, loose_stems: set[str], scan_bundles: bool) -> dict[str, list[ArchivedFile]]:
+        bundles = bundle_paths(self.directory)
+        if scan_bundles:
+            # The last copy of an entry packed twice counts, unless retention deleted it
+            deleted = deleted_entries(self.directory)
+            latest = {(entry.stem, entry.name): entry for path in bundles for entry in scan_bundle(path)}
+            entries = [entry for entry in latest.values() if (entry.bundle, entry.offset) not in deleted]
+        else:
+            names = {path.name for path in bundles}
+            entries = [entry for entry in self._archived_rows() if entry.bundle in names]
+
+        archived = collections.defaultdict(list)
+        for entry in entries:
+            # Files still on disk were not deleted after packing, so the loose copy wins
+            if entry.stem not in loose_stems:
+                archived[entry.stem].append(entry)
+        return archived
+
+    def _archived_rows(self, stem: str | None = None) -> list[ArchivedFile]:
+        query = "SELECT stem, name, bundle, offset, length, codec FROM archived"
+        if stem is None:
+            rows = self.connection.execute(query)
+        else:
+            rows = self.connection.execute(query + " WHERE stem = ? ORDER BY bundle, offset", (stem,))
+        return [ArchivedFile(*row) for row in rows]
+
+    def files(self, stem: str) -> list[str]:
+        """Names of the files of a capture group, loose or packed."""
+        row = self.connection.execute("SELECT files FROM captures WHERE stem = ?", (stem,)).fetchone()
+        if row is None:
+            return []
+        return json.loads(row[0]) or [entry.name for entry in self._archived_rows(stem)]
+
+    def read(self, stem: str, name: str) -> bytes:
+        """A file of a capture group, from disk or from its bundle with a single seek."""
+        row = self.connection.execute("SELECT bundle, offset, length, codec FROM archived WHERE stem = ? AND name = ?", (stem, name)).fetchone()
+        if row is None:
+            return (self.directory / name).read_bytes()
+        return read_entry(self.directory, ArchivedFile(stem, name, *row))
+
+    def pack(self, keep_loose: int, max_bundle_bytes: int) -> int:
+        """
+        Moves the files of all but the `keep_loose` newest capture groups into bundles, dropping the regenerable ones.
+        Returns how many groups were packed, 0 when another process is packing the directory.
+        """
+        with packing_lock(self.directory) as locked:
+            if not locked:
+                return 0
+
+            rows = self.connection.execute(
+                "SELECT stem, files FROM captures WHERE files != '[]' ORDER BY created DESC LIMIT -1 OFFSET ?", (keep_loose,)
+            ).fetchall()
+            for stem, files in reversed(rows):
+                self._pack_group(stem, json.loads(files), max_bundle_bytes)
+            return len(rows)
+
+    def _pack_group(self, stem: str, names: list[str], max_bundle_bytes: int) -> None:
+        data = []
+        for name in names:
+            if is_regenerable(name):
+                continue
+            try:
+                data.append((stem, name, (self.directory / name).read_bytes()))
+            except FileNotFoundError:
+                continue
+
+        entries = append_entries(self.directory, data, max_bundle_bytes) if data else []
+        packed_size = sum(entry.length for entry in entries)
+        with self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            row = self.connection.execute("SELECT bytes FROM captures WHERE stem = ?", (stem,)).fetchone()
+            if row is None:
+                # Retention deleted the group while it was being packed, its entries are dead on arrival
+                mark_deleted(self.directory, entries)
+            else:
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO archived (stem, name, bundle, offset, length, codec) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(entry.stem, entry.name, entry.bundle, entry.offset, entry.length, entry.codec) for entry in entries],
+                )
+                self.connection.execute("UPDATE captures SET bytes = ?, files = '[]' WHERE stem = ?", (packed_size, stem))
+                self._update_totals(0, packed_size - row[0])
+
+        if row is None:
+            self._delete_dead_bundles({entry.bundle for entry in entries})
+
+        # Only once the index points into the bundle, a crash before leaves both copies and the loose one is kept
+        for name in names:
+            (self.directory / name).unlink(missing_ok=True)
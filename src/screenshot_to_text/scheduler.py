@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import contextvars
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterator
+
+import cv2
+import numpy as np
+
+from screenshot_to_text.models.s2tconfig import OCRConfig
+
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+PROC_CGROUP = Path("/proc/self/cgroup")
+
+# OMP_THREAD_LIMIT given to the tesseract processes started in this context, inherited when None
+_threads: contextvars.ContextVar[int | None] = contextvars.ContextVar("ocr_threads", default=None)
+# Bounds the OCR jobs started in this context that run at once, e.g. across the regions of a session, unbounded when None
+_slots: contextvars.ContextVar[threading.Semaphore | None] = contextvars.ContextVar("ocr_slots", default=None)
+# CPUs of the machine this process may use, set in pool workers to their share
+_cpu_share: int | None = None
+
+
+def _read_cpu_max(path: Path) -> float | None:
+    # cgroup v2: "<quota> <period>", or "max <period>" without a limit
+    try:
+        quota, period = path.read_text().split()
+    except (OSError, ValueError):
+        return None
+    return None if quota == "max" else int(quota) / int(period)
+
+
+def _read_cfs_quota(directory: Path) -> float | None:
+    # cgroup v1: a quota of -1 means no limit
+    try:
+        quota = int((directory / "cpu.cfs_quota_us").read_text())
+        period = int((directory / "cpu.cfs_period_us").read_text())
+    except (OSError, ValueError):
+        return None
+    return None if quota < 0 else quota / period
+
+
+def cgroup_cpu_quota(root: Path = CGROUP_ROOT, proc_cgroup: Path = PROC_CGROUP) -> float | None:
+    """CPUs the cgroups of this process may use, the lowest limit along their hierarchy, None when unlimited."""
+
+    try:
+        lines = proc_cgroup.read_text().splitlines()
+    except OSError:
+        return None
+
+    quotas = []
+    for line in lines:
+        _, controllers, group = line.split(":", 2)
+        if not controllers:
+            directory, read = root / group.lstrip("/"), lambda directory: _read_cpu_max(directory / "cpu.max")
+        elif "cpu" in controllers.split(","):
+            directory, read = root / controllers / group.lstrip("/"), _read_cfs_quota
+        else:
+            continue
+
+        # Limits of the parent groups apply as well, up to the mount point (the root of a container's namespace)
+        for parent in [directory, *directory.parents]:
+            if not parent.is_relative_to(root):
+                break
+            quota = read(parent)
+            if quota is not None:
+                quotas.append(quota)
+
+    return min(quotas) if quotas else None
+
+
+@functools.cache
+def machine_cpus() -> int:
+    """CPUs this process may run on, its affinity mask capped by the cgroup CPU quota."""
+
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    quota = cgroup_cpu_quota()
+    if quota is not None:
+        # A fraction of a CPU cannot keep another thread busy
+        cpus = min(cpus, max(int(quota), 1))
+    return cpus
+
+
+def available_cpus() -> int:
+    return _cpu_share or machine_cpus()
+
+
+def limit_cpus(cpus: int) -> None:
+    """Restricts the OCR of this process to `cpus`, for the workers of a pool that shares the machine."""
+    global _cpu_share
+    _cpu_share = cpus
+
+
+@dataclass(frozen=True)
+class OCRSchedule:
+    # Tesseract processes run at once
+    workers: int
+    # OMP_THREAD_LIMIT of each
+    threads: int
+
+
+def schedule_ocr(ocr_config: OCRConfig, jobs: int | None = None, pixels: int | None = None, workers: int | None = None) -> OCRSchedule:
+    """
+    How to run `jobs` OCR jobs (as many as there are CPUs when None) of about `pixels` pixels each: a process per job
+    up to the number of CPUs, the CPUs left over split into tesseract threads for images large enough to use them.
+    `ocr_config.threads`, e.g. from `s2t tune-threads`, fixes the threads per process instead, fewer when that many
+    threads of the explicit `workers` would not fit on the CPUs.
+    """
+    cpus = available_cpus()
+
+    if ocr_config.threads:
+        if workers:
+            return OCRSchedule(workers=workers, threads=max(min(ocr_config.threads, cpus // workers), 1))
+        threads = min(ocr_config.threads, cpus)
+        return OCRSchedule(workers=max(min(jobs or cpus, cpus // threads), 1), threads=threads)
+
+    workers = workers or max(min(jobs or cpus, cpus), 1)
+    threads = max(cpus // workers, 1)
+    if pixels is not None:
+        # Starting threads costs more than they save on small images
+        threads = min(threads, max(pixels // ocr_config.min_pixels_per_thread, 1))
+    return OCRSchedule(workers=workers, threads=threads)
+
+
+@contextmanager
+def ocr_threads(threads: int) -> Iterator[None]:
+    """Runs the tesseract processes started in this context (and in copies of it) with `threads` threads."""
+    token = _threads.set(threads)
+    try:
+        yield
+    finally:
+        _threads.reset(token)
+
+
+@contextmanager
+def ocr_slots(slots: threading.Semaphore) -> Iterator[None]:
+    """Shares `slots` between the OCR jobs started in this context (and in copies of it), one slot per running job."""
+    token = _slots.set(slots)
+    try:
+        yield
+    finally:
+        _slots.reset(token)
+
+
+@contextmanager
+def ocr_slot() -> Iterator[None]:
+    slots = _slots.get()
+    if slots is None:
+        yield
+        return
+    with slots:
+        yield
+
+
+def ocr_env() -> dict[str, str] | None:
+    """Environment overrides for a tesseract process, None to inherit the environment as is."""
+    threads = _threads.get()
+    return None if threads is None else {"OMP_THREAD_LIMIT": str(threads)}
+
+
+def sample_page(width: int = 1920, height: int = 1080) -> np.ndarray:
+    """A screen of dark text on a light background, for measuring when no screenshot is at hand."""
+    image = np.full((height, width, 3), 240, np.uint8)
+    line = "The quick brown fox jumps over the lazy dog 0123456789 (){}[]_=+"
+    for y in range(30, height - 10, 28):
+        cv2.putText(image, line * (width // 700 + 1), (10, y), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (30, 30, 30), 1, cv2.LINE_AA)
+    return image
+
+
+def thread_candidates(cpus: int) -> list[int]:
+    """Powers of two up to `cpus`, and `cpus` itself."""
+    candidates = [1]
+    while candidates[-1] * 2 <= cpus:
+        candidates.append(candidates[-1] * 2)
+    return sorted(set(candidates) | {cpus})
+
+
+def measure_throughput(recognize: Callable[[np.ndarray], object], images: list[np.ndarray], workers: int, threads: int, rounds: int) -> float:
+    """Images per second `recognize` gets through with `workers` of them running at once, each with `threads` threads."""
+    jobs = [images[index % len(images)] for index in range(max(len(images), workers) * rounds)]
+
+    def run(image: np.ndarray):
+        with ocr_threads(threads):
+            return recognize(image)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        start = time.perf_counter()
+        list(pool.map(run, jobs))
+        elapsed = time.perf_counter() - start
+    return len(jobs) / elapsed
+
+
+def tune_threads(recognize: Callable[[np.ndarray], object], images: list[np.ndarray], rounds: int = 2) -> list[tuple[OCRSchedule, float]]:
+    """Throughput of each way of splitting the CPUs into processes and threads, the fastest first."""
+    cpus = available_cpus()
+    # Warms up the disk cache for tesseract and its models
+    recognize(images[0])
+
+    results = []
+    for threads in thread_candidates(cpus):
+        schedule = OCRSchedule(workers=max(cpus // threads, 1), threads=threads)
+        results.append((schedule, measure_throughput(recognize, images, schedule.workers, schedule.threads, rounds)))
+    return sorted(results, key=lambda result: result[1], reverse=True)
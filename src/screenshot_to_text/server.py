@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import multiprocessing
+import time
+from collections import defaultdict, deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from screenshot_to_text.batch import init_worker, ocr_file
+from screenshot_to_text.models.s2tconfig import S2TConfig, ServeConfig
+from screenshot_to_text.scheduler import schedule_ocr
+from screenshot_to_text.timing import PERCENTILES, percentile
+
+# Latency samples kept per stage for /metrics
+LATENCY_WINDOW = 1024
+# Seconds a client gets to send the request line and headers
+HEADER_TIMEOUT_SECONDS = 10.0
+MAX_HEADER_LINES = 100
+RETRY_AFTER_SECONDS = 1
+
+
+class HTTPError(Exception):
+    def __init__(self, status: HTTPStatus, message: str):
+        self.status = status
+        super().__init__(message)
+
+
+class OCRServer:
+    """
+    OCR over HTTP on a bounded pool of worker processes. Requests wait in a queue of at most `queue_size`
+    for a free worker, further ones are turned away with 429 instead of piling up.
+    """
+
+    def __init__(self, config: S2TConfig, serve_config: ServeConfig | None = None, executor: Executor | None = None):
+        self.config = config
+        self.serve_config = serve_config or config.serve
+        schedule = schedule_ocr(config.ocr, workers=self.serve_config.workers)
+        self.workers = schedule.workers
+        self.threads = schedule.threads
+        self.executor = executor or self.new_executor()
+
+        self.slots = asyncio.Semaphore(self.workers)
+        self.waiting = 0
+        self.running = 0
+        self.counts: dict[str, int] = defaultdict(int)
+        self.latencies: dict[str, deque[float]] = defaultdict(lambda: deque(maxlen=LATENCY_WINDOW))
+
+    def new_executor(self) -> Executor:
+        # Forked straight from the server, workers would inherit the open client sockets and keep them from closing
+        return ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context("forkserver"), initializer=init_worker, initargs=(self.threads,)
+        )
+
+    def replace_broken(self, executor: Executor) -> None:
+        """Starts a new pool in place of `executor`, which lost a worker (e.g. killed for running out of memory)."""
+        if self.executor is executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = self.new_executor()
+
+    async def run_job(self, label: str, data: bytes | None, include_words: bool) -> dict:
+        if self.waiting >= self.serve_config.queue_size and self.slots.locked():
+            self.counts["rejected"] += 1
+            raise HTTPError(HTTPStatus.TOO_MANY_REQUESTS, "All workers are busy and the queue is full")
+
+        queued = time.perf_counter()
+        self.waiting += 1
+        try:
+            await self.slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.latencies["queue"].append(time.perf_counter() - queued)
+
+        def release(_):
+            # A timed out request keeps its worker until the job really ends, so the pool is never oversubscribed
+            self.running -= 1
+            self.slots.release()
+
+        self.running += 1
+        executor = self.executor
+        try:
+            future = asyncio.get_running_loop().run_in_executor(executor, ocr_file, self.config.ocr, label, self.config.preprocess, include_words, data)
+        except BrokenProcessPool:
+            release(None)
+            self.replace_broken(executor)
+            raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, "The worker pool is restarting")
+        except BaseException:
+            release(None)
+            raise
+
+        future.add_done_callback(release)
+        try:
+            return await asyncio.shield(future)
+        except BrokenProcessPool:
+            self.counts["failed"] += 1
+            self.replace_broken(executor)
+            raise HTTPError(HTTPStatus.INTERNAL_SERVER_ERROR, "The worker running the request died")
+
+    async def ocr(self, query: dict[str, list[str]], headers: dict[str, str], body: bytes) -> dict:
+        include_words = query.get("words", ["0"])[0] not in ("0", "false", "")
+
+        if headers.get("content-type", "").split(";")[0].strip() == "application/json":
+            if not self.serve_config.allow_paths:
+                raise HTTPError(HTTPStatus.FORBIDDEN, "Path requests are disabled")
+            try:
+                path = json.loads(body)["path"]
+            except (ValueError, KeyError, TypeError):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, 'Expected a JSON body like {"path": "/path/to/image.png"}')
+            label, data = str(path), None
+        elif body:
+            label, data = "<request body>", body
+        else:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Expected image bytes or a JSON body with a path")
+
+        start = time.perf_counter()
+        try:
+            record = await asyncio.wait_for(self.run_job(label, data, include_words), self.serve_config.timeout)
+        except asyncio.TimeoutError:
+            self.counts["timed_out"] += 1
+            raise HTTPError(HTTPStatus.GATEWAY_TIMEOUT, f"OCR did not finish within {self.serve_config.timeout}s")
+        self.latencies["request"].append(time.perf_counter() - start)
+
+        if "error" in record:
+            self.counts["failed"] += 1
+            raise HTTPError(HTTPStatus.UNPROCESSABLE_ENTITY, record["error"])
+
+        self.counts["ok"] += 1
+        for name, duration in record["timings"].items():
+            self.latencies[name].append(duration)
+        if data is not None:
+            del record["path"]
+        return record
+
+    def metrics(self) -> dict:
+        latency = {}
+        for name, samples in self.latencies.items():
+            durations = sorted(samples)
+            if durations:
+                latency[name] = {"n": len(durations), **{f"p{p}": round(percentile(durations, p), 4) for p in PERCENTILES}}
+
+        return {
+            "workers": self.workers,
+            "queue_size": self.serve_config.queue_size,
+            "queue_depth": self.waiting,
+            "in_flight": self.running,
+            "requests": {name: self.counts[name] for name in ("ok", "failed", "rejected", "timed_out")},
+            "latency": latency,
+        }
+
+    async def route(self, method: str, target: str, headers: dict[str, str], body: bytes) -> dict:
+        url = urlsplit(target)
+        routes = {"/health": "GET", "/metrics": "GET", "/ocr": "POST"}
+        if url.path not in routes:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"No such endpoint: {url.path}")
+        if method != routes[url.path]:
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, f"{url.path} only accepts {routes[url.path]}")
+
+        if url.path == "/health":
+            return {"ok": True}
+        if url.path == "/metrics":
+            return self.metrics()
+        return await self.ocr(parse_qs(url.query), headers, body)
+
+    async def read_request(self, reader: asyncio.StreamReader) -> tuple[str, str, dict[str, str], bytes]:
+        async def read_head() -> tuple[str, str, dict[str, str]]:
+            method, target, _ = (await reader.readline()).decode("latin-1").split(" ", 2)
+            headers = {}
+            for _ in range(MAX_HEADER_LINES):
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    return method, target, headers
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            raise ValueError("Too many headers")
+
+        try:
+            method, target, headers = await asyncio.wait_for(read_head(), HEADER_TIMEOUT_SECONDS)
+            length = int(headers.get("content-length", 0))
+            if length < 0:
+                raise ValueError("Negative Content-Length")
+        except (ValueError, asyncio.TimeoutError):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request")
+
+        if length > self.serve_config.max_body_bytes:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Request bodies are limited to {self.serve_config.max_body_bytes} bytes")
+        return method, target, headers, await reader.readexactly(length)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            method, target, headers, body = await self.read_request(reader)
+            status, payload = HTTPStatus.OK, await self.route(method, target, headers, body)
+        except HTTPError as e:
+            status, payload = e.status, {"error": str(e)}
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            return
+        except Exception as e:
+            status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(e).__name__}: {e}"}
+
+        content = json.dumps(payload).encode()
+        head = [
+            f"HTTP/1.1 {status.value} {status.phrase}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(content)}",
+            "Connection: close",
+        ]
+        if status in (HTTPStatus.TOO_MANY_REQUESTS, HTTPStatus.SERVICE_UNAVAILABLE):
+            head.append(f"Retry-After: {RETRY_AFTER_SECONDS}")
+
+        try:
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + content)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str | None = None, port: int | None = None) -> asyncio.Server:
+        host = host if host is not None else self.serve_config.host
+        port = port if port is not None else self.serve_config.port
+        return await asyncio.start_server(self.handle, host, port)
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def serve(config: S2TConfig, serve_config: ServeConfig | None = None) -> None:
+    server = OCRServer(config, serve_config)
+    try:
+        async with await server.start() as http_server:
+            await http_server.serve_forever()
+    finally:
+        server.close()
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, TextIO
+
+import numpy as np
+
+from screenshot_to_text.app import (
+    band_workers,
+    capture_directory,
+    copy_text_to_clipboard,
+    discard_capture,
+    grab_screenshot,
+    retain_capture,
+    screenshot_to_text,
+    take_screenshot,
+)
+from screenshot_to_text.errors import CommandFailedError
+from screenshot_to_text.models.s2tconfig import PreprocessConfig, S2TConfig
+from screenshot_to_text.scheduler import available_cpus, ocr_slots
+from screenshot_to_text.timing import span
+
+# Text of consecutive regions is separated by a blank line
+REGION_SEPARATOR = "\n\n"
+
+
+@dataclass
+class Session:
+    """
+    Pipelines several interactive captures: the next region is selected while the previous ones are
+    preprocessed and OCR'd in the background, and their text is joined in capture order.
+    """
+
+    config: S2TConfig
+    keep_screenshot: bool
+    ocr_enabled: bool
+    queue_size: int = 2
+    workers: int | None = None
+    on_error: Callable[[Path, Exception], None] | None = None
+    # (x, y, width, height), overrides the configured region of the x11 backend
+    region: tuple[int, int, int, int] | None = None
+
+    def __post_init__(self):
+        self.workers = self.workers or available_cpus()
+        self.screenshot_dir = capture_directory(self.config, self.keep_screenshot)
+        # Archive mode keeps the text of a capture instead of its processed image
+        self.keep_processed = self.keep_screenshot and not self.config.screenshot.archive
+
+    async def capture_region(self) -> tuple[Path, np.ndarray | None] | None:
+        """
+        Runs the screenshot tool, returns None when the user cancelled the selection.
+        The x11 backend returns the pixels as well, its capture is only written when screenshots are kept.
+        """
+        with span("capture"):
+            if self.config.screenshot.backend == "x11":
+                return await asyncio.to_thread(grab_screenshot, self.config.screenshot, self.screenshot_dir, self.keep_screenshot, self.region)
+
+            try:
+                filename = await asyncio.to_thread(take_screenshot, self.config.screenshot, self.screenshot_dir)
+            except CommandFailedError as e:
+                if e.return_code in self.config.screenshot.cancel_return_codes:
+                    return None
+                raise
+
+        return (filename, None) if filename.exists() else None
+
+    async def region_to_text(self, filename: Path, image: np.ndarray | None = None) -> str:
+        # The same cache, planning and OCR path as a single capture, the draft pass is left out as the text
+        # of the regions only reaches the clipboard once they are all done
+        preprocess_config = self.config.preprocess or PreprocessConfig()
+        return await asyncio.to_thread(screenshot_to_text, self.config.ocr, filename, self.keep_processed, preprocess_config, None, image)
+
+    async def process_region(self, filename: Path, image: np.ndarray | None = None) -> str:
+        text = None
+        try:
+            if not self.ocr_enabled:
+                return ""
+            text = await self.region_to_text(filename, image)
+            return text
+        finally:
+            if self.keep_screenshot:
+                await asyncio.to_thread(retain_capture, self.config, filename, text)
+            else:
+                discard_capture(self.config, filename)
+
+    async def run(self, repeat: int, output: TextIO | None = None) -> list[str]:
+        """
+        Captures `repeat` regions (until the user cancels a selection when `repeat` is 0 or less),
+        writing the text of each region to `output` as soon as the regions before it are done.
+        """
+        if repeat <= 0 and self.config.screenshot.backend == "x11":
+            raise ValueError("The x11 backend captures without a selection to cancel, `repeat` must be positive")
+
+        captured: asyncio.Queue[tuple[Path, np.ndarray | None, asyncio.Future] | None] = asyncio.Queue(maxsize=self.queue_size)
+        in_order: asyncio.Queue[tuple[Path, asyncio.Future] | None] = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+
+        async def capture():
+            count = 0
+            try:
+                while repeat <= 0 or count < repeat:
+                    taken = await self.capture_region()
+                    if taken is None:
+                        break
+                    filename, image = taken
+                    future = loop.create_future()
+                    await in_order.put((filename, future))
+                    # Waits for a free slot, so no more than `queue_size` captures wait for processing
+                    await captured.put((filename, image, future))
+                    count += 1
+            finally:
+                for _ in range(self.workers):
+                    await captured.put(None)
+                await in_order.put(None)
+
+        async def process():
+            while (item := await captured.get()) is not None:
+                filename, image, future = item
+                try:
+                    future.set_result(await self.process_region(filename, image))
+                except Exception as e:
+                    future.set_exception(e)
+
+        async def collect() -> list[str]:
+            texts = []
+            while (item := await in_order.get()) is not None:
+                filename, future = item
+                try:
+                    text = await future
+                except Exception as e:
+                    if self.on_error is None:
+                        raise
+                    self.on_error(filename, e)
+                    continue
+
+                if not text:
+                    continue
+                if output is not None:
+                    output.write((REGION_SEPARATOR if texts else "") + text)
+                    output.flush()
+                texts.append(text)
+            return texts
+
+        # The regions share the OCR processes, the tasks below run in copies of this context
+        with ocr_slots(threading.BoundedSemaphore(band_workers(self.config.ocr))):
+            tasks = [asyncio.create_task(capture()), *(asyncio.create_task(process()) for _ in range(self.workers))]
+        try:
+            texts = await collect()
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        if output is not None and texts:
+            output.write("\n")
+        return texts
+
+
+async def copy_text_to_clipboard_async(config: S2TConfig, text: str) -> None:
+    with span("clipboard"):
+        await asyncio.to_thread(copy_text_to_clipboard, config.clipboard, text)
+
+
+async def run_session(
+    config: S2TConfig,
+    repeat: int,
+    output: TextIO | None = None,
+    keep_screenshot: bool | None = None,
+    ocr_enabled: bool | None = None,
+    on_error: Callable[[Path, Exception], None] | None = None,
+    region: tuple[int, int, int, int] | None = None,
+) -> str:
+    """Runs a multi-capture session, the joined text goes to `output`, or to the clipboard without one."""
+    session = Session(
+        config,
+        keep_screenshot=keep_screenshot if keep_screenshot is not None else config.screenshot.keep,
+        ocr_enabled=ocr_enabled if ocr_enabled is not None else config.ocr.enabled,
+        on_error=on_error,
+        region=region,
+    )
+
+    text = REGION_SEPARATOR.join(await session.run(repeat, output))
+    if output is None and text:
+        await copy_text_to_clipboard_async(config, text)
+    return text
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import functools
+import os
+import pickle
+import sys
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, TypeVar
+
+from platformdirs import user_cache_dir
+
+from screenshot_to_text.__version__ import __version__
+from screenshot_to_text.constants import APP_NAME
+
+if TYPE_CHECKING:
+    from importlib.abc import Traversable
+
+T = TypeVar("T")
+
+# Distributions whose classes end up in the pickled values
+PICKLED_DEPENDENCIES = ("pydantic", "pydantic-core", "PyYAML")
+
+
+def snapshot_dir() -> Path:
+    return Path(user_cache_dir(APP_NAME)) / "snapshots"
+
+
+@functools.cache
+def dependency_versions() -> tuple:
+    """Versions of Python and of the dependencies, a snapshot pickled against others may not unpickle the same."""
+    from importlib.metadata import PackageNotFoundError, version
+
+    versions = [sys.version]
+    for name in PICKLED_DEPENDENCIES:
+        try:
+            versions.append(version(name))
+        except PackageNotFoundError:
+            versions.append(None)
+    return tuple(versions)
+
+
+def source_key(source: Path | Traversable) -> tuple | None:
+    try:
+        stat = os.stat(str(source))
+    except OSError:
+        return None
+    return (__version__, dependency_versions(), str(source), stat.st_mtime_ns, stat.st_size)
+
+
+def load_snapshot(name: str, key: tuple) -> object | None:
+    try:
+        with open(snapshot_dir() / f"{name}.pickle", "rb") as f:
+            stored_key, value = pickle.load(f)
+    except Exception:
+        # A missing, truncated or incompatible snapshot is just a cache miss
+        return None
+
+    return value if stored_key == key else None
+
+
+def store_snapshot(name: str, key: tuple, value: object) -> None:
+    path = snapshot_dir() / f"{name}.pickle"
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            pickle.dump((key, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except OSError:
+        tmp_path.unlink(missing_ok=True)
+
+
+def cached_parse(name: str, source: Path | Traversable, parse: Callable[[], T]) -> T:
+    """
+    Returns the pre-validated result of `parse` stored for `source`, keyed on the file's mtime, size and the package and dependency versions.
+    Falls back to parsing (and refreshing the snapshot) whenever the key does not match.
+    """
+    key = source_key(source)
+    if key is None:
+        return parse()
+
+    value = load_snapshot(name, key)
+    if value is not None:
+        return value
+
+    value = parse()
+    store_snapshot(name, key, value)
+    return value
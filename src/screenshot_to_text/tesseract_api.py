@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import functools
+import threading
+import weakref
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator
+
+import cv2
+import numpy as np
+
+from screenshot_to_text.errors import OCREngineError
+
+DEFAULT_LANGUAGE = "eng"
+# TessOcrEngineMode OEM_DEFAULT
+DEFAULT_OEM = 3
+# GetTsvText leaves out the header the tesseract CLI writes, parse_tsv expects it
+TSV_HEADER = "level\tpage_num\tblock_num\tpar_num\tline_num\tword_num\tleft\ttop\twidth\theight\tconf\ttext"
+
+
+@dataclass(frozen=True)
+class EngineParams:
+    language: str = DEFAULT_LANGUAGE
+    oem: int = DEFAULT_OEM
+    psm: int | None = None
+    dpi: int | None = None
+    datapath: str | None = None
+    variables: tuple[tuple[str, str], ...] = ()
+
+
+def engine_params(cmd: list[str]) -> EngineParams:
+    """The engine settings of a tesseract command line, file arguments and output configs are ignored."""
+
+    args = [arg.format(filename="", filename_pdf="") for arg in cmd[1:]]
+    options = {}
+    variables = []
+
+    index = 0
+    while index < len(args):
+        arg = args[index]
+        value = args[index + 1] if index + 1 < len(args) else None
+        if arg == "-c" and value is not None:
+            name, _, variable_value = value.partition("=")
+            variables.append((name, variable_value))
+        elif arg in ("-l", "--oem", "--psm", "--dpi", "--tessdata-dir") and value is not None:
+            options[arg] = value
+        else:
+            index += 1
+            continue
+        index += 2
+
+    return EngineParams(
+        language=options.get("-l", DEFAULT_LANGUAGE),
+        oem=int(options.get("--oem", DEFAULT_OEM)),
+        psm=int(options["--psm"]) if "--psm" in options else None,
+        dpi=int(options["--dpi"]) if "--dpi" in options else None,
+        datapath=options.get("--tessdata-dir"),
+        variables=tuple(variables),
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def load_libtesseract() -> ctypes.CDLL | None:
+    """The tesseract C API, None when the shared library is not installed."""
+
+    name = ctypes.util.find_library("tesseract")
+    if name is None:
+        return None
+    try:
+        lib = ctypes.CDLL(name)
+    except OSError:
+        return None
+
+    handle = ctypes.c_void_p
+    lib.TessVersion.restype = ctypes.c_char_p
+    lib.TessBaseAPICreate.restype = handle
+    lib.TessBaseAPIInit4.argtypes = [
+        handle,
+        ctypes.c_char_p,
+        ctypes.c_char_p,
+        ctypes.c_int,
+        ctypes.POINTER(ctypes.c_char_p),
+        ctypes.c_int,
+        ctypes.POINTER(ctypes.c_char_p),
+        ctypes.POINTER(ctypes.c_char_p),
+        ctypes.c_size_t,
+        ctypes.c_int,
+    ]
+    lib.TessBaseAPIInit4.restype = ctypes.c_int
+    lib.TessBaseAPISetPageSegMode.argtypes = [handle, ctypes.c_int]
+    lib.TessBaseAPISetImage.argtypes = [handle, ctypes.c_void_p, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int]
+    lib.TessBaseAPISetSourceResolution.argtypes = [handle, ctypes.c_int]
+    lib.TessBaseAPIRecognize.argtypes = [handle, ctypes.c_void_p]
+    lib.TessBaseAPIRecognize.restype = ctypes.c_int
+    # A void pointer rather than c_char_p, the text has to be handed back to TessDeleteText
+    lib.TessBaseAPIGetTsvText.argtypes = [handle, ctypes.c_int]
+    lib.TessBaseAPIGetTsvText.restype = ctypes.c_void_p
+    lib.TessDeleteText.argtypes = [ctypes.c_void_p]
+    lib.TessBaseAPIClear.argtypes = [handle]
+    lib.TessBaseAPIEnd.argtypes = [handle]
+    lib.TessBaseAPIDelete.argtypes = [handle]
+    return lib
+
+
+def _delete_api(lib: ctypes.CDLL, api: int) -> None:
+    lib.TessBaseAPIEnd(api)
+    lib.TessBaseAPIDelete(api)
+
+
+class TesseractEngine:
+    """
+    A tesseract engine initialized once, its traineddata stays loaded between images.
+    Not thread safe, see `EnginePool` for sharing engines between threads.
+    """
+
+    def __init__(self, params: EngineParams, lib: ctypes.CDLL | None = None):
+        self.params = params
+        self.lib = lib or load_libtesseract()
+        if self.lib is None:
+            raise OCREngineError("libtesseract is not installed")
+
+        names = (ctypes.c_char_p * len(params.variables))(*(name.encode() for name, _ in params.variables))
+        values = (ctypes.c_char_p * len(params.variables))(*(value.encode() for _, value in params.variables))
+
+        self.api = self.lib.TessBaseAPICreate()
+        result = self.lib.TessBaseAPIInit4(
+            self.api,
+            params.datapath.encode() if params.datapath else None,
+            params.language.encode(),
+            params.oem,
+            None,
+            0,
+            names,
+            values,
+            len(params.variables),
+            0,
+        )
+        self._finalizer = weakref.finalize(self, _delete_api, self.lib, self.api)
+        if result != 0:
+            self.close()
+            raise OCREngineError(f"Could not initialize tesseract for language {params.language!r}")
+
+        if params.psm is not None:
+            self.lib.TessBaseAPISetPageSegMode(self.api, params.psm)
+
+    def recognize_tsv(self, image: np.ndarray) -> str:
+        if image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        image = np.ascontiguousarray(image, np.uint8)
+        height, width = image.shape[:2]
+        bytes_per_pixel = 1 if image.ndim == 2 else image.shape[2]
+
+        self.lib.TessBaseAPISetImage(self.api, image.ctypes.data, width, height, bytes_per_pixel, image.strides[0])
+        if self.params.dpi:
+            self.lib.TessBaseAPISetSourceResolution(self.api, self.params.dpi)
+
+        try:
+            if self.lib.TessBaseAPIRecognize(self.api, None) != 0:
+                raise OCREngineError("tesseract failed to recognize the image")
+
+            text = self.lib.TessBaseAPIGetTsvText(self.api, 0)
+            try:
+                tsv = ctypes.string_at(text).decode("utf-8", errors="replace") if text else ""
+            finally:
+                if text:
+                    self.lib.TessDeleteText(text)
+        finally:
+            # Drops the results and the engine's reference to `image`, keeps the loaded model
+            self.lib.TessBaseAPIClear(self.api)
+
+        return TSV_HEADER + "\n" + tsv
+
+    def close(self) -> None:
+        self._finalizer()
+
+
+class EnginePool:
+    """
+    Initialized engines kept for the life of the process, one per concurrent user of the same params.
+    Band workers borrow them in turn instead of loading the traineddata again.
+    """
+
+    def __init__(self):
+        self._free: dict[EngineParams, list[TesseractEngine]] = {}
+        # Params the engine could not be initialized with, not retried for every image
+        self._failed: set[EngineParams] = set()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def borrow(self, params: EngineParams) -> Iterator[TesseractEngine | None]:
+        """Yields an engine for `params`, None when libtesseract is unavailable or cannot load them."""
+
+        with self._lock:
+            failed = params in self._failed
+            free = self._free.get(params)
+            engine = free.pop() if free else None
+
+        if failed:
+            yield None
+            return
+
+        if engine is None:
+            try:
+                engine = TesseractEngine(params)
+            except OCREngineError:
+                with self._lock:
+                    self._failed.add(params)
+                yield None
+                return
+
+        try:
+            yield engine
+        finally:
+            with self._lock:
+                self._free.setdefault(params, []).append(engine)
+
+
+_pool: EnginePool | None = None
+
+
+def engine_pool() -> EnginePool:
+    global _pool
+    if _pool is None:
+        _pool = EnginePool()
+    return _pool
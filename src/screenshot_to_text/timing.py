@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+import resource
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from platformdirs import user_state_dir
+
+from screenshot_to_text.constants import APP_NAME
+
+PERCENTILES = (50, 95, 99)
+
+
+def profile_log_path() -> Path:
+    return Path(user_state_dir(APP_NAME)) / "profile.jsonl"
+
+
+def peak_rss_kib(children: bool = False) -> int:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss is in bytes on macOS and KiB elsewhere
+    return usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss
+
+
+def rss_kib() -> int | None:
+    """Current resident set size, None without procfs (macOS)."""
+    try:
+        pages = int(Path("/proc/self/statm").read_text().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+class Profile:
+    """
+    Timing spans and attributes of a single run, collected from every thread the run uses.
+    The peak RSS the kernel reports is that of the whole process lifetime, it is only the peak of the run in a
+    one-shot process. In a long-lived one (the daemon) the RSS before and after the run is recorded instead.
+    """
+
+    def __init__(self, one_shot: bool = True):
+        self.one_shot = one_shot
+        self.rss_before_kib = None if one_shot else rss_kib()
+        self.started = time.time()
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self.spans: list[dict] = []
+        self.attributes: dict = {}
+        self.record: dict | None = None
+
+    def add_span(self, name: str, start: float, end: float) -> None:
+        with self._lock:
+            self.spans.append({"name": name, "start": round(start - self._origin, 6), "duration": round(end - start, 6)})
+
+    def finish(self) -> dict:
+        self.record = {
+            "time": self.started,
+            "total": round(time.perf_counter() - self._origin, 6),
+            "spans": self.spans,
+            **self.attributes,
+        }
+        if self.one_shot:
+            self.record.update(peak_rss_kib=peak_rss_kib(), peak_rss_children_kib=peak_rss_kib(children=True))
+        else:
+            self.record.update(rss_before_kib=self.rss_before_kib, rss_after_kib=rss_kib(), process_peak_rss_kib=peak_rss_kib())
+        return self.record
+
+
+_active_profile: ContextVar[Profile | None] = ContextVar("s2t_active_profile", default=None)
+
+
+def active_profile() -> Profile | None:
+    return _active_profile.get()
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    profile = _active_profile.get()
+    if profile is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add_span(name, start, time.perf_counter())
+
+
+def annotate(**attributes) -> None:
+    profile = _active_profile.get()
+    if profile is not None:
+        profile.attributes.update(attributes)
+
+
+def append_record(record: dict, path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # A single write of a short line keeps concurrent appends (daemon and CLI) from interleaving
+    with open(path, "a") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+@contextmanager
+def profiling(enabled: bool, log_path: Path | None = None, one_shot: bool = True) -> Iterator[Profile | None]:
+    """
+    Collects the spans of everything run inside the block, appending the record to `log_path` if given.
+    `one_shot` is False in processes serving many runs, see `Profile`.
+    """
+    if not enabled and log_path is None:
+        yield None
+        return
+
+    profile = Profile(one_shot)
+    token = _active_profile.set(profile)
+    try:
+        yield profile
+    except BaseException as e:
+        profile.attributes["error"] = type(e).__name__
+        raise
+    finally:
+        _active_profile.reset(token)
+        record = profile.finish()
+        if log_path is not None:
+            append_record(record, log_path)
+
+
+def format_record(record: dict) -> str:
+    lines = [f"{span['name']:<32}{span['duration'] * 1000:>10.1f} ms" for span in record["spans"]]
+    lines.append(f"{'total':<32}{record['total'] * 1000:>10.1f} ms")
+    if "width" in record:
+        lines.append(f"image: {record['width']}x{record['height']}")
+    if "peak_rss_kib" in record:
+        lines.append(f"peak RSS: {record['peak_rss_kib'] / 1024:.0f} MiB, children {record['peak_rss_children_kib'] / 1024:.0f} MiB")
+    elif record.get("rss_after_kib") is not None:
+        lines.append(
+            f"RSS: {record['rss_before_kib'] / 1024:.0f} -> {record['rss_after_kib'] / 1024:.0f} MiB, daemon peak {record['process_peak_rss_kib'] / 1024:.0f} MiB"
+        )
+    return "\n".join(lines)
+
+
+def read_records(path: Path, last: int | None = None) -> list[dict]:
+    if not path.exists():
+        return []
+
+    records: deque[dict] = deque(maxlen=last)
+    with open(path) as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return list(records)
+
+
+def percentile(sorted_samples: list[float], p: float) -> float:
+    # Nearest rank
+    return sorted_samples[max(0, math.ceil(p / 100 * len(sorted_samples)) - 1)]
+
+
+def aggregate(records: Iterable[dict]) -> dict[str, dict[str, float]]:
+    """Percentiles of every span name, and of the total, over `records`."""
+    samples = defaultdict(list)
+    for record in records:
+        samples["total"].append(record["total"])
+        for span_record in record["spans"]:
+            samples[span_record["name"]].append(span_record["duration"])
+
+    stats = {}
+    for name, durations in samples.items():
+        durations.sort()
+        stats[name] = {"n": len(durations), **{f"p{p}": percentile(durations, p) for p in PERCENTILES}}
+    return stats
@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import os
+import queue
+import re
+import select
+import struct
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Protocol
+
+from screenshot_to_text.constants import SCREENSHOT_PREFIX
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+_EVENT_HEADER = struct.Struct("iIII")
+_READ_SIZE = 64 * 1024
+# Seconds of mtime granularity allowed for when rescanning after an overflow
+_RESCAN_SLACK_NS = 1_000_000_000
+_S2T_CAPTURE = re.compile(rf"^{re.escape(SCREENSHOT_PREFIX)}\d{{4}}-\d{{2}}-\d{{2}}T\d{{2}}_\d{{2}}_\d{{2}}(\.\d+)?$")
+
+
+def is_watch_candidate(path: Path) -> bool:
+    # Skips the captures and artifacts s2t itself writes, a kept capture was OCR'd when it was taken
+    return path.suffix.lower() == ".png" and not path.stem.endswith("_processed") and not _S2T_CAPTURE.match(path.stem)
+
+
+def scan_files(directory: Path) -> dict[Path, tuple[int, int]]:
+    """Size and mtime of the files in `directory`."""
+    files = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            try:
+                if entry.is_file():
+                    stat = entry.stat()
+                    files[Path(entry.path)] = (stat.st_size, stat.st_mtime_ns)
+            except FileNotFoundError:
+                continue
+    return files
+
+
+class DirectoryWatcher(Protocol):
+    def poll(self, timeout: float) -> list[Path]: ...
+
+    def close(self) -> None: ...
+
+
+class InotifyWatcher:
+    """
+    Reports files created, written or moved into a directory using Linux inotify. When the event queue overflowed,
+    the directory is rescanned for files changed since the last complete read instead.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        if self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(errno, f"inotify_add_watch failed for {directory}")
+        self._read_at = time.time_ns()
+
+    def poll(self, timeout: float) -> list[Path]:
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return []
+
+        read_at = time.time_ns()
+        try:
+            data = os.read(self._fd, _READ_SIZE)
+        except BlockingIOError:
+            return []
+
+        paths = []
+        overflowed = False
+        offset = 0
+        while offset < len(data):
+            _, mask, _, name_length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset : offset + name_length].rstrip(b"\0")
+            offset += name_length
+            if mask & IN_Q_OVERFLOW:
+                overflowed = True
+            elif name:
+                paths.append(self.directory / os.fsdecode(name))
+
+        if overflowed:
+            # Events were dropped, any file changed since the previous read may be among them
+            since = self._read_at - _RESCAN_SLACK_NS
+            paths.extend(path for path, (_, mtime) in scan_files(self.directory).items() if mtime >= since)
+        self._read_at = read_at
+        return paths
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+class PollingWatcher:
+    """Reports new and changed files by comparing directory listings, for platforms without inotify."""
+
+    def __init__(self, directory: Path, interval: float = 1.0):
+        self.directory = directory
+        self.interval = interval
+        self._known = scan_files(directory)
+
+    def poll(self, timeout: float) -> list[Path]:
+        time.sleep(min(timeout, self.interval))
+
+        files = scan_files(self.directory)
+        changed = [path for path, state in files.items() if self._known.get(path) != state]
+        self._known = files
+        return changed
+
+    def close(self) -> None:
+        pass
+
+
+def make_watcher(directory: Path, polling: bool = False, poll_interval: float = 1.0) -> DirectoryWatcher:
+    if not directory.is_dir():
+        raise NotADirectoryError(f"{directory} is not a directory")
+    if not polling and sys.platform == "linux":
+        try:
+            return InotifyWatcher(directory)
+        except OSError:
+            pass
+    return PollingWatcher(directory, poll_interval)
+
+
+class Debouncer:
+    """
+    Holds back paths until they have seen no events for `settle` seconds and their size stopped changing,
+    so files still being written by the screenshot tool are not picked up half way.
+    """
+
+    def __init__(self, settle: float):
+        self.settle = settle
+        self._pending: dict[Path, tuple[float, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    @staticmethod
+    def _size(path: Path) -> int:
+        try:
+            return path.stat().st_size
+        except FileNotFoundError:
+            return -1
+
+    def touch(self, path: Path, now: float) -> None:
+        self._pending[path] = (now, self._size(path))
+
+    def ready(self, now: float) -> list[Path]:
+        ready = []
+        for path, (last_event, size) in list(self._pending.items()):
+            if now - last_event < self.settle:
+                continue
+
+            current_size = self._size(path)
+            if current_size < 0:
+                del self._pending[path]
+            elif current_size != size or current_size == 0:
+                self._pending[path] = (now, current_size)
+            else:
+                del self._pending[path]
+                ready.append(path)
+
+        return ready
+
+
+def watch_directory(
+    directory: Path,
+    handle: Callable[[Path], None],
+    on_error: Callable[[Path, Exception], None] | None = None,
+    settle: float = 0.5,
+    polling: bool = False,
+    poll_interval: float = 1.0,
+    stop: threading.Event | None = None,
+) -> None:
+    """
+    Calls `handle` for every new PNG in `directory`, one at a time on a worker thread.
+    Bursts of screenshots wait in a queue instead of starting an OCR process per event.
+    """
+    stop = stop or threading.Event()
+    watcher = make_watcher(directory, polling, poll_interval)
+    debouncer = Debouncer(settle)
+    work: queue.Queue[Path | None] = queue.Queue()
+    queued: set[Path] = set()
+    queued_lock = threading.Lock()
+
+    def worker():
+        while (path := work.get()) is not None:
+            with queued_lock:
+                queued.discard(path)
+            try:
+                handle(path)
+            except Exception as e:
+                if on_error is None:
+                    raise
+                on_error(path, e)
+
+    worker_thread = threading.Thread(target=worker, name="s2t-watch-worker", daemon=True)
+    worker_thread.start()
+
+    try:
+        while not stop.is_set():
+            timeout = settle / 2 if len(debouncer) else poll_interval
+            for path in watcher.poll(timeout):
+                if is_watch_candidate(path):
+                    debouncer.touch(path, time.monotonic())
+
+            for path in debouncer.ready(time.monotonic()):
+                with queued_lock:
+                    if path in queued:
+                        continue
+                    queued.add(path)
+                work.put(path)
+    finally:
+        watcher.close()
+        # Let the screenshot being processed finish, but drop the ones still waiting
+        while not work.empty():
+            work.get_nowait()
+        work.put(None)
+        worker_thread.join()
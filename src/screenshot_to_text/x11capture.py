@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import functools
+import os
+import re
+import threading
+
+import cv2
+import numpy as np
+
+from screenshot_to_text.errors import ScreenCaptureError
+
+Z_PIXMAP = 2
+LSB_FIRST = 0
+ALL_PLANES = ctypes.c_ulong(-1).value
+IPC_PRIVATE = 0
+IPC_CREAT = 0o1000
+IPC_RMID = 0
+
+_GEOMETRY_PATTERN = re.compile(r"^(\d+)x(\d+)\+(\d+)\+(\d+)$")
+
+
+class XImage(ctypes.Structure):
+    # Leading fields of Xlib's XImage, the function table that follows is never accessed
+    _fields_ = [
+        ("width", ctypes.c_int),
+        ("height", ctypes.c_int),
+        ("xoffset", ctypes.c_int),
+        ("format", ctypes.c_int),
+        ("data", ctypes.c_void_p),
+        ("byte_order", ctypes.c_int),
+        ("bitmap_unit", ctypes.c_int),
+        ("bitmap_bit_order", ctypes.c_int),
+        ("bitmap_pad", ctypes.c_int),
+        ("depth", ctypes.c_int),
+        ("bytes_per_line", ctypes.c_int),
+        ("bits_per_pixel", ctypes.c_int),
+    ]
+
+
+class XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [
+        ("shmseg", ctypes.c_ulong),
+        ("shmid", ctypes.c_int),
+        ("shmaddr", ctypes.c_void_p),
+        ("readOnly", ctypes.c_int),
+    ]
+
+
+class XErrorEvent(ctypes.Structure):
+    _fields_ = [
+        ("type", ctypes.c_int),
+        ("display", ctypes.c_void_p),
+        ("resourceid", ctypes.c_ulong),
+        ("serial", ctypes.c_ulong),
+        ("error_code", ctypes.c_ubyte),
+        ("request_code", ctypes.c_ubyte),
+        ("minor_code", ctypes.c_ubyte),
+    ]
+
+
+_ERROR_HANDLER = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.POINTER(XErrorEvent))
+# Xlib's default handler exits the process, errors are collected here and checked after each request instead
+_x_errors: list[int] = []
+
+
+@_ERROR_HANDLER
+def _record_x_error(display, event):
+    _x_errors.append(event.contents.error_code)
+    return 0
+
+
+def parse_geometry(geometry: str) -> tuple[int, int, int, int]:
+    """(x, y, width, height) of an X11 geometry string like `800x600+100+50`."""
+
+    match = _GEOMETRY_PATTERN.match(geometry.strip())
+    if match is None:
+        raise ValueError(f"Invalid region {geometry!r}, expected WIDTHxHEIGHT+X+Y")
+
+    width, height, x, y = (int(value) for value in match.groups())
+    if not width or not height:
+        raise ValueError(f"Invalid region {geometry!r}, width and height must not be 0")
+    return x, y, width, height
+
+
+@functools.lru_cache(maxsize=1)
+def load_libraries() -> tuple[ctypes.CDLL, ctypes.CDLL, ctypes.CDLL] | None:
+    """libX11, libXext and libc with the signatures used here, None when X11 is not installed."""
+
+    names = [ctypes.util.find_library(name) for name in ("X11", "Xext", "c")]
+    if not all(names):
+        return None
+    try:
+        x11, xext, libc = (ctypes.CDLL(name) for name in names)
+    except OSError:
+        return None
+
+    display = ctypes.c_void_p
+    image = ctypes.POINTER(XImage)
+    info = ctypes.POINTER(XShmSegmentInfo)
+
+    x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+    x11.XOpenDisplay.restype = display
+    x11.XCloseDisplay.argtypes = [display]
+    x11.XSetErrorHandler.argtypes = [_ERROR_HANDLER]
+    x11.XSetErrorHandler.restype = ctypes.c_void_p
+    x11.XDefaultScreen.argtypes = [display]
+    x11.XRootWindow.argtypes = [display, ctypes.c_int]
+    x11.XRootWindow.restype = ctypes.c_ulong
+    x11.XDefaultVisual.argtypes = [display, ctypes.c_int]
+    x11.XDefaultVisual.restype = ctypes.c_void_p
+    x11.XDefaultDepth.argtypes = [display, ctypes.c_int]
+    x11.XDisplayWidth.argtypes = [display, ctypes.c_int]
+    x11.XDisplayHeight.argtypes = [display, ctypes.c_int]
+    x11.XSync.argtypes = [display, ctypes.c_int]
+    x11.XGetImage.argtypes = [display, ctypes.c_ulong, ctypes.c_int, ctypes.c_int, ctypes.c_uint, ctypes.c_uint, ctypes.c_ulong, ctypes.c_int]
+    x11.XGetImage.restype = image
+    x11.XDestroyImage.argtypes = [image]
+
+    xext.XShmQueryExtension.argtypes = [display]
+    xext.XShmCreateImage.argtypes = [display, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int, ctypes.c_void_p, info, ctypes.c_uint, ctypes.c_uint]
+    xext.XShmCreateImage.restype = image
+    xext.XShmAttach.argtypes = [display, info]
+    xext.XShmDetach.argtypes = [display, info]
+    xext.XShmGetImage.argtypes = [display, ctypes.c_ulong, image, ctypes.c_int, ctypes.c_int, ctypes.c_ulong]
+
+    libc.shmget.argtypes = [ctypes.c_int, ctypes.c_size_t, ctypes.c_int]
+    libc.shmat.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+    libc.shmat.restype = ctypes.c_void_p
+    libc.shmdt.argtypes = [ctypes.c_void_p]
+    libc.shmctl.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_void_p]
+
+    x11.XSetErrorHandler(_record_x_error)
+    return x11, xext, libc
+
+
+def _to_bgr(image: XImage) -> np.ndarray:
+    if image.bits_per_pixel != 32:
+        raise ScreenCaptureError(f"Unsupported X11 visual with {image.bits_per_pixel} bits per pixel")
+
+    buffer = (ctypes.c_ubyte * (image.bytes_per_line * image.height)).from_address(image.data)
+    pixels = np.frombuffer(buffer, np.uint8).reshape(image.height, image.bytes_per_line)[:, : image.width * 4]
+    pixels = pixels.reshape(image.height, image.width, 4)
+
+    # Copies out of the X11 buffer, which the next capture overwrites
+    if image.byte_order == LSB_FIRST:
+        return cv2.cvtColor(pixels, cv2.COLOR_BGRA2BGR)
+    return np.ascontiguousarray(pixels[:, :, 3:0:-1])
+
+
+class X11Grabber:
+    """
+    Reads screen regions straight from the X server into numpy arrays, through a shared memory segment
+    kept between captures when the MIT-SHM extension is available, with XGetImage otherwise.
+    """
+
+    def __init__(self, display_name: str | None = None):
+        libraries = load_libraries()
+        if libraries is None:
+            raise ScreenCaptureError("libX11 and libXext are required for the x11 screenshot backend")
+        self.x11, self.xext, self.libc = libraries
+
+        self.display = self.x11.XOpenDisplay(display_name.encode() if display_name else None)
+        if not self.display:
+            raise ScreenCaptureError(f"Cannot open X display {display_name or os.environ.get('DISPLAY', '')!r}")
+
+        screen = self.x11.XDefaultScreen(self.display)
+        self.root = self.x11.XRootWindow(self.display, screen)
+        self.visual = self.x11.XDefaultVisual(self.display, screen)
+        self.depth = self.x11.XDefaultDepth(self.display, screen)
+        self.screen_size = self.x11.XDisplayWidth(self.display, screen), self.x11.XDisplayHeight(self.display, screen)
+        self.use_shm = bool(self.xext.XShmQueryExtension(self.display))
+
+        self._shm_image = None
+        self._shm_info: XShmSegmentInfo | None = None
+        self._lock = threading.Lock()
+
+    def _detach_shm(self) -> None:
+        if self._shm_image is None:
+            return
+        self.xext.XShmDetach(self.display, ctypes.byref(self._shm_info))
+        self.x11.XSync(self.display, False)
+        # XShmCreateImage images only free their struct, the segment is detached separately
+        self.x11.XDestroyImage(self._shm_image)
+        self.libc.shmdt(ctypes.c_void_p(self._shm_info.shmaddr))
+        self._shm_image = self._shm_info = None
+
+    def _attach_shm(self, width: int, height: int):
+        info = XShmSegmentInfo()
+        image = self.xext.XShmCreateImage(self.display, self.visual, self.depth, Z_PIXMAP, None, ctypes.byref(info), width, height)
+        if not image:
+            raise ScreenCaptureError("XShmCreateImage failed")
+
+        info.shmid = self.libc.shmget(IPC_PRIVATE, image.contents.bytes_per_line * image.contents.height, IPC_CREAT | 0o600)
+        address = self.libc.shmat(info.shmid, None, 0) if info.shmid >= 0 else None
+        if address is None or address == ctypes.c_void_p(-1).value:
+            self.x11.XDestroyImage(image)
+            raise ScreenCaptureError("Could not allocate a shared memory segment")
+        info.shmaddr = image.contents.data = address
+        info.readOnly = False
+
+        errors = len(_x_errors)
+        attached = self.xext.XShmAttach(self.display, ctypes.byref(info))
+        self.x11.XSync(self.display, False)
+        # Removed once the X server and s2t have both detached, even if s2t is killed before that
+        self.libc.shmctl(info.shmid, IPC_RMID, None)
+
+        self._shm_image, self._shm_info = image, info
+        if not attached or len(_x_errors) > errors:
+            # Remote displays cannot share memory with the client
+            self._detach_shm()
+            raise ScreenCaptureError("XShmAttach failed")
+
+    def _grab_shm(self, x: int, y: int, width: int, height: int) -> np.ndarray:
+        if self._shm_image is None or (self._shm_image.contents.width, self._shm_image.contents.height) != (width, height):
+            self._detach_shm()
+            self._attach_shm(width, height)
+
+        errors = len(_x_errors)
+        if not self.xext.XShmGetImage(self.display, self.root, self._shm_image, x, y, ALL_PLANES) or len(_x_errors) > errors:
+            raise ScreenCaptureError("XShmGetImage failed")
+        return _to_bgr(self._shm_image.contents)
+
+    def _grab_plain(self, x: int, y: int, width: int, height: int) -> np.ndarray:
+        image = self.x11.XGetImage(self.display, self.root, x, y, width, height, ALL_PLANES, Z_PIXMAP)
+        if not image:
+            raise ScreenCaptureError("XGetImage failed")
+        try:
+            return _to_bgr(image.contents)
+        finally:
+            self.x11.XDestroyImage(image)
+
+    def grab(self, region: tuple[int, int, int, int] | None = None) -> np.ndarray:
+        """BGR pixels of `region` (x, y, width, height), the whole screen when None."""
+
+        x, y, width, height = region or (0, 0, *self.screen_size)
+        screen_width, screen_height = self.screen_size
+        if x < 0 or y < 0 or width <= 0 or height <= 0 or x + width > screen_width or y + height > screen_height:
+            raise ScreenCaptureError(f"Region {width}x{height}+{x}+{y} is not within the {screen_width}x{screen_height} screen")
+
+        with self._lock:
+            if self.use_shm:
+                try:
+                    return self._grab_shm(x, y, width, height)
+                except ScreenCaptureError:
+                    self._detach_shm()
+                    self.use_shm = False
+            return self._grab_plain(x, y, width, height)
+
+    def close(self) -> None:
+        with self._lock:
+            if self.display:
+                self._detach_shm()
+                self.x11.XCloseDisplay(self.display)
+                self.display = None
+
+
+_grabbers: dict[str, X11Grabber] = {}
+_grabbers_lock = threading.Lock()
+
+
+def x11_grabber(display_name: str | None = None) -> X11Grabber:
+    """Grabber kept open for the process, the daemon reuses its connection and shared memory across captures."""
+
+    display_name = display_name or os.environ.get("DISPLAY", "")
+    with _grabbers_lock:
+        grabber = _grabbers.get(display_name)
+        if grabber is None:
+            grabber = _grabbers[display_name] = X11Grabber(display_name or None)
+    return grabber
+
+
+def grab_screen(region: tuple[int, int, int, int] | None = None) -> np.ndarray:
+    return x11_grabber().grab(region)
@@ -0,0 +1,12 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def isolated_user_dirs(monkeypatch, tmp_path_factory):
+    """Keeps caches, snapshots and runtime files written during tests out of the real user directories."""
+    xdg_dir = tmp_path_factory.mktemp("xdg")
+    for name in ["XDG_CACHE_HOME", "XDG_CONFIG_HOME", "XDG_STATE_HOME", "XDG_RUNTIME_DIR"]:
+        path = xdg_dir / name.lower()
+        # platformdirs falls back to a shared directory when the runtime one is not private
+        path.mkdir(mode=0o700 if name == "XDG_RUNTIME_DIR" else 0o777)
+        monkeypatch.setenv(name, str(path))
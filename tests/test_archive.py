@@ -0,0 +1,136 @@
+import json
+import os
+import random
+
+from screenshot_to_text import retention
+from screenshot_to_text.archive import bundle_paths, compress, decompress
+from screenshot_to_text.retention import INDEX_FILENAME, CaptureIndex, RetentionPolicy
+
+
+def write_capture(directory, stem, size=100):
+    files = [directory / f"{stem}.png", directory / f"{stem}.json", directory / f"{stem}_processed.png"]
+    # Noise, like a PNG it does not compress
+    files[0].write_bytes(random.Random(stem).randbytes(size))
+    files[1].write_text(json.dumps({"text": f"text of {stem} " * 20}))
+    files[2].write_bytes(b"x" * size)
+    return files
+
+
+def packed_index(directory, count, max_bundle_bytes=1 << 20):
+    index = CaptureIndex(directory)
+    for i in range(count):
+        index.record(f"shot{i}", write_capture(directory, f"shot{i}"), created=1000 + i)
+    assert index.pack(keep_loose=2, max_bundle_bytes=max_bundle_bytes) == count - 2
+    return index
+
+
+def test_codecs():
+    text = b"the same line\n" * 100
+    codec, payload = compress(text)
+    assert codec != "raw" and len(payload) < len(text)
+    assert decompress(codec, payload) == text
+
+    noise = os.urandom(100)
+    assert compress(noise) == ("raw", noise)
+
+
+def test_pack_keeps_the_newest_loose(tmp_path):
+    kept = tmp_path / "kept"
+    kept.mkdir()
+    originals = {path.name: path.read_bytes() for path in write_capture(tmp_path, "shot0")}
+
+    with packed_index(kept, 4) as index:
+        assert sorted(path.name for path in kept.glob("shot*")) == [
+            "shot2.json",
+            "shot2.png",
+            "shot2_processed.png",
+            "shot3.json",
+            "shot3.png",
+            "shot3_processed.png",
+        ]
+        assert sorted(index.files("shot0")) == ["shot0.json", "shot0.png"]
+        assert index.read("shot0", "shot0.png") == originals["shot0.png"]
+        assert index.read("shot0", "shot0.json") == originals["shot0.json"]
+        assert index.read("shot3", "shot3.json") == (kept / "shot3.json").read_bytes()
+
+        count, size = index.totals()
+        loose = sum(path.stat().st_size for path in kept.glob("shot*"))
+        assert count == 4
+        # The processed images were dropped, and the text compresses to less than the image
+        assert size - loose < 2 * (100 + 100)
+
+        # Nothing left to pack
+        assert index.pack(keep_loose=2, max_bundle_bytes=1 << 20) == 0
+
+
+def test_retention_deletes_packed_captures(tmp_path):
+    # A bundle per capture
+    with packed_index(tmp_path, 5, max_bundle_bytes=1) as index:
+        assert len(bundle_paths(tmp_path)) == 3
+
+        assert index.enforce(RetentionPolicy(max_count=3)) == 2
+        assert index.totals()[0] == 3
+        assert index.files("shot0") == []
+        assert [path.name for path in bundle_paths(tmp_path)] == ["bundle-000003.s2tb"]
+
+        # The newest bundle stays while it may be appended to
+        assert index.enforce(RetentionPolicy(max_count=2)) == 1
+        assert [path.name for path in bundle_paths(tmp_path)] == ["bundle-000003.s2tb"]
+        assert not (tmp_path / "shot2.png").exists()
+
+
+def test_lost_index_is_rebuilt_from_the_bundles(tmp_path):
+    with packed_index(tmp_path, 4) as index:
+        expected = index.totals()
+        image = index.read("shot1", "shot1.png")
+
+    # A packer that died halfway through an entry
+    with open(bundle_paths(tmp_path)[-1], "ab") as f:
+        f.write(b"S2TB\x10\x00\x00\x00{")
+    (tmp_path / INDEX_FILENAME).unlink()
+
+    with CaptureIndex(tmp_path) as index:
+        assert index.totals() == expected
+        assert index.read("shot1", "shot1.png") == image
+        # gc keeps the packed captures as well
+        assert index.rebuild() == 4
+
+
+def test_lost_index_keeps_deleted_captures_deleted(tmp_path):
+    with packed_index(tmp_path, 4) as index:
+        assert index.enforce(RetentionPolicy(max_count=3)) == 1
+        expected = index.totals()
+
+    # shot0 is still in the newest bundle
+    (tmp_path / INDEX_FILENAME).unlink()
+
+    with CaptureIndex(tmp_path) as index:
+        assert index.totals() == expected
+        assert index.files("shot0") == []
+
+
+def test_capture_deleted_while_being_packed(mocker, tmp_path):
+    index = CaptureIndex(tmp_path)
+    for i in range(3):
+        index.record(f"shot{i}", write_capture(tmp_path, f"shot{i}"), created=1000 + i)
+    append_entries = retention.append_entries
+
+    def delete_then_append(directory, entries, max_bundle_bytes):
+        # Retention in another process, after the packer read the files
+        if entries[0][0] == "shot0":
+            with CaptureIndex(tmp_path) as other:
+                assert other.enforce(RetentionPolicy(max_count=2)) == 1
+        return append_entries(directory, entries, max_bundle_bytes)
+
+    mocker.patch("screenshot_to_text.retention.append_entries", side_effect=delete_then_append)
+    index.pack(keep_loose=1, max_bundle_bytes=1 << 20)
+
+    rows = index.connection.execute("SELECT count(*), sum(bytes) FROM captures").fetchone()
+    assert index.totals() == rows and rows[0] == 2
+    assert index.connection.execute("SELECT DISTINCT stem FROM archived").fetchall() == [("shot1",)]
+
+    (tmp_path / INDEX_FILENAME).unlink()
+    with CaptureIndex(tmp_path) as rebuilt:
+        assert rebuilt.files("shot0") == []
+        assert rebuilt.totals()[0] == 2
+    index.close()
@@ -0,0 +1,78 @@
+import numpy as np
+
+from screenshot_to_text.app import recognize_words
+from screenshot_to_text.bands import Band, find_bands, find_text_segments, ocr_bands
+from screenshot_to_text.layout import Word, words_to_text
+from screenshot_to_text.models.s2tconfig import OCRConfig
+
+
+def text_page(line_tops: list[int], height: int = 200, line_height: int = 10) -> np.ndarray:
+    image = np.full((height, 50), 255, np.uint8)
+    for top in line_tops:
+        image[top : top + line_height, 5:45] = 0
+    return image
+
+
+def test_find_text_segments_merges_small_gaps():
+    rows = np.zeros(40, bool)
+    rows[2:5] = rows[6:9] = rows[20:25] = True
+
+    assert find_text_segments(rows, min_gap=3) == [Band(2, 9), Band(20, 25)]
+    assert find_text_segments(np.zeros(10, bool), min_gap=3) == []
+
+
+def test_find_bands_cuts_in_gaps():
+    image = text_page([10, 40, 70, 100, 130, 160])
+
+    bands = find_bands(image, max_bands=3, min_gap=5)
+
+    assert len(bands) == 3
+    assert bands[0].top == 0 and bands[-1].bottom == image.shape[0]
+    assert all(a.bottom == b.top for a, b in zip(bands, bands[1:]))
+    for band in bands:
+        assert not (image[band.top] == 0).any() or band.top == 0
+    assert bands[1].top in range(50, 70)
+
+
+def test_find_bands_light_text_on_dark():
+    image = 255 - text_page([10, 100])
+
+    assert len(find_bands(image, max_bands=2, min_gap=5)) == 2
+
+
+def test_ocr_bands_returns_page_coordinates():
+    image = text_page([10, 100])
+    bands = [Band(0, 50), Band(50, 200)]
+
+    def recognize(band_image):
+        return [Word(text=str(band_image.shape[0]), left=5, top=10, width=40, height=10)]
+
+    words = ocr_bands(recognize, image, bands, workers=2)
+
+    assert [(word.text, word.top) for word in words] == [("50", 10), ("150", 60)]
+
+
+def test_recognize_words_small_image_single_pass(mocker):
+    run_ocr_words = mocker.patch("screenshot_to_text.app.run_ocr_words", return_value=[])
+    config = OCRConfig(tool="tesseract", enabled=True, cmd=["tesseract"], band_split_min_pixels=1_000_000, band_workers=4)
+
+    recognize_words(config, text_page([10, 100]))
+
+    run_ocr_words.assert_called_once()
+
+
+def test_recognize_words_splits_large_images(mocker):
+    image = text_page([10, 40, 70, 100, 130, 160])
+
+    def fake_ocr(config, band_image):
+        ink = np.flatnonzero((band_image == 0).any(axis=1))
+        return [Word(text=f"line{i}", left=5, top=int(top), width=40, height=10) for i, top in enumerate(ink[::10])]
+
+    run_ocr_words = mocker.patch("screenshot_to_text.app.run_ocr_words", side_effect=fake_ocr)
+    config = OCRConfig(tool="tesseract", enabled=True, cmd=["tesseract"], band_split_min_pixels=100, band_workers=3, band_min_gap=5)
+
+    words = recognize_words(config, image)
+
+    assert run_ocr_words.call_count == 3
+    assert [word.top for word in words] == [10, 40, 70, 100, 130, 160]
+    assert len(words_to_text(words).splitlines()) == 6
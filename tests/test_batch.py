@@ -0,0 +1,96 @@
+import io
+import json
+import sys
+
+import cv2
+import numpy as np
+import pytest
+from typer.testing import CliRunner
+
+from screenshot_to_text.batch import completed_inputs, expand_inputs, run_batch
+from screenshot_to_text.cli import app
+from screenshot_to_text.models.s2tconfig import OCRConfig, PreprocessConfig
+
+FAKE_TESSERACT = """#!{python}
+import sys
+
+image = sys.stdin.buffer.read()
+assert image.startswith(b"P5")
+print("level\\tpage_num\\tblock_num\\tpar_num\\tline_num\\tword_num\\tleft\\ttop\\twidth\\theight\\tconf\\ttext")
+print("5\\t1\\t1\\t1\\t1\\t1\\t0\\t0\\t50\\t20\\t95\\t" + str(len(image)))
+"""
+
+
+@pytest.fixture
+def fake_ocr_config(tmp_path):
+    script = tmp_path / "fake-tesseract"
+    script.write_text(FAKE_TESSERACT.format(python=sys.executable))
+    script.chmod(0o755)
+    return OCRConfig(tool=str(script), enabled=True, cmd=[str(script), "{filename}", "{filename_pdf}", "pdf"], executable=str(script))
+
+
+@pytest.fixture
+def screenshots(tmp_path):
+    directory = tmp_path / "screenshots"
+    (directory / "nested").mkdir(parents=True)
+    paths = [directory / "a.png", directory / "nested" / "b.png", directory / "c.png"]
+    for index, path in enumerate(paths):
+        image = np.full((20 + index, 40, 3), 255, np.uint8)
+        cv2.putText(image, "hi", (2, 15), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1)
+        cv2.imwrite(str(path), image)
+    cv2.imwrite(str(directory / "a_processed.png"), np.zeros((10, 20), np.uint8))
+    (directory / "a.pdf").write_bytes(b"")
+    return paths
+
+
+def test_expand_inputs(tmp_path, screenshots):
+    directory = tmp_path / "screenshots"
+
+    assert list(expand_inputs([str(directory)])) == sorted(screenshots)
+    assert list(expand_inputs([str(directory / "*.png"), str(directory / "a.png")])) == [screenshots[0], screenshots[2]]
+
+
+def test_completed_inputs(tmp_path):
+    output = tmp_path / "out.jsonl"
+    output.write_text('{"path": "/a.png", "text": "a"}\n{"path": "/b.png", "error": "boom"}\n{"path": "/c.pn')
+
+    assert completed_inputs(output) == {"/a.png"}
+    assert completed_inputs(tmp_path / "missing.jsonl") == set()
+
+
+def test_run_batch(fake_ocr_config, screenshots):
+    output = io.StringIO()
+
+    summary = run_batch(fake_ocr_config, screenshots + [screenshots[0].parent / "missing.png"], output, workers=2, skip={str(screenshots[2])})
+
+    records = {record["path"]: record for record in map(json.loads, output.getvalue().splitlines())}
+    assert (summary.processed, summary.skipped, summary.failed) == (2, 1, 1)
+    assert set(records) == {str(screenshots[0]), str(screenshots[1]), str(screenshots[0].parent / "missing.png")}
+    assert records[str(screenshots[0])]["text"].isdigit()
+    assert set(records[str(screenshots[1])]["timings"]) == {"load", "plan", "preprocess", "ocr", "total"}
+    assert "ScreenshotReadError" in records[str(screenshots[0].parent / "missing.png")]["error"]
+
+
+def test_batch_command_resumes(mocker, tmp_path, fake_ocr_config, screenshots):
+    output = tmp_path / "out.jsonl"
+    mocker.patch("screenshot_to_text.cli.read_config", return_value=mocker.Mock(ocr=fake_ocr_config, preprocess=PreprocessConfig()))
+    runner = CliRunner()
+
+    runner.invoke(app, ["batch", str(screenshots[0]), "--output", str(output), "--workers", "1"], catch_exceptions=False)
+    result = runner.invoke(app, ["batch", str(tmp_path / "screenshots"), "--output", str(output), "--workers", "1"], catch_exceptions=False)
+
+    assert "Processed 2, skipped 1, failed 0" in result.output
+    assert sorted(json.loads(line)["path"] for line in output.read_text().splitlines()) == sorted(map(str, screenshots))
+
+
+def test_run_batch_words(fake_ocr_config, screenshots):
+    output = io.StringIO()
+
+    run_batch(fake_ocr_config, screenshots[:1], output, workers=1, include_words=True)
+
+    [record] = map(json.loads, output.getvalue().splitlines())
+    [word] = record["words"]
+    plan = record["plan"]
+    left, top = plan["crop"][:2] if plan["crop"] else (0, 0)
+    assert (word["left"], word["top"]) == (left, top)
+    assert word["width"] == round(50 / plan["scale"])
@@ -0,0 +1,77 @@
+import os
+import signal
+import sys
+import time
+
+import pytest
+
+from screenshot_to_text import clipboard
+from screenshot_to_text.clipboard import hand_off, stop_previous_owner
+from screenshot_to_text.errors import CommandFailedError
+
+# Serves the selection until terminated, like xclip and wl-copy in the foreground
+OWNER = """#!{python}
+import sys, time
+open(sys.argv[1], "w").write(sys.stdin.read())
+time.sleep(30)
+"""
+
+
+@pytest.fixture
+def owner(tmp_path):
+    script = tmp_path / "owner"
+    script.write_text(OWNER.format(python=sys.executable))
+    script.chmod(0o755)
+    yield str(script)
+    for process in clipboard._owners:
+        process.kill()
+        process.wait()
+
+
+def test_hand_off_returns_while_owner_runs(tmp_path, owner):
+    pidfile = tmp_path / "clipboard.pid"
+    start = time.perf_counter()
+
+    hand_off([owner, str(tmp_path / "copied")], "x" * 1_000_000, pidfile=pidfile)
+
+    assert time.perf_counter() - start < 5
+    process = clipboard._owners[-1]
+    assert process.poll() is None
+    assert pidfile.read_text() == f"{process.pid} {owner}"
+
+
+def test_hand_off_replaces_previous_owner(tmp_path, owner):
+    pidfile = tmp_path / "clipboard.pid"
+
+    hand_off([owner, str(tmp_path / "first")], "first", pidfile=pidfile)
+    first = clipboard._owners[-1]
+    hand_off([owner, str(tmp_path / "second")], "second", pidfile=pidfile)
+
+    second = clipboard._owners[-1]
+    copied = tmp_path / "second"
+    # The new owner writes the text after reading all of stdin, which may be after hand_off returned
+    deadline = time.monotonic() + 5
+    while not (copied.exists() and copied.read_text() == "second") and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    assert first.wait(5) == -signal.SIGTERM
+    assert [owner for owner in clipboard._owners if owner.poll() is None] == [second]
+    assert copied.read_text() == "second"
+    assert pidfile.read_text().startswith(f"{second.pid} ")
+
+
+def test_hand_off_reports_start_up_errors(tmp_path):
+    cmd = [sys.executable, "-c", "import sys; sys.stderr.write('cannot open display'); sys.exit(1)"]
+
+    with pytest.raises(CommandFailedError, match="cannot open display"):
+        hand_off(cmd, "text", grace=5, pidfile=tmp_path / "clipboard.pid")
+
+
+def test_stop_previous_owner_checks_the_process(tmp_path):
+    pidfile = tmp_path / "clipboard.pid"
+    # A reused pid, it runs something other than the clipboard tool
+    pidfile.write_text(f"{os.getpid()} /usr/bin/xclip")
+
+    stop_previous_owner(pidfile)
+
+    assert not pidfile.exists()
@@ -0,0 +1,105 @@
+import threading
+
+import pytest
+from typer.testing import CliRunner
+
+from screenshot_to_text.cli import app
+from screenshot_to_text.daemon import ConfigCache, DaemonServer, prepare_socket_path, run_via_daemon, send_request
+from screenshot_to_text.errors import DaemonAlreadyRunningError, DaemonNotRunningError, DaemonRequestError
+
+
+@pytest.fixture
+def daemon_server(mocker, tmp_path):
+    path = tmp_path / "s2t.sock"
+    config_cache = mocker.Mock(spec=ConfigCache)
+    config_cache.get.return_value = mocker.Mock(name="config", **{"profile.enabled": False})
+    run_capture = mocker.Mock()
+
+    server = DaemonServer(path, config_cache, run_capture)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield path, run_capture, config_cache.get.return_value
+
+    server.shutdown()
+    server.server_close()
+
+
+def test_run_via_daemon(mocker, daemon_server):
+    path, run_capture, config = daemon_server
+
+    run_via_daemon(keep_screenshot=False, ocr_enabled=None, path=path)
+    run_via_daemon(path=path, region=(10, 20, 300, 40))
+
+    assert run_capture.call_args_list == [mocker.call(config, False, None, None), mocker.call(config, None, None, (10, 20, 300, 40))]
+
+
+def test_run_via_daemon_returns_profile(daemon_server):
+    path, _, _ = daemon_server
+
+    response = run_via_daemon(path=path, profile=True)
+
+    assert response["profile"]["total"] >= 0
+    # The daemon's lifetime peak says nothing about this run
+    assert "peak_rss_kib" not in response["profile"]
+    assert response["profile"]["rss_after_kib"] > 0 and response["profile"]["process_peak_rss_kib"] > 0
+
+
+def test_daemon_reports_errors(daemon_server):
+    path, run_capture, _ = daemon_server
+    run_capture.side_effect = RuntimeError("boom")
+
+    with pytest.raises(DaemonRequestError, match="boom"):
+        run_via_daemon(path=path)
+
+
+def test_daemon_unknown_command(daemon_server):
+    path, _, _ = daemon_server
+
+    with pytest.raises(DaemonRequestError):
+        send_request({"command": "unknown"}, path)
+
+
+def test_daemon_not_running(tmp_path):
+    with pytest.raises(DaemonNotRunningError):
+        run_via_daemon(path=tmp_path / "s2t.sock")
+
+
+def test_prepare_socket_path(daemon_server, tmp_path):
+    path, _, _ = daemon_server
+
+    with pytest.raises(DaemonAlreadyRunningError):
+        prepare_socket_path(path)
+
+    stale_path = tmp_path / "stale.sock"
+    stale_path.touch()
+    prepare_socket_path(stale_path)
+    assert not stale_path.exists()
+
+
+def test_run_falls_back_without_daemon(mocker, tmp_path):
+    runner = CliRunner()
+
+    mocker.patch("screenshot_to_text.daemon.socket_path", return_value=tmp_path / "s2t.sock")
+    config = mocker.Mock(name="config", **{"profile.enabled": False})
+    mocker.patch("screenshot_to_text.cli.read_config", return_value=config)
+    capture = mocker.patch("screenshot_to_text.app.capture_screenshot_and_process")
+
+    result = runner.invoke(app, ["run", "--via-daemon"], catch_exceptions=False)
+
+    assert result.exit_code == 0
+    capture.assert_called_once_with(config, None, None, None, detach_full_pass=True)
+
+
+def test_config_cache_reloads_on_change(mocker, tmp_path):
+    config_path = tmp_path / "config.toml"
+    config_path.write_text("a")
+    read_config = mocker.patch("screenshot_to_text.config.read_config", side_effect=["first", "second"])
+
+    cache = ConfigCache(config_path)
+    assert cache.get() == "first"
+    assert cache.get() == "first"
+
+    config_path.write_text("changed")
+    assert cache.get() == "second"
+    assert read_config.call_count == 2
@@ -0,0 +1,122 @@
+import pytest
+
+from screenshot_to_text.app import ocr_stdout_cmd, ocr_to_text, run_ocr_words
+from screenshot_to_text.errors import CommandError, ToolNotFoundError
+from screenshot_to_text.layout import Word, parse_hocr, parse_tsv, words_to_text
+from screenshot_to_text.models.ocr_output import OCROutput
+from screenshot_to_text.models.s2tconfig import OCRConfig
+
+TSV = "\n".join(
+    [
+        "level\tpage_num\tblock_num\tpar_num\tline_num\tword_num\tleft\ttop\twidth\theight\tconf\ttext",
+        "1\t1\t0\t0\t0\t0\t0\t0\t400\t100\t-1\t",
+        "4\t1\t1\t1\t1\t0\t10\t10\t100\t20\t-1\t",
+        "5\t1\t1\t1\t1\t1\t10\t10\t40\t20\t96.5\tdef",
+        "5\t1\t1\t1\t1\t2\t70\t10\t40\t20\t95.1\tmain():",
+        "5\t1\t1\t1\t2\t1\t50\t40\t60\t20\t91.0\treturn",
+        "5\t1\t1\t1\t2\t2\t130\t40\t20\t20\t90.0\t 1",
+        "5\t1\t1\t1\t2\t3\t160\t40\t20\t20\t-1\t ",
+    ]
+)
+
+HOCR = """
+<div class='ocr_page' title='bbox 0 0 400 100'>
+ <span class='ocr_line' title="bbox 10 10 110 30">
+  <span class='ocrx_word' title='bbox 10 10 50 30; x_wconf 96'>def</span>
+  <span class='ocrx_word' title='bbox 70 10 110 30; x_wconf 95'><strong>main():</strong></span>
+ </span>
+</div>
+"""
+
+
+def test_parse_tsv():
+    words = parse_tsv(TSV)
+
+    assert [word.text for word in words] == ["def", "main():", "return", "1"]
+    assert words[0] == Word(text="def", left=10, top=10, width=40, height=20, conf=96.5)
+
+
+def test_parse_hocr():
+    words = parse_hocr(HOCR)
+
+    assert [word.text for word in words] == ["def", "main():"]
+    assert words[1] == Word(text="main():", left=70, top=10, width=40, height=20, conf=95.0)
+
+
+def test_words_to_text_keeps_indentation():
+    char_width, line_height = 10, 20
+    words = [
+        Word(text="if", left=0, top=0, width=2 * char_width, height=line_height),
+        Word(text="x:", left=3 * char_width, top=0, width=2 * char_width, height=line_height),
+        Word(text="pass", left=4 * char_width, top=30, width=4 * char_width, height=line_height),
+        Word(text="done", left=0, top=90, width=4 * char_width, height=line_height),
+    ]
+
+    assert words_to_text(words) == "if x:\n    pass\n\ndone"
+
+
+def test_words_to_text_aligns_columns():
+    words = [
+        Word(text="name", left=0, top=0, width=40, height=20),
+        Word(text="size", left=200, top=2, width=40, height=20),
+        Word(text="a", left=0, top=30, width=10, height=20),
+        Word(text="12", left=200, top=30, width=20, height=20),
+    ]
+
+    assert words_to_text(words) == "name                size\na                   12"
+
+
+def test_words_to_text_empty():
+    assert words_to_text([]) == ""
+
+
+@pytest.mark.parametrize("output", [OCROutput.TSV, OCROutput.HOCR])
+def test_ocr_stdout_cmd(tmp_path, output):
+    config = OCRConfig(
+        tool="tesseract",
+        enabled=True,
+        cmd=["tesseract", "--psm", "6", "-c", "chars={{}}", "{filename}", "{filename_pdf}", "pdf"],
+        output=output,
+    )
+
+    cmd = ocr_stdout_cmd(config, tmp_path / "a.png")
+
+    assert cmd == ["tesseract", "--psm", "6", "-c", "chars={}", str(tmp_path / "a.png"), "stdout", output.value]
+
+
+def test_ocr_to_text_pdf_fallback(mocker, tmp_path):
+    config = OCRConfig(tool="tesseract", enabled=True, cmd=["tesseract"], output=OCROutput.PDF)
+
+    run_ocr = mocker.patch("screenshot_to_text.app.run_ocr", return_value=tmp_path / "a.pdf")
+    mocker.patch("screenshot_to_text.app.pdf_to_txt_with_layout", return_value="pdf text")
+
+    assert ocr_to_text(config, tmp_path / "a.png") == "pdf text"
+    run_ocr.assert_called_once()
+
+
+def test_ocr_to_text_tsv(mocker, tmp_path):
+    config = OCRConfig(tool="tesseract", enabled=True, cmd=["tesseract", "{filename}", "{filename_pdf}", "pdf"])
+
+    mocker.patch("screenshot_to_text.app.runtime_validate")
+    run_command = mocker.patch("screenshot_to_text.app.run_command", return_value=TSV)
+
+    assert ocr_to_text(config, tmp_path / "a.png") == "def  main():\n   return 1"
+    assert run_command.call_args.args[0] == ["tesseract", str(tmp_path / "a.png"), "stdout", "tsv"]
+
+
+@pytest.mark.parametrize("tool", [None, "", " "])
+def test_ocr_words_no_tool(tmp_path, tool):
+    config = OCRConfig(tool=tool, enabled=True, cmd=[])
+
+    with pytest.raises(ToolNotFoundError):
+        run_ocr_words(config, tmp_path)
+
+
+@pytest.mark.parametrize("cmd", [None, [], [""], [" "]])
+def test_ocr_words_no_command(mocker, tmp_path, cmd):
+    config = OCRConfig(tool="some tool", enabled=True, cmd=cmd)
+
+    mocker.patch("screenshot_to_text.app.validate_tool")
+
+    with pytest.raises(CommandError):
+        run_ocr_words(config, tmp_path)
@@ -0,0 +1,153 @@
+import multiprocessing
+import os
+
+import cv2
+import numpy as np
+from typer.testing import CliRunner
+
+from screenshot_to_text.app import screenshot_to_text
+from screenshot_to_text.cli import app
+from screenshot_to_text.models.s2tconfig import OCRCacheConfig, OCRConfig
+from screenshot_to_text.ocr_cache import OCRCache, ocr_cache_dir, perceptual_hash
+
+
+def make_image(text: str = "hello", shift: int = 0) -> np.ndarray:
+    image = np.full((40, 160, 3), 255, np.uint8)
+    cv2.putText(image, text, (5 + shift, 28), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2)
+    return image
+
+
+def test_cache_hit_and_miss(tmp_path):
+    cache = OCRCache(tmp_path, max_bytes=1024)
+    image = make_image()
+    key = cache.key(image, ["tesseract", "tsv"])
+
+    assert cache.get(key, image) is None
+    cache.put(key, image, "hello")
+    assert cache.get(key, image) == "hello"
+
+    stats = cache.read_stats()
+    assert (stats.hits, stats.misses) == (1, 1)
+
+
+def test_cache_key_depends_on_params():
+    image = make_image()
+
+    assert OCRCache.key(image, ["--psm", "6"]) != OCRCache.key(image, ["--psm", "7"])
+    assert OCRCache.key(image, ["--psm", "6"]) == OCRCache.key(image.copy(), ["--psm", "6"])
+
+
+def test_cache_near_match(tmp_path):
+    cache = OCRCache(tmp_path, max_bytes=1024, near_match_distance=4)
+    image = make_image()
+    near_image = image.copy()
+    near_image[0, 0] = 0
+
+    cache.put(cache.key(image, []), image, "hello")
+
+    assert (perceptual_hash(image) ^ perceptual_hash(near_image)).bit_count() <= 4
+    assert cache.get(cache.key(near_image, []), near_image) == "hello"
+    assert cache.read_stats().near_hits == 1
+
+
+def test_near_match_needs_the_same_params_and_size(tmp_path):
+    cache = OCRCache(tmp_path, max_bytes=1024, near_match_distance=64)
+    image = make_image()
+    cache.put(cache.key(image, ["--psm", "6"]), image, "hello")
+
+    assert cache.get(cache.key(image, ["--psm", "7"]), image) is None
+    wider = np.full((40, 170, 3), 255, np.uint8)
+    wider[:, :160] = image
+    assert cache.get(cache.key(wider, ["--psm", "6"]), wider) is None
+    assert cache.get(cache.key(image[:, :, 0].copy(), ["--psm", "6"]), image[:, :, 0].copy()) is None
+
+
+def test_hits_do_not_write_stats(tmp_path):
+    cache = OCRCache(tmp_path, max_bytes=1024)
+    image = make_image()
+    key = cache.key(image, [])
+    cache.put(key, image, "hello")
+    stored = (tmp_path / "stats.json").read_text()
+
+    for _ in range(3):
+        cache.get(key, image)
+
+    assert (tmp_path / "stats.json").read_text() == stored
+    assert cache.read_stats().hits == 3
+    cache.flush()
+    assert cache._read_stored_stats().hits == 3
+
+
+def test_overwriting_an_entry_keeps_the_byte_total(tmp_path):
+    cache = OCRCache(tmp_path, max_bytes=1024)
+    image = make_image()
+    key = cache.key(image, ["tesseract", "tsv"])
+
+    for text in ["hello", "hello", "hi"]:
+        cache.put(key, image, text)
+
+    assert cache.read_stats().bytes == len("hi")
+
+
+def record_hits(path, count):
+    cache = OCRCache(path)
+    for _ in range(count):
+        cache._record(hits=1)
+        cache.flush()
+
+
+def test_concurrent_stats_updates_are_not_lost(tmp_path):
+    processes = [multiprocessing.get_context("fork").Process(target=record_hits, args=(tmp_path, 50)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    assert OCRCache(tmp_path).read_stats().hits == 200
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    cache = OCRCache(tmp_path, max_bytes=250)
+    images = [make_image(text) for text in ["one", "two", "three"]]
+    keys = [cache.key(image, []) for image in images]
+
+    for index in range(2):
+        cache.put(keys[index], images[index], "x" * 100)
+        os.utime(cache._entry_path(keys[index], perceptual_hash(images[index])), ns=(index, index))
+
+    # Reading the first entry makes the second one the least recently used
+    assert cache.get(keys[0], images[0]) is not None
+    cache.put(keys[2], images[2], "x" * 100)
+
+    assert cache.get(keys[1], images[1]) is None
+    assert cache.get(keys[0], images[0]) is not None
+    assert cache.get(keys[2], images[2]) is not None
+    assert cache.read_stats().bytes == 200
+
+
+def test_screenshot_to_text_uses_cache(mocker, tmp_path):
+    filename = tmp_path / "screenshot.png"
+    cv2.imwrite(str(filename), make_image())
+    config = OCRConfig(tool="tesseract", enabled=True, cmd=["tesseract", "{filename}"], cache=OCRCacheConfig(enabled=True, max_bytes=1024))
+
+    image_to_text = mocker.patch("screenshot_to_text.app.image_to_text", return_value="hello")
+
+    assert screenshot_to_text(config, filename, keep_processed=False) == "hello"
+    assert screenshot_to_text(config, filename, keep_processed=False) == "hello"
+    image_to_text.assert_called_once()
+
+    config.cache.enabled = False
+    screenshot_to_text(config, filename, keep_processed=False)
+    assert image_to_text.call_count == 2
+
+
+def test_cache_command(tmp_path):
+    cache = OCRCache(ocr_cache_dir())
+    image = make_image()
+    cache.get(cache.key(image, []), image)
+
+    result = CliRunner().invoke(app, ["cache"], catch_exceptions=False)
+    assert "misses: 1" in result.output
+
+    CliRunner().invoke(app, ["cache", "--clear"], catch_exceptions=False)
+    assert cache.read_stats().misses == 0
@@ -0,0 +1,295 @@
+import json
+import sys
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+from screenshot_to_text.app import (
+    capture_screenshot_and_process,
+    encode_image_for_ocr,
+    extract_text_to_clipboard,
+    image_to_words,
+    pack_in_background,
+    run_command,
+    screenshot_to_text,
+    with_psm,
+)
+from screenshot_to_text.errors import CommandTimeoutError
+from screenshot_to_text.layout import Word
+from screenshot_to_text.models.ocr_output import OCROutput
+from screenshot_to_text.models.s2tconfig import ClipboardConfig, OCRConfig, S2TConfig, ScreenshotConfig
+from screenshot_to_text.retention import INDEX_FILENAME, CaptureIndex
+
+OCR_CMD = ["tesseract", "--psm", "6", "{filename}", "{filename_pdf}", "pdf"]
+TSV = "level\tpage_num\tblock_num\tpar_num\tline_num\tword_num\tleft\ttop\twidth\theight\tconf\ttext\n5\t1\t1\t1\t1\t1\t0\t0\t50\t20\t95\thello\n"
+
+
+def make_config(tmp_path, keep: bool, output: OCROutput = OCROutput.TSV) -> S2TConfig:
+    return S2TConfig(
+        screenshot=ScreenshotConfig(tool="flameshot", cmd=["flameshot"], keep=keep, keep_max_count=-1, path=tmp_path / "kept"),
+        ocr=OCRConfig(tool="tesseract", enabled=True, cmd=OCR_CMD, output=output),
+        clipboard=ClipboardConfig(tool="xclip", cmd=["xclip"]),
+    )
+
+
+def write_screenshot(path):
+    image = np.full((20, 40, 3), 255, np.uint8)
+    cv2.putText(image, "hi", (2, 15), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1)
+    cv2.imwrite(str(path), image)
+
+
+def test_encode_image_for_ocr_roundtrip():
+    image = np.arange(12, dtype=np.uint8).reshape(3, 4)
+
+    encoded = encode_image_for_ocr(image)
+
+    assert bytes(encoded[:2]) == b"P5"
+    assert np.array_equal(cv2.imdecode(np.frombuffer(encoded, np.uint8), cv2.IMREAD_UNCHANGED), image)
+
+
+def test_screenshot_to_text_in_memory(mocker, tmp_path):
+    filename = tmp_path / "screenshot.png"
+    write_screenshot(filename)
+
+    mocker.patch("screenshot_to_text.app.runtime_validate")
+    run_command = mocker.patch("screenshot_to_text.app.run_command", return_value=TSV)
+
+    text = screenshot_to_text(make_config(tmp_path, keep=False).ocr, filename, keep_processed=False)
+
+    assert text == "hello"
+    cmd = run_command.call_args.args[0]
+    assert cmd == ["tesseract", "--psm", "6", "stdin", "stdout", "tsv"]
+    assert bytes(run_command.call_args.kwargs["binary_input"][:2]) == b"P5"
+    assert sorted(tmp_path.iterdir()) == [filename]
+
+
+def test_blank_screenshot_skips_ocr(mocker, tmp_path):
+    filename = tmp_path / "screenshot.png"
+    cv2.imwrite(str(filename), np.full((20, 40, 3), 255, np.uint8))
+    run_command = mocker.patch("screenshot_to_text.app.run_command")
+
+    assert screenshot_to_text(make_config(tmp_path, keep=False).ocr, filename, keep_processed=False) == ""
+    run_command.assert_not_called()
+
+
+def test_image_to_words_in_original_coordinates(mocker, tmp_path):
+    image = np.full((200, 400, 3), 255, np.uint8)
+    cv2.putText(image, "hello", (200, 120), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1)
+    mocker.patch("screenshot_to_text.app.runtime_validate")
+    mocker.patch("screenshot_to_text.app.run_command", return_value=TSV)
+
+    [word] = image_to_words(make_config(tmp_path, keep=False).ocr, image)
+
+    # The crop starts left of and above the text, the box is offset by it rather than at the origin
+    assert 150 < word.left < 200 and 70 < word.top < 110
+    assert word.text == "hello"
+
+
+def test_screenshot_to_text_pdf_uses_files(mocker, tmp_path):
+    filename = tmp_path / "screenshot.png"
+    write_screenshot(filename)
+
+    mocker.patch("screenshot_to_text.app.run_ocr", return_value=tmp_path / "screenshot_processed.pdf")
+    mocker.patch("screenshot_to_text.app.pdf_to_txt_with_layout", return_value="pdf text")
+
+    text = screenshot_to_text(make_config(tmp_path, keep=False, output=OCROutput.PDF).ocr, filename)
+
+    assert text == "pdf text"
+    assert (tmp_path / "screenshot_processed.png").exists()
+
+
+def test_capture_in_memory_leaves_no_files(mocker, tmp_path):
+    runtime_dir = tmp_path / "runtime"
+
+    def fake_take_screenshot(screenshot_config, screenshot_dir):
+        assert screenshot_dir == runtime_dir
+        filename = screenshot_dir / "screenshot.png"
+        write_screenshot(filename)
+        return filename
+
+    mocker.patch("screenshot_to_text.app.user_runtime_dir", return_value=str(runtime_dir))
+    mocker.patch("screenshot_to_text.app.take_screenshot", side_effect=fake_take_screenshot)
+    mocker.patch("screenshot_to_text.app.run_ocr_words", return_value=[])
+    mocker.patch("screenshot_to_text.app.copy_text_to_clipboard")
+
+    capture_screenshot_and_process(make_config(tmp_path, keep=False))
+
+    assert list(runtime_dir.iterdir()) == []
+
+
+def test_x11_capture_skips_the_png(mocker, tmp_path):
+    runtime_dir = tmp_path / "runtime"
+    image = np.full((20, 40, 3), 255, np.uint8)
+    cv2.putText(image, "hi", (2, 15), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1)
+
+    mocker.patch("screenshot_to_text.app.user_runtime_dir", return_value=str(runtime_dir))
+    grab = mocker.patch("screenshot_to_text.app.grab_screen", return_value=image)
+    take = mocker.patch("screenshot_to_text.app.take_screenshot")
+    imread = mocker.patch("screenshot_to_text.app.cv2.imread")
+    mocker.patch("screenshot_to_text.app.runtime_validate")
+    mocker.patch("screenshot_to_text.app.run_command", return_value=TSV)
+    copy = mocker.patch("screenshot_to_text.app.copy_text_to_clipboard")
+
+    config = make_config(tmp_path, keep=False)
+    config.screenshot.backend = "x11"
+    config.screenshot.region = (0, 0, 100, 100)
+    capture_screenshot_and_process(config, region=(5, 5, 40, 20))
+
+    grab.assert_called_once_with((5, 5, 40, 20))
+    take.assert_not_called()
+    imread.assert_not_called()
+    copy.assert_called_once_with(config.clipboard, "hello")
+    assert list(runtime_dir.iterdir()) == []
+
+
+def test_capture_in_memory_kept(mocker, tmp_path):
+    def fake_take_screenshot(screenshot_config, screenshot_dir):
+        filename = screenshot_dir / "screenshot.png"
+        write_screenshot(filename)
+        return filename
+
+    mocker.patch("screenshot_to_text.app.take_screenshot", side_effect=fake_take_screenshot)
+    mocker.patch("screenshot_to_text.app.runtime_validate")
+    mocker.patch("screenshot_to_text.app.run_command", return_value=TSV)
+    copy = mocker.patch("screenshot_to_text.app.copy_text_to_clipboard")
+
+    config = make_config(tmp_path, keep=True)
+    capture_screenshot_and_process(config)
+
+    copy.assert_called_once_with(config.clipboard, "hello")
+    assert sorted(p.name for p in (tmp_path / "kept").iterdir()) == [INDEX_FILENAME, "screenshot.png", "screenshot_processed.png"]
+
+
+def test_capture_kept_applies_retention(mocker, tmp_path):
+    count = iter(range(10))
+
+    def fake_take_screenshot(screenshot_config, screenshot_dir):
+        filename = screenshot_dir / f"screenshot{next(count)}.png"
+        write_screenshot(filename)
+        return filename
+
+    mocker.patch("screenshot_to_text.app.take_screenshot", side_effect=fake_take_screenshot)
+    mocker.patch("screenshot_to_text.app.runtime_validate")
+    mocker.patch("screenshot_to_text.app.run_command", return_value=TSV)
+    mocker.patch("screenshot_to_text.app.copy_text_to_clipboard")
+
+    config = make_config(tmp_path, keep=True)
+    config.screenshot.keep_max_count = 2
+    for _ in range(4):
+        capture_screenshot_and_process(config)
+
+    assert sorted(p.name for p in (tmp_path / "kept").glob("screenshot?.png")) == ["screenshot2.png", "screenshot3.png"]
+
+
+def test_capture_kept_in_archive_mode(mocker, tmp_path):
+    count = iter(range(10))
+
+    def fake_take_screenshot(screenshot_config, screenshot_dir):
+        filename = screenshot_dir / f"screenshot{next(count)}.png"
+        write_screenshot(filename)
+        return filename
+
+    mocker.patch("screenshot_to_text.app.take_screenshot", side_effect=fake_take_screenshot)
+    mocker.patch("screenshot_to_text.app.runtime_validate")
+    mocker.patch("screenshot_to_text.app.run_command", return_value=TSV)
+    mocker.patch("screenshot_to_text.app.copy_text_to_clipboard")
+    packers = []
+    mocker.patch("screenshot_to_text.app.pack_in_background", side_effect=lambda *args: packers.append(pack_in_background(*args)))
+
+    config = make_config(tmp_path, keep=True)
+    config.screenshot.archive = True
+    config.screenshot.archive_loose_count = 1
+    for _ in range(3):
+        capture_screenshot_and_process(config)
+        packers[-1].join()
+
+    kept = tmp_path / "kept"
+    assert sorted(p.name for p in kept.glob("screenshot*")) == ["screenshot2.json", "screenshot2.png"]
+    with CaptureIndex(kept) as index:
+        assert index.totals()[0] == 3
+        assert index.files("screenshot0") == ["screenshot0.png", "screenshot0.json"]
+        assert json.loads(index.read("screenshot0", "screenshot0.json"))["text"] == "hello"
+        assert cv2.imdecode(np.frombuffer(index.read("screenshot1", "screenshot1.png"), np.uint8), cv2.IMREAD_COLOR).shape == (20, 40, 3)
+
+
+def test_with_psm():
+    assert with_psm(OCR_CMD, 7) == ["tesseract", "--psm", "7", "{filename}", "{filename_pdf}", "pdf"]
+    assert with_psm(["tesseract", "{filename}"], 7) == ["tesseract", "--psm", "7", "{filename}"]
+    assert with_psm(OCR_CMD, None) == OCR_CMD
+
+
+def test_run_command_timeout():
+    with pytest.raises(CommandTimeoutError):
+        run_command([sys.executable, "-c", "import time; time.sleep(5)"], timeout=0.2)
+
+
+@pytest.mark.parametrize("copied_meanwhile, expected", [(None, "full"), ("something else", "something else")])
+def test_draft_pass_replaced_only_if_clipboard_unchanged(mocker, tmp_path, copied_meanwhile, expected):
+    filename = tmp_path / "screenshot.png"
+    write_screenshot(filename)
+
+    config = make_config(tmp_path, keep=False)
+    config.ocr.draft.enabled = True
+    config.ocr.cache.enabled = False
+    config.clipboard.paste_cmd = ["xclip", "-o"]
+
+    clipboard = {}
+
+    def fake_ocr(ocr_config, source, timeout=None):
+        if timeout is not None:
+            # The draft pass
+            return [Word("draft", 0, 0, 50, 20, 95)]
+        if copied_meanwhile:
+            clipboard["text"] = copied_meanwhile
+        return [Word("full", 0, 0, 50, 20, 95)]
+
+    mocker.patch("screenshot_to_text.app.run_ocr_words", side_effect=fake_ocr)
+    mocker.patch("screenshot_to_text.app.runtime_validate")
+    mocker.patch("screenshot_to_text.app.run_command", side_effect=lambda cmd, **kwargs: clipboard["text"])
+    mocker.patch("screenshot_to_text.app.copy_text_to_clipboard", side_effect=lambda clipboard_config, text: clipboard.update(text=text))
+
+    assert extract_text_to_clipboard(config, filename) == "full"
+    assert clipboard["text"] == expected
+
+
+def test_full_pass_finishes_in_a_detached_process(mocker, tmp_path):
+    clipboard = tmp_path / "clipboard"
+    runtime_dir = tmp_path / "runtime"
+    config = make_config(tmp_path, keep=False)
+    config.ocr.draft.enabled = True
+    config.ocr.cache.enabled = False
+    config.clipboard.paste_cmd = ["xclip", "-o"]
+
+    def fake_take_screenshot(screenshot_config, screenshot_dir):
+        filename = screenshot_dir / "screenshot.png"
+        write_screenshot(filename)
+        return filename
+
+    def fake_ocr(ocr_config, source, timeout=None):
+        if timeout is not None:
+            return [Word("draft", 0, 0, 50, 20, 95)]
+        time.sleep(1)
+        return [Word("full", 0, 0, 50, 20, 95)]
+
+    mocker.patch("screenshot_to_text.app.user_runtime_dir", return_value=str(runtime_dir))
+    mocker.patch("screenshot_to_text.app.take_screenshot", side_effect=fake_take_screenshot)
+    mocker.patch("screenshot_to_text.app.run_ocr_words", side_effect=fake_ocr)
+    mocker.patch("screenshot_to_text.app.runtime_validate")
+    mocker.patch("screenshot_to_text.app.run_command", side_effect=lambda cmd, **kwargs: clipboard.read_text())
+    mocker.patch("screenshot_to_text.app.copy_text_to_clipboard", side_effect=lambda clipboard_config, text: clipboard.write_text(text))
+
+    start = time.perf_counter()
+    capture_screenshot_and_process(config, detach_full_pass=True)
+
+    # Back with the draft, the full pass still runs
+    assert time.perf_counter() - start < 1
+    assert clipboard.read_text() == "draft"
+    assert (runtime_dir / "screenshot.png").exists()
+
+    deadline = time.monotonic() + 10
+    while (clipboard.read_text() != "full" or (runtime_dir / "screenshot.png").exists()) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert clipboard.read_text() == "full"
+    assert not (runtime_dir / "screenshot.png").exists()
@@ -0,0 +1,124 @@
+import cv2
+import numpy as np
+import pytest
+
+from screenshot_to_text.app import preprocess_image
+from screenshot_to_text.models.s2tconfig import PreprocessConfig
+from screenshot_to_text.layout import Word
+from screenshot_to_text.planner import FIXED_PLAN, estimate_glyph_height, find_text_region, is_bilevel, plan_preprocessing
+
+NO_CROP_STAGES = ["resize", "threshold", "dilate"]
+
+
+def render_text(font_scale: float, size=(200, 800), antialiased: bool = True) -> np.ndarray:
+    image = np.full((*size, 3), 255, np.uint8)
+    for row in range(3):
+        y = int((row + 1) * 40 * font_scale)
+        if y < size[0]:
+            cv2.putText(image, "The quick brown fox 0123", (10, y), cv2.FONT_HERSHEY_SIMPLEX, font_scale, (0, 0, 0), 1, cv2.LINE_AA)
+    if not antialiased:
+        image = np.where(image < 128, 0, 255).astype(np.uint8)
+    return image
+
+
+def test_estimate_glyph_height_follows_font_size():
+    small = estimate_glyph_height(cv2.cvtColor(render_text(0.4), cv2.COLOR_BGR2GRAY))
+    large = estimate_glyph_height(cv2.cvtColor(render_text(1.2), cv2.COLOR_BGR2GRAY))
+
+    assert small is not None and large is not None
+    assert 2 < large / small < 4
+
+
+def test_estimate_glyph_height_blank_image():
+    assert estimate_glyph_height(np.full((50, 50), 255, np.uint8)) is None
+
+
+def test_is_bilevel():
+    assert is_bilevel(cv2.cvtColor(render_text(0.5, antialiased=False), cv2.COLOR_BGR2GRAY))
+    assert not is_bilevel(cv2.cvtColor(render_text(0.5), cv2.COLOR_BGR2GRAY))
+
+
+def test_plan_targets_glyph_height():
+    config = PreprocessConfig(target_glyph_height=32, max_scale=8)
+
+    small_plan = plan_preprocessing(render_text(0.4), config)
+    large_plan = plan_preprocessing(render_text(2.0, size=(300, 1600)), config)
+
+    assert small_plan.scale > large_plan.scale
+    assert small_plan.glyph_height * small_plan.scale == pytest.approx(32, rel=0.1)
+    assert small_plan.interpolation == "cubic"
+    assert small_plan.threshold
+
+
+def test_plan_bilevel_skips_threshold():
+    plan = plan_preprocessing(render_text(0.4, antialiased=False), PreprocessConfig())
+
+    assert plan.bilevel
+    assert not plan.threshold
+    assert plan.interpolation == "nearest"
+
+
+def test_plan_respects_max_pixels():
+    image = render_text(0.4, size=(1000, 1000))
+
+    # Without the crop, which would shrink this mostly empty image well below the limit
+    plan = plan_preprocessing(image, PreprocessConfig(max_pixels=4_000_000, stages=NO_CROP_STAGES))
+
+    assert plan.scale <= 2
+
+
+def test_plan_without_text_uses_default_scale():
+    plan = plan_preprocessing(np.full((100, 100, 3), 255, np.uint8), PreprocessConfig(scale=2.5, stages=NO_CROP_STAGES))
+
+    assert plan.glyph_height is None
+    assert plan.scale == 2.5
+
+
+def test_plan_not_adaptive():
+    plan = plan_preprocessing(render_text(0.4), PreprocessConfig(adaptive=False))
+
+    assert plan == FIXED_PLAN
+
+
+def test_preprocess_image_follows_plan():
+    image = render_text(0.5)
+
+    assert preprocess_image(image).shape == (600, 2400)
+    assert preprocess_image(image, plan_preprocessing(image, PreprocessConfig(adaptive=False, scale=2))).shape == (400, 1600)
+
+
+def test_find_text_region_ignores_margins_and_borders():
+    image = np.full((400, 600), 240, np.uint8)
+    cv2.rectangle(image, (0, 0), (599, 399), 120, 1)
+    cv2.line(image, (0, 50), (599, 50), 120, 1)
+    cv2.putText(image, "hello", (200, 220), cv2.FONT_HERSHEY_SIMPLEX, 0.8, 20, 2)
+
+    left, top, width, height = find_text_region(image, padding=4)
+
+    assert 190 <= left <= 200 and 190 <= top <= 205
+    assert width < 120 and height < 40
+
+
+def test_find_text_region_blank_image():
+    assert find_text_region(np.full((100, 100), 255, np.uint8), padding=8) is None
+    assert find_text_region(np.random.default_rng(0).integers(250, 256, (100, 100), dtype=np.uint8), padding=8) is None
+
+
+def test_plan_crops_to_text_and_maps_words_back():
+    image = np.full((600, 900, 3), 255, np.uint8)
+    image[300:, :, :] = render_text(0.5, size=(300, 900))
+
+    plan = plan_preprocessing(image, PreprocessConfig())
+    left, top, width, height = plan.crop
+
+    assert top >= 290 and height < 150
+    assert preprocess_image(image, plan).shape == (round(height * plan.scale), round(width * plan.scale))
+
+    word = Word("The", round(4 * plan.scale), round(2 * plan.scale), round(30 * plan.scale), round(10 * plan.scale))
+    assert plan.to_original([word]) == [Word("The", left + 4, top + 2, 30, 10)]
+
+
+def test_plan_blank_image_has_no_text():
+    plan = plan_preprocessing(np.full((100, 100, 3), 255, np.uint8), PreprocessConfig())
+
+    assert not plan.has_text
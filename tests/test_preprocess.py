@@ -0,0 +1,164 @@
+import dataclasses
+import tracemalloc
+
+import cv2
+import numpy as np
+import pytest
+
+from screenshot_to_text.models.s2tconfig import PreprocessConfig
+from screenshot_to_text.planner import FIXED_PLAN, PreprocessPlan, plan_preprocessing, preprocess_bytes
+from screenshot_to_text.preprocess import BufferPool, PreprocessEngine, otsu_threshold
+
+
+def render_text() -> np.ndarray:
+    image = np.full((60, 200, 3), 230, np.uint8)
+    cv2.putText(image, "foo_bar()", (5, 40), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (30, 30, 30), 2)
+    return image
+
+
+def reference_preprocess(image: np.ndarray) -> np.ndarray:
+    grayscale = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    # The Otsu threshold of the source, applied to the upscaled image
+    otsu, _ = cv2.threshold(grayscale, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    processed = cv2.resize(grayscale, None, fx=3, fy=3, interpolation=cv2.INTER_CUBIC)
+    _, processed = cv2.threshold(processed, otsu, 255, cv2.THRESH_BINARY)
+    return cv2.dilate(processed, np.ones((2, 2), np.uint8), iterations=1)
+
+
+def render_page(height: int = 400, width: int = 600) -> np.ndarray:
+    image = np.full((height, width, 3), 230, np.uint8)
+    for y in range(20, height, 30):
+        cv2.putText(image, "foo_bar() and more text", (5, y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (30, 30, 30), 1)
+    return image
+
+
+def test_engine_matches_step_by_step_preprocessing():
+    image = render_text()
+
+    assert np.array_equal(PreprocessEngine().run(image, FIXED_PLAN), reference_preprocess(image))
+
+
+def test_engine_reuses_buffers_and_dst():
+    engine = PreprocessEngine(BufferPool())
+    image = render_text()
+    dst = np.empty((180, 600), np.uint8)
+
+    first = engine.run(image, FIXED_PLAN, dst)
+    pooled = {id(buffer) for buffers in engine.pool._free.values() for buffer in buffers}
+    second = engine.run(image, FIXED_PLAN, dst)
+
+    assert first is dst and second is dst
+    assert {id(buffer) for buffers in engine.pool._free.values() for buffer in buffers} == pooled
+    assert np.array_equal(second, reference_preprocess(image))
+
+
+def test_engine_does_not_modify_input():
+    image = cv2.cvtColor(render_text(), cv2.COLOR_BGR2GRAY)
+    original = image.copy()
+
+    result = PreprocessEngine().run(image, PreprocessPlan(scale=1, interpolation="cubic", threshold=True, dilate=False))
+
+    assert result is not image
+    assert np.array_equal(image, original)
+    assert set(np.unique(result)) <= {0, 255}
+
+
+@pytest.mark.parametrize("strip_rows", [1, 2, 7, 64, 1000])
+def test_strips_match_full_frame(strip_rows):
+    image = np.random.default_rng(0).integers(0, 256, (397, 131, 3), np.uint8)
+
+    strips = PreprocessEngine().run(image, dataclasses.replace(FIXED_PLAN, strip_rows=strip_rows))
+
+    assert np.array_equal(strips, reference_preprocess(image))
+
+
+@pytest.mark.parametrize("scale, interpolation", [(2.5, "cubic"), (1.5625, "cubic"), (2.375, "nearest"), (0.5, "area"), (0.375, "area")])
+@pytest.mark.parametrize("strip_rows", [1, 300, None])
+def test_strips_match_full_frame_at_fractional_scales(scale, interpolation, strip_rows):
+    image = cv2.GaussianBlur(np.random.default_rng(0).integers(0, 256, (517, 203, 3), np.uint8), (5, 5), 0)
+    plan = PreprocessPlan(scale=scale, interpolation=interpolation, threshold=True, dilate=True, denoise=True)
+
+    strips = PreprocessEngine().run(image, dataclasses.replace(plan, strip_rows=strip_rows))
+
+    assert np.array_equal(strips, PreprocessEngine().run(image, plan))
+
+
+def test_otsu_threshold_matches_opencv():
+    rng = np.random.default_rng(0)
+    for image in (rng.integers(0, 256, (40, 50), np.uint8), render_text()[..., 0], np.full((5, 5), 7, np.uint8)):
+        expected, _ = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+
+        assert otsu_threshold(image) == expected
+
+
+def test_memory_ceiling():
+    image = render_page()
+    stages = ["resize", "threshold", "dilate"]
+    config = PreprocessConfig(stages=stages)
+
+    unbounded = plan_preprocessing(image, config)
+    expected = PreprocessEngine().run(image, unbounded)
+    output_bytes = expected.size
+    least = preprocess_bytes(*image.shape[:2], True, False, unbounded.scale, True, 0)
+    for max_bytes in (least + output_bytes // 2, least):
+        plan = plan_preprocessing(image, config.model_copy(update={"max_bytes": max_bytes}))
+
+        tracemalloc.start()
+        result = PreprocessEngine().run(image, plan)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        # The strips keep the ceiling without touching the scale, so the OCR input is the same
+        assert plan.strip_rows is not None and plan.scale == unbounded.scale
+        assert np.array_equal(result, expected)
+        # The copy encoded for tesseract comes on top, Python object overheads are not budgeted
+        assert peak + output_bytes < max_bytes * 1.01
+
+    assert unbounded.strip_rows is None
+
+
+def test_memory_ceiling_keeps_a_fixed_scale():
+    image = render_page()
+    config = PreprocessConfig(stages=["resize", "threshold", "dilate"], adaptive=False)
+    max_bytes = preprocess_bytes(*image.shape[:2], True, False, 3, True, 0)
+
+    plan = plan_preprocessing(image, config.model_copy(update={"max_bytes": max_bytes}))
+
+    assert plan.scale == 3 and plan.strip_rows is not None
+    assert np.array_equal(PreprocessEngine().run(image, plan), PreprocessEngine().run(image, plan_preprocessing(image, config)))
+
+
+def test_memory_ceiling_lowers_a_fixed_scale():
+    image = np.full((400, 600, 3), 230, np.uint8)
+    stages = ["resize", "threshold", "dilate"]
+    # The output at the fixed 3x scale and its encoded copy alone are over the ceiling
+    max_bytes = 400 * 600 * 4
+
+    plan = plan_preprocessing(image, PreprocessConfig(stages=stages, adaptive=False, max_bytes=max_bytes))
+
+    tracemalloc.start()
+    result = PreprocessEngine().run(image, plan)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert plan.scale < 3 and plan.strip_rows is not None
+    assert peak + result.size < max_bytes * 1.01
+
+
+def test_buffer_pool_evicts_least_recently_used_shapes():
+    pool = BufferPool(max_shapes=2)
+
+    for size in (1, 2, 3):
+        with pool.borrow((size, size)):
+            pass
+
+    assert [key[0] for key in pool._free] == [(2, 2), (3, 3)]
+
+
+def test_configured_stages_shape_the_plan():
+    image = render_text()
+
+    plan = plan_preprocessing(image, PreprocessConfig(stages=["denoise", "threshold"]))
+
+    assert (plan.scale, plan.threshold, plan.dilate, plan.denoise) == (1.0, True, False, True)
+    assert PreprocessEngine().run(image, plan).shape == image.shape[:2]
@@ -0,0 +1,71 @@
+import io
+
+import numpy as np
+
+from screenshot_to_text.layout import Word
+from screenshot_to_text.models.s2tconfig import RecordConfig
+from screenshot_to_text.planner import to_grayscale
+from screenshot_to_text.record import Recorder, line_bands, text_diff
+
+
+def frame(*levels: int) -> np.ndarray:
+    """A white frame with one "line of text" per gray level, 10 rows high and 10 apart."""
+    image = np.full((120, 200, 3), 255, np.uint8)
+    for index, level in enumerate(levels):
+        image[10 + 20 * index : 20 + 20 * index, 10:150] = level
+    return image
+
+
+class FakeOCR:
+    """Reads every line as `w<gray level>`, remembering the images it was asked to recognize."""
+
+    def __init__(self):
+        self.images = []
+
+    def __call__(self, image: np.ndarray) -> list[Word]:
+        self.images.append(image)
+        return [
+            Word(text=f"w{int(image[band.top : band.bottom].min())}", left=10, top=band.top, width=140, height=band.height)
+            for band in line_bands(to_grayscale(image), min_gap=1, padding=0)
+        ]
+
+
+def record(*frames: np.ndarray) -> tuple[str, FakeOCR]:
+    ocr = FakeOCR()
+    output = io.StringIO()
+    recorder = Recorder(iter(frames).__next__, ocr, output, RecordConfig())
+
+    for _ in frames:
+        recorder.step()
+    return output.getvalue(), ocr
+
+
+def test_unchanged_frames_are_not_recognized():
+    output, ocr = record(frame(0, 40), frame(0, 40), frame(0, 40))
+
+    assert output == "+w0\n+w40\n"
+    assert len(ocr.images) == 1
+
+
+def test_only_new_lines_are_recognized():
+    output, ocr = record(frame(0, 40), frame(0, 40, 80))
+
+    assert output == "+w0\n+w40\n+w80\n"
+    assert len(ocr.images) == 2
+    # The second pass only sees the appended line
+    assert ocr.images[1].shape[0] < 20
+
+
+def test_small_changes_are_ignored():
+    changed = frame(0, 40)
+    changed[100, 100:103] = 0
+
+    output, ocr = record(frame(0, 40), changed)
+
+    assert len(ocr.images) == 1
+
+
+def test_text_diff():
+    assert text_diff(["a", "b", "c"], ["a", "c", "d"]) == ["-b", "+d"]
+    assert text_diff(["a"], ["b"]) == ["-a", "+b"]
+    assert text_diff([], []) == []
@@ -0,0 +1,91 @@
+import sqlite3
+import time
+
+import pytest
+
+from screenshot_to_text.retention import INDEX_FILENAME, SECONDS_PER_DAY, CaptureIndex, RetentionPolicy, capture_stem
+
+
+def write_capture(directory, stem, size=10):
+    files = [directory / f"{stem}.png", directory / f"{stem}_processed.png", directory / f"{stem}_processed.pdf"]
+    for file in files:
+        file.write_bytes(b"x" * size)
+    return files
+
+
+def test_capture_stem_groups_derived_files(tmp_path):
+    assert capture_stem(tmp_path / "shot.png") == "shot"
+    assert capture_stem(tmp_path / "shot_processed.png") == "shot"
+    assert capture_stem(tmp_path / "shot_processed.pdf") == "shot"
+
+
+def test_enforce_max_count_deletes_oldest(tmp_path):
+    with CaptureIndex(tmp_path) as index:
+        for i in range(5):
+            index.record(f"shot{i}", write_capture(tmp_path, f"shot{i}"), created=1000 + i)
+
+        assert index.enforce(RetentionPolicy(max_count=2)) == 3
+        assert index.totals() == (2, 60)
+
+    assert sorted(p.name for p in tmp_path.glob("*.png") if "processed" not in p.name) == ["shot3.png", "shot4.png"]
+    assert not (tmp_path / "shot0_processed.pdf").exists()
+
+
+def test_failed_delete_keeps_the_files(mocker, tmp_path):
+    with CaptureIndex(tmp_path) as index:
+        for i in range(2):
+            index.record(f"shot{i}", write_capture(tmp_path, f"shot{i}"), created=1000 + i)
+        mocker.patch("screenshot_to_text.retention.mark_deleted", side_effect=sqlite3.OperationalError("database is locked"))
+
+        with pytest.raises(sqlite3.OperationalError):
+            index.enforce(RetentionPolicy(max_count=1))
+
+        # The index still lists shot0, so its files stay
+        assert index.totals() == (2, 60)
+        assert (tmp_path / "shot0.png").exists()
+
+
+def test_enforce_max_bytes_and_age(tmp_path):
+    now = time.time()
+
+    with CaptureIndex(tmp_path) as index:
+        index.record("old", write_capture(tmp_path, "old"), created=now - 3 * SECONDS_PER_DAY)
+        for i in range(3):
+            index.record(f"shot{i}", write_capture(tmp_path, f"shot{i}", size=100), created=now - 10 + i)
+
+        assert index.enforce(RetentionPolicy(max_age_days=1), now=now) == 1
+        assert index.enforce(RetentionPolicy(max_bytes=650), now=now) == 1
+        assert index.totals() == (2, 600)
+
+    assert not (tmp_path / "old.png").exists()
+    assert not (tmp_path / "shot0.png").exists()
+    assert (tmp_path / "shot1.png").exists()
+
+
+def test_new_index_is_built_from_existing_files(tmp_path):
+    for i in range(3):
+        write_capture(tmp_path, f"shot{i}")
+    (tmp_path / "notes.txt").write_text("not a capture")
+
+    with CaptureIndex(tmp_path) as index:
+        assert index.totals() == (3, 90)
+
+    # Files deleted behind the index's back are dropped by a rebuild
+    (tmp_path / "shot0.png").unlink()
+    (tmp_path / "shot0_processed.png").unlink()
+    (tmp_path / "shot0_processed.pdf").unlink()
+
+    with CaptureIndex(tmp_path) as index:
+        assert index.totals() == (3, 90)
+        assert index.rebuild() == 2
+        assert index.totals() == (2, 60)
+
+    assert (tmp_path / INDEX_FILENAME).exists()
+
+
+def test_record_replaces_existing_entry(tmp_path):
+    with CaptureIndex(tmp_path) as index:
+        index.record("shot", write_capture(tmp_path, "shot"))
+        index.record("shot", write_capture(tmp_path, "shot", size=20))
+
+        assert index.totals() == (1, 60)
@@ -0,0 +1,101 @@
+import sys
+import time
+
+import numpy as np
+import pytest
+
+from screenshot_to_text.app import recognize_words, run_command
+from screenshot_to_text.models.s2tconfig import OCRConfig
+from screenshot_to_text.scheduler import OCRSchedule, cgroup_cpu_quota, ocr_env, ocr_threads, schedule_ocr, thread_candidates, tune_threads
+
+TSV_HEADER = "level\tpage_num\tblock_num\tpar_num\tline_num\tword_num\tleft\ttop\twidth\theight\tconf\ttext\n"
+
+
+def ocr_config(**kwargs) -> OCRConfig:
+    return OCRConfig(tool="tesseract", enabled=True, cmd=["tesseract"], executable="tesseract", **kwargs)
+
+
+@pytest.fixture
+def cpus(mocker):
+    return mocker.patch("screenshot_to_text.scheduler.available_cpus", return_value=8)
+
+
+def test_cgroup_v2_quota_is_the_lowest_along_the_hierarchy(tmp_path):
+    (tmp_path / "proc").write_text("0::/user.slice/app\n")
+    (tmp_path / "user.slice" / "app").mkdir(parents=True)
+    (tmp_path / "user.slice" / "app" / "cpu.max").write_text("max 100000\n")
+    (tmp_path / "user.slice" / "cpu.max").write_text("150000 100000\n")
+    (tmp_path / "cpu.max").write_text("400000 100000\n")
+
+    assert cgroup_cpu_quota(tmp_path, tmp_path / "proc") == 1.5
+
+
+def test_cgroup_v1_quota(tmp_path):
+    (tmp_path / "proc").write_text("5:memory:/\n4:cpu,cpuacct:/\n")
+    (tmp_path / "cpu,cpuacct").mkdir()
+    (tmp_path / "cpu,cpuacct" / "cpu.cfs_quota_us").write_text("200000\n")
+    (tmp_path / "cpu,cpuacct" / "cpu.cfs_period_us").write_text("100000\n")
+
+    assert cgroup_cpu_quota(tmp_path, tmp_path / "proc") == 2.0
+
+
+def test_no_cgroup_quota(tmp_path):
+    (tmp_path / "proc").write_text("0::/\n")
+    (tmp_path / "cpu.max").write_text("max 100000\n")
+
+    assert cgroup_cpu_quota(tmp_path, tmp_path / "proc") is None
+    assert cgroup_cpu_quota(tmp_path, tmp_path / "missing") is None
+
+
+def test_schedule_splits_cpus_between_processes_and_threads(cpus):
+    config = ocr_config(min_pixels_per_thread=1_000_000)
+
+    assert schedule_ocr(config) == OCRSchedule(workers=8, threads=1)
+    assert schedule_ocr(config, jobs=1, pixels=20_000_000) == OCRSchedule(workers=1, threads=8)
+    assert schedule_ocr(config, jobs=1, pixels=3_000_000) == OCRSchedule(workers=1, threads=3)
+    assert schedule_ocr(config, jobs=1, pixels=100_000) == OCRSchedule(workers=1, threads=1)
+    assert schedule_ocr(config, jobs=2, pixels=20_000_000) == OCRSchedule(workers=2, threads=4)
+    assert schedule_ocr(config, workers=3) == OCRSchedule(workers=3, threads=2)
+
+
+def test_schedule_follows_the_tuned_threads(cpus):
+    config = ocr_config(threads=4)
+
+    assert schedule_ocr(config) == OCRSchedule(workers=2, threads=4)
+    assert schedule_ocr(config, jobs=1, pixels=100) == OCRSchedule(workers=1, threads=4)
+    # Explicit workers keep their number, with fewer threads each so they do not oversubscribe the CPUs
+    assert schedule_ocr(config, workers=4) == OCRSchedule(workers=4, threads=2)
+    assert schedule_ocr(config, workers=16) == OCRSchedule(workers=16, threads=1)
+    assert schedule_ocr(config, workers=2) == OCRSchedule(workers=2, threads=4)
+
+
+def test_thread_limit_reaches_tesseract(mocker, cpus):
+    run = mocker.patch("screenshot_to_text.app.run_command", return_value=TSV_HEADER)
+    mocker.patch("screenshot_to_text.app.runtime_validate")
+
+    recognize_words(ocr_config(band_split_min_pixels=-1), np.zeros((2000, 2000), np.uint8))
+
+    assert run.call_args.kwargs["env"] == {"OMP_THREAD_LIMIT": "4"}
+    assert ocr_env() is None
+
+
+def test_run_command_env():
+    with ocr_threads(3):
+        output = run_command([sys.executable, "-c", "import os; print(os.environ['OMP_THREAD_LIMIT'], os.environ['PATH'] != '')"], env=ocr_env())
+
+    assert output == "3 True\n"
+
+
+def test_tune_threads(cpus):
+    cpus.return_value = 4
+
+    def recognize(image):
+        # A tesseract that only gets slower with more threads
+        env = ocr_env() or {"OMP_THREAD_LIMIT": "1"}
+        time.sleep(0.01 * int(env["OMP_THREAD_LIMIT"]))
+
+    results = tune_threads(recognize, [np.zeros((10, 10), np.uint8)], rounds=1)
+
+    assert thread_candidates(6) == [1, 2, 4, 6]
+    assert sorted(schedule.threads for schedule, _ in results) == [1, 2, 4]
+    assert results[0][0] == OCRSchedule(workers=4, threads=1)
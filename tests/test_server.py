@@ -0,0 +1,151 @@
+import asyncio
+import json
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+from screenshot_to_text.models.s2tconfig import ClipboardConfig, OCRCacheConfig, OCRConfig, S2TConfig, ScreenshotConfig, ServeConfig
+from screenshot_to_text.server import OCRServer
+
+# Sleeps for the `delay` formatted into the script, then reads every image as "hello"
+FAKE_TESSERACT = """#!{python}
+import sys, time
+
+sys.stdin.buffer.read()
+time.sleep({delay})
+print("level\\tpage_num\\tblock_num\\tpar_num\\tline_num\\tword_num\\tleft\\ttop\\twidth\\theight\\tconf\\ttext")
+print("5\\t1\\t1\\t1\\t1\\t1\\t0\\t0\\t50\\t20\\t95\\thello")
+"""
+
+
+def png_bytes() -> bytes:
+    image = np.full((20, 40, 3), 255, np.uint8)
+    cv2.putText(image, "hi", (2, 15), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1)
+    return cv2.imencode(".png", image)[1].tobytes()
+
+
+@pytest.fixture
+def make_config(tmp_path):
+    def make_config(delay: float = 0.0) -> S2TConfig:
+        script = tmp_path / "fake-tesseract"
+        script.write_text(FAKE_TESSERACT.format(python=sys.executable, delay=delay))
+        script.chmod(0o755)
+        return S2TConfig(
+            screenshot=ScreenshotConfig(tool="fake", cmd=["fake"], keep=False, keep_max_count=-1, path=tmp_path),
+            ocr=OCRConfig(
+                tool=str(script),
+                enabled=True,
+                cmd=[str(script), "{filename}", "{filename_pdf}", "pdf"],
+                executable=str(script),
+                cache=OCRCacheConfig(enabled=False),
+            ),
+            clipboard=ClipboardConfig(tool="fake", cmd=["fake"]),
+        )
+
+    return make_config
+
+
+async def request(port: int, method: str, target: str, body: bytes = b"", content_type: str = "image/png") -> tuple[int, dict]:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"{method} {target} HTTP/1.1\r\nHost: localhost\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+
+    head, _, content = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(content)
+
+
+def serve(config: S2TConfig, serve_config: ServeConfig, client):
+    async def main():
+        server = OCRServer(config, serve_config)
+        http_server = await server.start(port=0)
+        try:
+            return await client(http_server.sockets[0].getsockname()[1])
+        finally:
+            http_server.close()
+            server.close()
+
+    return asyncio.run(main())
+
+
+def test_ocr_bytes_and_paths(make_config, tmp_path):
+    image_path = tmp_path / "image.png"
+    image_path.write_bytes(png_bytes())
+
+    async def client(port):
+        return [
+            await request(port, "POST", "/ocr", png_bytes()),
+            await request(port, "POST", "/ocr?words=1", json.dumps({"path": str(image_path)}).encode(), "application/json"),
+            await request(port, "POST", "/ocr", b"not an image"),
+            await request(port, "GET", "/nope"),
+            await request(port, "GET", "/metrics"),
+        ]
+
+    image, path, invalid, missing, (_, metrics) = serve(make_config(), ServeConfig(workers=1, allow_paths=True), client)
+
+    assert image[0] == 200 and image[1]["text"] == "hello" and "path" not in image[1]
+    assert set(image[1]["timings"]) == {"load", "plan", "preprocess", "ocr", "total"}
+    assert path[0] == 200 and path[1]["path"] == str(image_path) and path[1]["words"][0]["text"] == "hello"
+    assert invalid[0] == 422 and "ScreenshotReadError" in invalid[1]["error"]
+    assert missing[0] == 404
+    assert metrics["requests"] == {"ok": 2, "failed": 1, "rejected": 0, "timed_out": 0}
+    assert metrics["latency"]["ocr"]["n"] == 2 and {"p50", "p95", "p99"} <= set(metrics["latency"]["request"])
+
+
+def test_full_queue_is_rejected(make_config):
+    async def client(port):
+        return await asyncio.gather(*(request(port, "POST", "/ocr", png_bytes()) for _ in range(3)))
+
+    statuses = sorted(status for status, _ in serve(make_config(delay=0.5), ServeConfig(workers=1, queue_size=1), client))
+
+    assert statuses == [200, 200, 429]
+
+
+def test_request_timeout(make_config):
+    async def client(port):
+        return await request(port, "POST", "/ocr", png_bytes()), await request(port, "GET", "/metrics")
+
+    (status, _), (_, metrics) = serve(make_config(delay=1.0), ServeConfig(workers=1, timeout=0.2), client)
+
+    assert status == 504
+    assert metrics["requests"]["timed_out"] == 1 and metrics["in_flight"] == 1
+
+
+def test_path_requests_are_disabled_by_default(make_config, tmp_path):
+    image_path = tmp_path / "image.png"
+    image_path.write_bytes(png_bytes())
+
+    async def client(port):
+        return await request(port, "POST", "/ocr", json.dumps({"path": str(image_path)}).encode(), "application/json")
+
+    status, response = serve(make_config(), ServeConfig(workers=1), client)
+
+    assert status == 403 and "path" not in response
+
+
+def test_dead_worker_is_replaced(make_config):
+    async def main():
+        server = OCRServer(make_config(delay=1.0), ServeConfig(workers=1))
+        http_server = await server.start(port=0)
+        port = http_server.sockets[0].getsockname()[1]
+        try:
+            crashed = asyncio.create_task(request(port, "POST", "/ocr", png_bytes()))
+            while not server.executor._processes:
+                await asyncio.sleep(0.05)
+            # Like the OOM killer, while the worker runs the request
+            for process in list(server.executor._processes.values()):
+                process.kill()
+
+            return await crashed, await request(port, "POST", "/ocr", png_bytes()), await request(port, "GET", "/metrics")
+        finally:
+            http_server.close()
+            server.close()
+
+    (crashed_status, crashed), (status, response), (_, metrics) = asyncio.run(main())
+
+    assert crashed_status == 500 and "died" in crashed["error"]
+    assert status == 200 and response["text"] == "hello"
+    assert metrics["in_flight"] == 0 and metrics["requests"]["failed"] == 1
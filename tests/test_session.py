@@ -0,0 +1,157 @@
+import asyncio
+import io
+import sys
+import time
+
+import cv2
+import numpy as np
+import pytest
+from typer.testing import CliRunner
+
+from screenshot_to_text.cli import app
+from screenshot_to_text.errors import CommandFailedError
+from screenshot_to_text.models.s2tconfig import ClipboardConfig, OCRCacheConfig, OCRConfig, S2TConfig, ScreenshotConfig
+from screenshot_to_text.session import run_session
+
+# Copies the next prepared region to the requested path, exits with `status` once they run out
+FAKE_SCREENSHOT = """#!{python}
+import shutil, sys, time
+from pathlib import Path
+
+directory = Path({directory!r})
+counter = directory / "counter"
+count = int(counter.read_text()) if counter.exists() else 0
+counter.write_text(str(count + 1))
+time.sleep({delay})
+region = directory / f"region{{count}}.png"
+if not region.exists():
+    sys.exit({status})
+shutil.copyfile(region, sys.argv[-1])
+"""
+
+# Answers with the image width as the only word, the widest (first) region takes the longest
+FAKE_TESSERACT = """#!{python}
+import sys, time
+
+image = sys.stdin.buffer.read()
+width = int(image.split()[1])
+time.sleep({delay} * width / 40)
+print("level\\tpage_num\\tblock_num\\tpar_num\\tline_num\\tword_num\\tleft\\ttop\\twidth\\theight\\tconf\\ttext")
+print(f"5\\t1\\t1\\t1\\t1\\t1\\t0\\t0\\t50\\t20\\t95\\tw{{width}}")
+"""
+
+
+def write_script(path, template, **kwargs):
+    path.write_text(template.format(python=sys.executable, **kwargs))
+    path.chmod(0o755)
+    return str(path)
+
+
+@pytest.fixture
+def make_config(tmp_path):
+    def make_config(regions: int, capture_delay: float = 0.0, ocr_delay: float = 0.0, status: int = 1) -> S2TConfig:
+        for index in range(regions):
+            # Planned scale 1 keeps the width, 40px wider per earlier region
+            cv2.imwrite(str(tmp_path / f"region{index}.png"), np.full((40, 40 * (regions - index), 3), 255, np.uint8))
+
+        screenshot = write_script(tmp_path / "fake-screenshot", FAKE_SCREENSHOT, directory=str(tmp_path), delay=capture_delay, status=status)
+        tesseract = write_script(tmp_path / "fake-tesseract", FAKE_TESSERACT, delay=ocr_delay)
+        clipboard = write_script(
+            tmp_path / "fake-clipboard", f"#!{sys.executable}\nimport sys\nopen({str(tmp_path / 'clipboard')!r}, 'w').write(sys.stdin.read())\n"
+        )
+
+        config = S2TConfig(
+            screenshot=ScreenshotConfig(tool="fake", cmd=[screenshot], executable=screenshot, keep=False, keep_max_count=-1, path=tmp_path / "kept"),
+            ocr=OCRConfig(
+                tool="fake", enabled=True, cmd=[tesseract, "{filename}", "{filename_pdf}", "pdf"], executable=tesseract, cache=OCRCacheConfig(enabled=False)
+            ),
+            clipboard=ClipboardConfig(tool="fake", cmd=[clipboard], executable=clipboard),
+        )
+        config.preprocess.adaptive = False
+        config.preprocess.scale = 1.0
+        return config
+
+    return make_config
+
+
+def test_session_joins_regions_in_capture_order(make_config):
+    output = io.StringIO()
+
+    text = asyncio.run(run_session(make_config(3, ocr_delay=0.1), repeat=3, output=output))
+
+    assert text == "w120\n\nw80\n\nw40"
+    assert output.getvalue() == "w120\n\nw80\n\nw40\n"
+
+
+def test_session_until_cancelled_copies_to_clipboard(make_config, tmp_path):
+    text = asyncio.run(run_session(make_config(2), repeat=0))
+
+    assert text == "w80\n\nw40"
+    assert (tmp_path / "clipboard").read_text() == text
+    assert (tmp_path / "counter").read_text() == "3"
+
+
+def test_session_raises_tool_failures(make_config, tmp_path):
+    with pytest.raises(CommandFailedError):
+        asyncio.run(run_session(make_config(1, status=2), repeat=0))
+
+    assert not (tmp_path / "clipboard").exists()
+
+
+def test_session_cancel_return_codes(make_config, tmp_path):
+    config = make_config(1, status=2)
+    config.screenshot.cancel_return_codes = [2]
+
+    assert asyncio.run(run_session(config, repeat=0)) == "w40"
+
+
+def test_session_overlaps_capture_and_ocr(make_config):
+    delay = 0.3
+    start = time.perf_counter()
+
+    asyncio.run(run_session(make_config(3, capture_delay=delay, ocr_delay=delay / 3), repeat=3, output=io.StringIO()))
+
+    # OCR takes 3, 2 and 1 delays, sequentially the session would take at least 9 delays
+    assert time.perf_counter() - start < 7 * delay
+
+
+def test_session_x11_backend(mocker, make_config):
+    grab = mocker.patch("screenshot_to_text.app.grab_screen", return_value=np.full((40, 40, 3), 255, np.uint8))
+    take = mocker.patch("screenshot_to_text.app.take_screenshot")
+    config = make_config(0)
+    config.screenshot.backend = "x11"
+
+    text = asyncio.run(run_session(config, repeat=2, output=io.StringIO(), region=(5, 5, 40, 40)))
+
+    assert text == "w40\n\nw40"
+    assert grab.call_count == 2
+    grab.assert_called_with((5, 5, 40, 40))
+    take.assert_not_called()
+
+
+def test_session_x11_backend_needs_a_count(make_config):
+    config = make_config(0)
+    config.screenshot.backend = "x11"
+
+    with pytest.raises(ValueError):
+        asyncio.run(run_session(config, repeat=0))
+
+
+def test_run_passes_region_and_profile_to_the_session(mocker, make_config):
+    mocker.patch("screenshot_to_text.cli.read_config", return_value=make_config(0))
+    session = mocker.patch("screenshot_to_text.session.run_session", return_value="")
+
+    result = CliRunner().invoke(app, ["run", "--repeat", "2", "--region", "40x30+5+6", "--profile"], catch_exceptions=False)
+
+    assert result.exit_code == 0
+    assert session.call_args.args[-1] == (5, 6, 40, 30)
+    assert "total" in result.output
+
+
+def test_run_rejects_via_daemon_with_repeat(mocker):
+    session = mocker.patch("screenshot_to_text.session.run_session")
+
+    result = CliRunner().invoke(app, ["run", "--repeat", "2", "--via-daemon"])
+
+    assert result.exit_code == 2
+    session.assert_not_called()
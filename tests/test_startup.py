@@ -0,0 +1,106 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from screenshot_to_text import config as s2t_config
+from screenshot_to_text.models.s2tconfig import ClipboardConfig, OCRConfig, S2TConfig, ScreenshotConfig
+from screenshot_to_text.snapshot import cached_parse
+
+HEAVY_MODULES = ["cv2", "numpy", "pypdf", "pydantic", "yaml"]
+IMPORT_TIME_BUDGET_US = 500_000
+
+
+def test_cli_import_skips_heavy_modules():
+    code = f"import json, sys, screenshot_to_text.cli; print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+
+    assert json.loads(result.stdout) == []
+
+
+def test_cli_import_time_budget():
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import screenshot_to_text.cli"], capture_output=True, text=True, check=True)
+
+    cumulative_us = next(int(line.split("|")[1]) for line in result.stderr.splitlines() if line.rstrip().endswith("| screenshot_to_text.cli"))
+
+    assert cumulative_us < IMPORT_TIME_BUDGET_US
+
+
+@pytest.fixture
+def snapshot_dir(mocker, tmp_path):
+    path = tmp_path / "snapshots"
+    mocker.patch("screenshot_to_text.snapshot.snapshot_dir", return_value=path)
+    return path
+
+
+def test_cached_parse(mocker, tmp_path, snapshot_dir):
+    source = tmp_path / "source.yaml"
+    source.write_text("a")
+    parse = mocker.Mock(side_effect=["first", "second"])
+
+    assert cached_parse("source", source, parse) == "first"
+    assert cached_parse("source", source, parse) == "first"
+    assert parse.call_count == 1
+
+    source.write_text("changed")
+    os.utime(source, ns=(0, 0))
+    assert cached_parse("source", source, parse) == "second"
+
+
+def test_cached_parse_version_change(mocker, tmp_path, snapshot_dir):
+    source = tmp_path / "source.yaml"
+    source.write_text("a")
+    parse = mocker.Mock(side_effect=["first", "second"])
+
+    cached_parse("source", source, parse)
+    mocker.patch("screenshot_to_text.snapshot.__version__", "999")
+
+    assert cached_parse("source", source, parse) == "second"
+
+
+def test_cached_parse_dependency_upgrade(mocker, tmp_path, snapshot_dir):
+    source = tmp_path / "source.yaml"
+    source.write_text("a")
+    parse = mocker.Mock(side_effect=["first", "second"])
+
+    cached_parse("source", source, parse)
+    mocker.patch("screenshot_to_text.snapshot.dependency_versions", return_value=("3.99", "99.0", "99.0", "99.0"))
+
+    assert cached_parse("source", source, parse) == "second"
+
+
+def test_cached_parse_corrupt_snapshot(mocker, tmp_path, snapshot_dir):
+    source = tmp_path / "source.yaml"
+    source.write_text("a")
+    snapshot_dir.mkdir()
+    (snapshot_dir / "source.pickle").write_bytes(b"not a pickle")
+
+    assert cached_parse("source", source, lambda: "parsed") == "parsed"
+
+
+def test_read_config_uses_snapshot(mocker, tmp_path, snapshot_dir):
+    config_path = tmp_path / "config.toml"
+    config = S2TConfig(
+        screenshot=ScreenshotConfig(tool="flameshot", cmd=["flameshot"], keep=False, keep_max_count=-1, path=tmp_path),
+        ocr=OCRConfig(tool="tesseract", enabled=True, cmd=["tesseract"]),
+        clipboard=ClipboardConfig(tool="xclip", cmd=["xclip"]),
+    )
+    s2t_config.write_config(config, config_path)
+    parse = mocker.spy(s2t_config, "_parse_config")
+
+    assert s2t_config.read_config(config_path) == config
+    assert s2t_config.read_config(config_path) == config
+    assert parse.call_count == 1
+
+
+def test_supported_platforms_snapshot(snapshot_dir):
+    s2t_config.get_supported_platforms.cache_clear()
+
+    parsed = s2t_config.get_supported_platforms()
+    s2t_config.get_supported_platforms.cache_clear()
+
+    assert (snapshot_dir / "supported_platforms.pickle").exists()
+    assert s2t_config.get_supported_platforms() == parsed
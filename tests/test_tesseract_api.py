@@ -0,0 +1,78 @@
+import cv2
+import numpy as np
+import pytest
+
+from screenshot_to_text.app import run_ocr_words
+from screenshot_to_text.models.s2tconfig import OCRConfig
+from screenshot_to_text.tesseract_api import EngineParams, EnginePool, TesseractEngine, engine_params, load_libtesseract
+
+CMD = ["tesseract", "--oem", "1", "--psm", "6", "--dpi", "1200", "-c", "a=1", "-c", "b=x=y", "-l", "eng+deu", "{filename}", "{filename_pdf}", "pdf"]
+TSV_ROWS = "5\t1\t1\t1\t1\t1\t0\t0\t50\t20\t95\thello\n"
+
+
+def test_engine_params_from_cmd():
+    params = engine_params(CMD)
+
+    assert params == EngineParams(language="eng+deu", oem=1, psm=6, dpi=1200, variables=(("a", "1"), ("b", "x=y")))
+    assert engine_params(["tesseract", "{filename}", "{filename_pdf}", "pdf"]) == EngineParams()
+
+
+def test_engine_pool_reuses_engines(mocker):
+    engine_class = mocker.patch("screenshot_to_text.tesseract_api.TesseractEngine", side_effect=lambda params: mocker.Mock())
+    pool = EnginePool()
+    params = engine_params(CMD)
+
+    with pool.borrow(params) as first:
+        with pool.borrow(params) as second:
+            assert first is not second
+    with pool.borrow(params):
+        pass
+
+    assert engine_class.call_count == 2
+
+
+def test_libtesseract_backend_falls_back_to_subprocess(mocker):
+    mocker.patch("screenshot_to_text.tesseract_api.load_libtesseract", return_value=None)
+    mocker.patch("screenshot_to_text.app.runtime_validate")
+    mocker.patch("screenshot_to_text.app.engine_pool", return_value=EnginePool())
+    run_command = mocker.patch("screenshot_to_text.app.run_command", return_value="header\n" + TSV_ROWS)
+    config = OCRConfig(tool="tesseract", enabled=True, cmd=CMD, backend="libtesseract")
+
+    [word] = run_ocr_words(config, np.zeros((10, 10), np.uint8))
+
+    assert word.text == "hello"
+    run_command.assert_called_once()
+
+
+def test_libtesseract_backend_recognizes_in_process(mocker):
+    engine = mocker.Mock(spec=TesseractEngine)
+    engine.recognize_tsv.return_value = "header\n" + TSV_ROWS
+    pool = mocker.Mock()
+    pool.borrow.return_value.__enter__ = mocker.Mock(return_value=engine)
+    pool.borrow.return_value.__exit__ = mocker.Mock(return_value=False)
+    mocker.patch("screenshot_to_text.app.runtime_validate")
+    mocker.patch("screenshot_to_text.app.engine_pool", return_value=pool)
+    run_command = mocker.patch("screenshot_to_text.app.run_command")
+    config = OCRConfig(tool="tesseract", enabled=True, cmd=CMD, backend="libtesseract")
+
+    [word] = run_ocr_words(config, np.zeros((10, 10), np.uint8))
+
+    assert word.text == "hello"
+    pool.borrow.assert_called_once_with(engine_params(CMD))
+    run_command.assert_not_called()
+
+
+@pytest.mark.skipif(load_libtesseract() is None, reason="libtesseract is not installed")
+def test_tesseract_engine_recognizes_text():
+    image = np.full((80, 400), 255, np.uint8)
+    cv2.putText(image, "hello world", (10, 55), cv2.FONT_HERSHEY_SIMPLEX, 1.5, 0, 3)
+
+    engine = TesseractEngine(EngineParams(psm=7))
+    try:
+        first = engine.recognize_tsv(image)
+        second = engine.recognize_tsv(image)
+    finally:
+        engine.close()
+
+    assert first == second
+    assert "hello" in first.lower()
@@ -0,0 +1,97 @@
+import json
+import sys
+
+import cv2
+import numpy as np
+from typer.testing import CliRunner
+
+from screenshot_to_text.app import run_command, screenshot_to_text
+from screenshot_to_text.cli import app
+from screenshot_to_text.models.s2tconfig import OCRCacheConfig, OCRConfig
+from screenshot_to_text.timing import aggregate, annotate, format_record, profile_log_path, profiling, read_records, span
+
+
+def test_span_without_profile_is_noop():
+    with span("stage"):
+        annotate(width=1)
+
+
+def test_profiling_records_spans_and_log(tmp_path):
+    log_path = tmp_path / "profile.jsonl"
+
+    with profiling(True, log_path) as profile:
+        with span("preprocess"):
+            annotate(width=10, height=20)
+
+    assert [s["name"] for s in profile.record["spans"]] == ["preprocess"]
+    assert (profile.record["width"], profile.record["height"]) == (10, 20)
+    assert read_records(log_path) == [profile.record]
+
+
+def test_profiling_records_failed_runs(tmp_path):
+    log_path = tmp_path / "profile.jsonl"
+
+    try:
+        with profiling(False, log_path):
+            raise ValueError
+    except ValueError:
+        pass
+
+    assert read_records(log_path)[0]["error"] == "ValueError"
+
+
+def test_long_lived_profile_records_rss_around_the_run():
+    with profiling(True) as one_shot:
+        pass
+    with profiling(True, one_shot=False) as served:
+        pass
+
+    assert "peak_rss_kib" in one_shot.record and "rss_before_kib" not in one_shot.record
+    assert "peak_rss_kib" not in served.record
+    assert served.record["rss_before_kib"] > 0 and served.record["rss_after_kib"] > 0
+    assert "daemon peak" in format_record(served.record)
+
+
+def test_run_command_spawn_and_wait_spans():
+    with profiling(True) as profile:
+        output = run_command([sys.executable, "-c", "print(input())"], text_input="hello")
+
+    assert output == "hello\n"
+    name = f"command.{sys.executable.rsplit('/', 1)[-1]}"
+    assert [s["name"] for s in profile.record["spans"]] == [f"{name}.spawn", f"{name}.wait"]
+
+
+def test_aggregate_percentiles():
+    records = [{"total": i / 100, "spans": [{"name": "ocr", "start": 0, "duration": i / 100}]} for i in range(1, 101)]
+
+    stats = aggregate(records)
+
+    assert stats["ocr"] == {"n": 100, "p50": 0.5, "p95": 0.95, "p99": 0.99}
+    assert stats["total"]["n"] == 100
+
+
+def test_stats_command():
+    path = profile_log_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text("".join(json.dumps({"total": 0.2, "spans": [{"name": "ocr", "start": 0, "duration": 0.1}]}) + "\n" for _ in range(3)))
+
+    result = CliRunner().invoke(app, ["stats", "--last", "2"])
+
+    assert result.exit_code == 0
+    assert "2 runs" in result.output
+    assert "ocr" in result.output
+
+
+def test_pipeline_stage_spans(mocker, tmp_path):
+    filename = tmp_path / "screenshot.png"
+    image = np.full((20, 40, 3), 255, np.uint8)
+    cv2.putText(image, "hi", (2, 15), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1)
+    cv2.imwrite(str(filename), image)
+    mocker.patch("screenshot_to_text.app.run_ocr_words", return_value=[])
+    ocr_config = OCRConfig(tool="tesseract", enabled=True, cmd=["tesseract"], cache=OCRCacheConfig(enabled=False))
+
+    with profiling(True) as profile:
+        screenshot_to_text(ocr_config, filename, keep_processed=False)
+
+    assert [s["name"] for s in profile.record["spans"]] == ["load", "plan", "preprocess", "ocr"]
+    assert (profile.record["width"], profile.record["height"]) == (40, 20)
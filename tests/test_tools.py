@@ -1,3 +1,5 @@
+import cv2
+import numpy as np
 import pytest
 from screenshot_to_text.app import take_screenshot
 from screenshot_to_text.models.s2tconfig import ScreenshotConfig
@@ -5,6 +7,13 @@ from screenshot_to_text.errors import ToolNotFoundError
 from screenshot_to_text.app import run_ocr, capture_screenshot_and_process
 from screenshot_to_text.models.s2tconfig import OCRConfig, S2TConfig, ClipboardConfig
 from screenshot_to_text.errors import CommandError
+from screenshot_to_text.layout import Word
+
+
+def text_image():
+    image = np.full((20, 40, 3), 255, np.uint8)
+    cv2.putText(image, "hi", (2, 15), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1)
+    return image
 
 
 @pytest.mark.parametrize("tool", ["", " "])
@@ -75,7 +84,9 @@ def test_ocr_enabled_clipboard_no_tool(mocker, tmp_path, tool):
     mocker.patch("screenshot_to_text.app.run_ocr", return_value=tmp_path / "some.pdf")
     mocker.patch("screenshot_to_text.app.take_screenshot", return_value=tmp_path / "some.png")
     mocker.patch("screenshot_to_text.app.preprocess_screenshot_for_ocr", return_value=tmp_path / "some_processed.png")
+    mocker.patch("screenshot_to_text.app.load_screenshot", return_value=text_image())
     mocker.patch("screenshot_to_text.app.pdf_to_txt_with_layout", return_value="some text")
+    mocker.patch("screenshot_to_text.app.run_ocr_words", return_value=[Word(text="some text", left=0, top=0, width=90, height=10)])
 
     with pytest.raises(ToolNotFoundError):
         capture_screenshot_and_process(config)
@@ -108,8 +119,77 @@ def test_ocr_enabled_clipboard_no_command(mocker, tmp_path, cmd):
     mocker.patch("screenshot_to_text.app.run_ocr", return_value=tmp_path / "some.pdf")
     mocker.patch("screenshot_to_text.app.take_screenshot", return_value=tmp_path / "some.png")
     mocker.patch("screenshot_to_text.app.preprocess_screenshot_for_ocr", return_value=tmp_path / "some_processed.png")
+    mocker.patch("screenshot_to_text.app.load_screenshot", return_value=text_image())
     mocker.patch("screenshot_to_text.app.pdf_to_txt_with_layout", return_value="some text")
+    mocker.patch("screenshot_to_text.app.run_ocr_words", return_value=[Word(text="some text", left=0, top=0, width=90, height=10)])
     mocker.patch("screenshot_to_text.app.validate_tool")
 
     with pytest.raises(CommandError):
         capture_screenshot_and_process(config)
+
+
+def test_resolve_tool_memoized_per_path(mocker, monkeypatch):
+    from screenshot_to_text.helpers import resolve_tool, forget_tool
+
+    forget_tool("some-tool")
+    which = mocker.patch("screenshot_to_text.helpers.shutil.which", return_value="/usr/bin/some-tool")
+
+    monkeypatch.setenv("PATH", "/usr/bin")
+    assert resolve_tool("some-tool") == "/usr/bin/some-tool"
+    assert resolve_tool("some-tool") == "/usr/bin/some-tool"
+    assert which.call_count == 1
+
+    monkeypatch.setenv("PATH", "/usr/local/bin:/usr/bin")
+    resolve_tool("some-tool")
+    assert which.call_count == 2
+
+    forget_tool("some-tool")
+
+
+def test_run_command_retries_stale_executable(tmp_path):
+    from screenshot_to_text.app import run_command
+
+    assert run_command(["echo", "hello"], executable=str(tmp_path / "moved" / "echo")) == "hello\n"
+
+
+def test_validate_trusts_stored_executable(mocker):
+    from screenshot_to_text.app import runtime_validate
+
+    which = mocker.patch("screenshot_to_text.helpers.shutil.which")
+    config = OCRConfig(tool="tesseract-not-on-path", enabled=True, cmd=["tesseract-not-on-path"], executable="/opt/tesseract/bin/tesseract-not-on-path")
+
+    runtime_validate(config)
+
+    which.assert_not_called()
+
+
+def test_stored_executable_of_another_tool_is_ignored(tmp_path):
+    from screenshot_to_text.app import run_command
+
+    # cmd was edited from xclip to echo, the path stored for xclip must not run with echo's arguments
+    assert run_command(["echo", "hello"], executable=str(tmp_path / "xclip")) == "hello\n"
+
+
+def test_config_stores_executables(mocker, tmp_path):
+    from typer.testing import CliRunner
+    from screenshot_to_text.cli import app
+    from screenshot_to_text.config import ToolCandidates, read_config
+    from screenshot_to_text.models.supported_platforms import Tool
+
+    def candidates(tool_type):
+        tool = Tool(name=f"{tool_type.value}-tool", cmd=[f"{tool_type.value}-tool", "--flag"])
+        return ToolCandidates(available=[tool], alternative=[], available_names=[tool.name], alternative_names=[])
+
+    config_path = tmp_path / "config.toml"
+    mocker.patch("screenshot_to_text.cli.config_file_path", return_value=config_path)
+    mocker.patch("screenshot_to_text.cli.get_tool_candidates", side_effect=candidates)
+    mocker.patch("screenshot_to_text.cli.resolve_tool", side_effect=lambda tool: f"/usr/bin/{tool}")
+    mocker.patch("screenshot_to_text.snapshot.snapshot_dir", return_value=tmp_path / "snapshots")
+
+    result = CliRunner().invoke(app, ["config"], catch_exceptions=False)
+
+    assert result.exit_code == 0
+    config = read_config(config_path)
+    assert config.screenshot.executable == "/usr/bin/screenshot-tool"
+    assert config.ocr.executable == "/usr/bin/ocr-tool"
+    assert config.clipboard.executable == "/usr/bin/clipboard-tool"
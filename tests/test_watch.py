@@ -0,0 +1,146 @@
+import os
+import struct
+import sys
+import threading
+import time
+
+import pytest
+
+from screenshot_to_text.watch import IN_Q_OVERFLOW, Debouncer, InotifyWatcher, PollingWatcher, is_watch_candidate, make_watcher, watch_directory
+
+
+@pytest.mark.parametrize(
+    "name, expected",
+    [
+        ("screenshot.png", True),
+        ("screenshot.PNG", True),
+        ("screenshot_processed.png", False),
+        ("screenshot.pdf", False),
+        ("notes.txt", False),
+        ("screenshot_2024-01-01T12_00_00.123456.png", False),
+        ("screenshot_from_gnome.png", True),
+    ],
+)
+def test_is_watch_candidate(tmp_path, name, expected):
+    assert is_watch_candidate(tmp_path / name) is expected
+
+
+def test_debouncer_waits_for_stable_size(tmp_path):
+    path = tmp_path / "screenshot.png"
+    path.write_bytes(b"a")
+    debouncer = Debouncer(settle=1.0)
+
+    debouncer.touch(path, now=0.0)
+    assert debouncer.ready(now=0.5) == []
+
+    path.write_bytes(b"ab")
+    assert debouncer.ready(now=1.0) == []
+    assert debouncer.ready(now=2.0) == [path]
+    assert len(debouncer) == 0
+
+
+def test_debouncer_drops_deleted_files(tmp_path):
+    debouncer = Debouncer(settle=0.0)
+
+    debouncer.touch(tmp_path / "gone.png", now=0.0)
+
+    assert debouncer.ready(now=1.0) == []
+    assert len(debouncer) == 0
+
+
+def test_polling_watcher_reports_new_files(tmp_path):
+    (tmp_path / "existing.png").write_bytes(b"a")
+    watcher = PollingWatcher(tmp_path, interval=0.0)
+
+    (tmp_path / "new.png").write_bytes(b"a")
+
+    assert watcher.poll(0.0) == [tmp_path / "new.png"]
+    assert watcher.poll(0.0) == []
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="inotify is Linux only")
+def test_inotify_watcher_reports_new_files(tmp_path):
+    watcher = InotifyWatcher(tmp_path)
+
+    (tmp_path / "new.png").write_bytes(b"a")
+
+    assert tmp_path / "new.png" in watcher.poll(1.0)
+    watcher.close()
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="inotify is Linux only")
+def test_inotify_overflow_rescans(mocker, tmp_path):
+    (tmp_path / "old.png").write_bytes(b"a")
+    os.utime(tmp_path / "old.png", (0, 0))
+    watcher = InotifyWatcher(tmp_path)
+    (tmp_path / "lost.png").write_bytes(b"a")
+
+    mocker.patch("screenshot_to_text.watch.select.select", return_value=([watcher._fd], [], []))
+    mocker.patch("screenshot_to_text.watch.os.read", return_value=struct.pack("iIII", -1, IN_Q_OVERFLOW, 0, 0))
+
+    assert watcher.poll(0.0) == [tmp_path / "lost.png"]
+    watcher.close()
+
+
+def test_missing_directory(tmp_path):
+    with pytest.raises(NotADirectoryError):
+        make_watcher(tmp_path / "missing", polling=True)
+
+
+@pytest.mark.parametrize("polling", [True, False])
+def test_watch_directory_processes_each_screenshot_once(tmp_path, polling):
+    handled = []
+    stop = threading.Event()
+
+    def handle(path):
+        handled.append(path.name)
+        (path.parent / (path.stem + "_processed.png")).write_bytes(b"processed")
+        if len(handled) == 2:
+            stop.set()
+
+    thread = threading.Thread(
+        target=watch_directory,
+        args=(tmp_path, handle),
+        kwargs={"settle": 0.05, "polling": polling, "poll_interval": 0.02, "stop": stop},
+    )
+    thread.start()
+    time.sleep(0.1)
+
+    for name in ["a.png", "b.png"]:
+        with open(tmp_path / name, "wb") as f:
+            f.write(b"partial")
+            f.flush()
+            f.write(b" and the rest")
+    (tmp_path / "a.pdf").write_bytes(b"pdf")
+
+    thread.join(timeout=5)
+    stop.set()
+
+    assert not thread.is_alive()
+    assert sorted(handled) == ["a.png", "b.png"]
+
+
+def test_watch_directory_reports_errors(tmp_path):
+    errors = []
+    stop = threading.Event()
+
+    def handle(path):
+        raise RuntimeError("boom")
+
+    def on_error(path, error):
+        errors.append((path.name, str(error)))
+        stop.set()
+
+    thread = threading.Thread(
+        target=watch_directory,
+        args=(tmp_path, handle, on_error),
+        kwargs={"settle": 0.05, "polling": True, "poll_interval": 0.02, "stop": stop},
+    )
+    thread.start()
+    time.sleep(0.1)
+    (tmp_path / "a.png").write_bytes(b"a")
+
+    thread.join(timeout=5)
+    stop.set()
+
+    assert errors == [("a.png", "boom")]
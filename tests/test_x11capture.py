@@ -0,0 +1,86 @@
+import ctypes
+import os
+import shutil
+import subprocess
+
+import numpy as np
+import pytest
+
+from screenshot_to_text.errors import ScreenCaptureError
+from screenshot_to_text.x11capture import X11Grabber, load_libraries, parse_geometry
+
+
+def test_parse_geometry():
+    assert parse_geometry("800x600+100+50") == (100, 50, 800, 600)
+
+    for geometry in ["800x600", "0x600+0+0", "800x600-1+0", "a"]:
+        with pytest.raises(ValueError):
+            parse_geometry(geometry)
+
+
+@pytest.fixture
+def xvfb():
+    if shutil.which("Xvfb") is None or load_libraries() is None:
+        pytest.skip("Xvfb and libX11 are required")
+
+    read_fd, write_fd = os.pipe()
+    process = subprocess.Popen(
+        ["Xvfb", "-displayfd", str(write_fd), "-screen", "0", "320x240x24", "-nolisten", "tcp"],
+        pass_fds=[write_fd],
+        stderr=subprocess.DEVNULL,
+    )
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        display = ":" + f.readline().strip()
+
+    yield display
+
+    process.terminate()
+    process.wait()
+
+
+def fill_rectangle(display_name: str, color: int, x: int, y: int, width: int, height: int):
+    x11 = load_libraries()[0]
+    x11.XCreateGC.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_ulong, ctypes.c_void_p]
+    x11.XCreateGC.restype = ctypes.c_void_p
+    x11.XSetForeground.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_ulong]
+    x11.XFillRectangle.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_void_p, ctypes.c_int, ctypes.c_int, ctypes.c_uint, ctypes.c_uint]
+    x11.XFreeGC.argtypes = [ctypes.c_void_p, ctypes.c_void_p]
+
+    display = x11.XOpenDisplay(display_name.encode())
+    root = x11.XRootWindow(display, x11.XDefaultScreen(display))
+    gc = x11.XCreateGC(display, root, 0, None)
+    x11.XSetForeground(display, gc, color)
+    x11.XFillRectangle(display, root, gc, x, y, width, height)
+    x11.XFreeGC(display, gc)
+    x11.XSync(display, False)
+    x11.XCloseDisplay(display)
+
+
+def test_grab_region(xvfb):
+    fill_rectangle(xvfb, 0xFF0000, 10, 20, 30, 40)
+    grabber = X11Grabber(xvfb)
+
+    try:
+        shm = grabber.grab((0, 0, 60, 80))
+        again = grabber.grab((0, 0, 60, 80))
+        grabber.use_shm = False
+        plain = grabber.grab((0, 0, 60, 80))
+        screen = grabber.grab()
+    finally:
+        grabber.close()
+
+    assert shm.shape == (80, 60, 3)
+    assert tuple(shm[20, 10]) == (0, 0, 255) and tuple(shm[60, 40]) != (0, 0, 255)
+    assert np.array_equal(shm, again) and np.array_equal(shm, plain)
+    assert screen.shape == (240, 320, 3)
+
+
+def test_grab_outside_screen(xvfb):
+    grabber = X11Grabber(xvfb)
+
+    try:
+        with pytest.raises(ScreenCaptureError):
+            grabber.grab((300, 0, 100, 10))
+    finally:
+        grabber.close()